@@ -0,0 +1 @@
+default_app_config = 'cognitive.apps.atlas.apps.AtlasConfig'
@@ -1,140 +1,368 @@
-from cognitive.settings import DOMAIN
-import requests
+''' Graph analyses over one relationship type of the atlas, run in process.
 
-# PAGERANK ###############################################################
+The subgraph of a relationship (eg KINDOF or MEASUREDBY) is read from neo4j in
+one query into a compressed sparse row (CSR) adjacency of numpy arrays, the
+metric is computed with vectorized sweeps over it, and the result is written
+back to a property of the same name on each node in batched transactions.
+Every analysis returns {node id: value} synchronously, keyed on the cognitive
+atlas id of the node (the neo4j internal id for nodes without one).
 
-# Gets all nodes connected by some relationship and updates each node with the property key pagerank.
-# The value of the pagerank property is a float data type, ex. pagerank: 3.14159265359.
-# PageRank is used to find the relative importance of a node within a set
-# of connected nodes.
+Pagerank and strongly connected components follow the direction of the
+relationship; closeness, betweenness, triangles and connected components
+treat it as undirected.
+'''
+import re
 
-# :GET /service/mazerunner/analysis/pagerank/KNOWS
+import numpy
 
+from cognitive.apps.atlas.cache import invalidate
+from cognitive.settings import graph
 
-def pagerank(relation="KINDOF"):
+WRITE_BATCH_SIZE = 1000
 
-    # submit analysis to run
-    url = "%s/service/mazerunner/analysis/pagerank/%s" % (DOMAIN, relation)
-    run_analysis(url)
 
-# CLOSENESS_CENTRALITY ###################################################
+class Subgraph(object):
+    '''Subgraph is the adjacency of one relationship type in CSR form. Nodes
+    are numbered 0..n-1 and the out neighbours of node i are
+    indices[indptr[i]:indptr[i + 1]].
+    :param node_ids: neo4j internal id of each node
+    :param uids: cognitive atlas id of each node (or None)
+    :param src: source node number of each edge
+    :param dst: target node number of each edge
+    '''
 
-# Gets all nodes connected by some relationship and updates each node with the property key closeness_centrality.
-# The value of the closeness_centrality property is a float data type, ex. pagerank: 0.1337.
-# A key node centrality measure in networks is closeness centrality
-# (Freeman, 1978; Opsahl et al., 2010; Wasserman and Faust, 1994). It is
-# defined as the inverse of farness, which in turn, is the sum of
-# distances to all other nodes.
+    def __init__(self, node_ids, uids, src, dst):
+        self.node_ids = numpy.asarray(node_ids, dtype=numpy.int64)
+        self.uids = list(uids)
+        self.n = len(self.node_ids)
+        src = numpy.asarray(src, dtype=numpy.int64)
+        dst = numpy.asarray(dst, dtype=numpy.int64)
+        order = numpy.argsort(src, kind="mergesort")
+        self.src = src[order]
+        self.indices = dst[order]
+        self.indptr = numpy.zeros(self.n + 1, dtype=numpy.int64)
+        numpy.cumsum(numpy.bincount(self.src, minlength=self.n),
+                     out=self.indptr[1:])
+
+    @property
+    def degree(self):
+        return numpy.diff(self.indptr)
+
+    def undirected(self):
+        '''undirected returns the subgraph with every edge in both directions,
+        without self loops or duplicate edges
+        '''
+        src = numpy.concatenate([self.src, self.indices])
+        dst = numpy.concatenate([self.indices, self.src])
+        keep = src != dst
+        pairs = numpy.unique(src[keep] * self.n + dst[keep])
+        return Subgraph(self.node_ids, self.uids,
+                        pairs // self.n, pairs % self.n)
+
+    def expand(self, frontier):
+        '''expand returns (sources, targets) for every out edge of the nodes
+        in frontier
+        '''
+        starts = self.indptr[frontier]
+        counts = self.indptr[frontier + 1] - starts
+        total = counts.sum()
+        sources = numpy.repeat(frontier, counts)
+        offsets = (numpy.arange(total) -
+                   numpy.repeat(numpy.cumsum(counts) - counts, counts))
+        return sources, self.indices[numpy.repeat(starts, counts) + offsets]
+
+    def keys(self):
+        return [uid if uid is not None else int(node_id)
+                for uid, node_id in zip(self.uids, self.node_ids)]
+
+
+def load_subgraph(relation):
+    '''load_subgraph reads all relationships of one type from the graph
+    :param relation: the relationship type, eg KINDOF
+    '''
+    if not re.match(r"^\w+$", relation):
+        raise ValueError("Invalid relationship type {}".format(relation))
+    query = '''MATCH (a)-[:{}]->(b)
+               RETURN id(a) AS a, a.id AS a_uid, id(b) AS b, b.id AS b_uid
+            '''.format(relation)
+    ends = []
+    uids = {}
+    for row in graph.run(query):
+        ends.append((row['a'], row['b']))
+        uids[row['a']] = row['a_uid']
+        uids[row['b']] = row['b_uid']
+    ends = numpy.array(ends, dtype=numpy.int64).reshape(-1, 2)
+    node_ids, numbers = numpy.unique(ends.ravel(), return_inverse=True)
+    numbers = numbers.reshape(-1, 2)
+    return Subgraph(node_ids, [uids[x] for x in node_ids.tolist()],
+                    numbers[:, 0], numbers[:, 1])
+
+
+def write_results(subgraph, key, values, batch_size=WRITE_BATCH_SIZE):
+    '''write_results sets property key on every node of the subgraph, in
+    transactions of batch_size nodes
+    :param key: the property name, one of the analysis names below
+    :param values: numpy array with one value per node
+    '''
+    query = '''UNWIND $rows AS row
+               MATCH (n) WHERE id(n) = row.node
+               SET n.{} = row.value'''.format(key)
+    rows = [{'node': node, 'value': value} for node, value in
+            zip(subgraph.node_ids.tolist(), values.tolist())]
+    for start in range(0, len(rows), batch_size):
+        tx = graph.begin()
+        tx.run(query, parameters={'rows': rows[start:start + batch_size]})
+        tx.commit()
+    invalidate()
+
+
+def bfs(subgraph, source):
+    '''bfs runs a breadth first search from source, expanding the whole
+    frontier of a level at once
+    :returns: the hop distance to every node (-1 where unreachable) and the
+              (sources, targets) of the shortest path edges of each level
+    '''
+    dist = numpy.full(subgraph.n, -1, dtype=numpy.int64)
+    dist[source] = 0
+    frontier = numpy.array([source], dtype=numpy.int64)
+    levels = []
+    depth = 0
+    while frontier.size:
+        depth += 1
+        sources, targets = subgraph.expand(frontier)
+        new = dist[targets] < 0
+        dist[targets[new]] = depth
+        on_path = dist[targets] == depth
+        levels.append((sources[on_path], targets[on_path]))
+        frontier = numpy.flatnonzero(
+            numpy.bincount(targets[new], minlength=subgraph.n))
+    return dist, levels
 
-# :GET /service/mazerunner/analysis/closeness_centrality/MEASUREDBY
 
+# PAGERANK ###############################################################
 
-def closeness_centrality(relation="MEASUREDBY"):
+# PageRank is used to find the relative importance of a node within a set
+# of connected nodes. Values sum to 1 over the nodes of the subgraph.
+
+def compute_pagerank(subgraph, damping=0.85, tol=1e-10, max_iter=100):
+    n = subgraph.n
+    degree = subgraph.degree
+    dangling = degree == 0
+    share = numpy.zeros(n)
+    rank = numpy.full(n, 1.0 / n)
+    for _ in range(max_iter):
+        share[~dangling] = rank[~dangling] / degree[~dangling]
+        new = numpy.bincount(subgraph.indices,
+                             weights=numpy.repeat(share, degree),
+                             minlength=n)
+        new = damping * (new + rank[dangling].sum() / n) + (1 - damping) / n
+        converged = numpy.abs(new - rank).sum() < n * tol
+        rank = new
+        if converged:
+            break
+    return rank
+
+
+def pagerank(relation="KINDOF", write=True):
+    return run_analysis("pagerank", relation, write=write)
 
-    # submit analysis to run
-    url = "%s/service/mazerunner/analysis/closeness_centrality/%s" % (
-        DOMAIN, relation)
-    run_analysis(url)
+# CLOSENESS_CENTRALITY ###################################################
 
-# BETWEENNESS_CENTRALITY #################################################
+# Closeness is the inverse of farness, the sum of distances to all other
+# reachable nodes, scaled by the fraction of the graph that is reachable
+# (Wasserman and Faust, 1994) so that nodes in small components do not
+# score highest.
 
-# Gets all nodes connected by some relationship and updates each node with the property key betweenness_centrality.
-# The value of the betweenness_centrality property is a float data type, ex. betweenness_centrality: 20.345.
-# Betweenness centrality is an indicator of a node's centrality in a
-# network. It is equal to the number of shortest paths from all vertices
-# to all others that pass through that node. A node with high betweenness
-# centrality has a large influence on the transfer of items through the
-# network, under the assumption that item transfer follows the shortest
-# paths.
+def compute_closeness_centrality(subgraph):
+    undirected = subgraph.undirected()
+    n = subgraph.n
+    closeness = numpy.zeros(n)
+    for source in range(n):
+        dist, _ = bfs(undirected, source)
+        reachable = dist > 0
+        farness = dist[reachable].sum()
+        if farness:
+            found = reachable.sum()
+            closeness[source] = (found / farness) * (found / (n - 1))
+    return closeness
 
-# :GET /service/mazerunner/analysis/betweenness_centrality/MEASUREDBY
 
+def closeness_centrality(relation="MEASUREDBY", write=True):
+    return run_analysis("closeness_centrality", relation, write=write)
 
-def betweenness_centrality(relation="MEASUREDBY"):
+# BETWEENNESS_CENTRALITY #################################################
 
-    # submit analysis to run
-    url = "%s/service/mazerunner/analysis/betweenness_centrality/%s" % (
-        DOMAIN, relation)
-    run_analysis(url)
+# Betweenness is the number of shortest paths between all other pairs of
+# nodes that pass through a node (Brandes, 2001), computed with one
+# breadth first search per source that keeps the edges of each level.
+
+def compute_betweenness_centrality(subgraph):
+    undirected = subgraph.undirected()
+    n = subgraph.n
+    betweenness = numpy.zeros(n)
+    for source in range(n):
+        _, levels = bfs(undirected, source)
+        sigma = numpy.zeros(n)
+        sigma[source] = 1
+        for sources, targets in levels:
+            sigma += numpy.bincount(targets, weights=sigma[sources],
+                                    minlength=n)
+        delta = numpy.zeros(n)
+        for sources, targets in reversed(levels):
+            delta += numpy.bincount(
+                sources, minlength=n,
+                weights=sigma[sources] / sigma[targets] * (1 + delta[targets]))
+        delta[source] = 0
+        betweenness += delta
+    # every path was counted from both of its ends
+    return betweenness / 2
+
+
+def betweenness_centrality(relation="MEASUREDBY", write=True):
+    return run_analysis("betweenness_centrality", relation, write=write)
 
 # TRIANGLE_COUNTING ######################################################
 
-# :GET /service/mazerunner/analysis/triangle_count/MEASUREDBY
-
-# Gets all nodes connected by some relationship and updates each node with the property key triangle_count.
-# The value of the triangle_count property is an integer data type, ex. triangle_count: 2.
-# The value of triangle_count represents the count of the triangles that a node is connected to.
-# A node is part of a triangle when it has two adjacent nodes with a
-# relationship between them. The triangle_count property provides a
-# measure of clustering for each node.
-
-
-def triangle_count(relation="MEASUREDBY"):
-
-    # submit analysis to run
-    url = "%s/service/mazerunner/analysis/triangle_count/%s" % (
-        DOMAIN, relation)
-    run_analysis(url)
+# The number of triangles a node is part of, ie pairs of its neighbours
+# that are themselves connected. A measure of clustering for each node.
+
+def compute_triangle_count(subgraph):
+    undirected = subgraph.undirected()
+    n = subgraph.n
+    triangles = numpy.zeros(n, dtype=numpy.int64)
+    marked = numpy.zeros(n, dtype=bool)
+    for node in range(n):
+        neighbours = undirected.indices[
+            undirected.indptr[node]:undirected.indptr[node + 1]]
+        if neighbours.size < 2:
+            continue
+        marked[neighbours] = True
+        _, second = undirected.expand(neighbours)
+        # each edge between two neighbours is seen from both of them
+        triangles[node] = marked[second].sum() // 2
+        marked[neighbours] = False
+    return triangles
+
+
+def triangle_count(relation="MEASUREDBY", write=True):
+    return run_analysis("triangle_count", relation, write=write)
 
 # CONNECTED_COMPONENTS ###################################################
 
-# :GET /service/mazerunner/analysis/connected_components/MEASUREDBY
-
-# Gets all nodes connected by some relationship and updates each node with the property key connected_components.
-# The value of connected_components property is an integer data type, ex. connected_components: 181.
-# The value of connected_components represents the Neo4j internal node ID that has the lowest integer value for a
-# set of connected nodes.
-# Connected components are used to find isolated clusters, that is, a
-# group of nodes that can reach every other node in the group through a
-# bidirectional traversal.
-
-
-def connected_components(relation="MEASUREDBY"):
+# Groups of nodes that can reach each other ignoring the direction of the
+# relationship. Each node gets the lowest neo4j internal node id in its
+# component, as Mazerunner did.
 
-    # submit analysis to run
-    url = "%s/service/mazerunner/analysis/connected_components/%s" % (
-        DOMAIN, relation)
-    run_analysis(url)
-
-# STRONGLY_CONNECTED_COMPONENTS ##########################################
-
-# :GET /service/mazerunner/analysis/strongly_connected_components/MEASUREDBY
+def lowest_id(subgraph, labels):
+    '''lowest_id maps the component label of each node to the lowest neo4j
+    internal node id in that component
+    '''
+    lowest = numpy.full(subgraph.n, numpy.iinfo(numpy.int64).max)
+    numpy.minimum.at(lowest, labels, subgraph.node_ids)
+    return lowest[labels]
 
-# Gets all nodes connected by some relationship and updates each node with the property key
-# strongly_connected_components.
-# The value of strongly_connected_components property is an integer data type, ex. strongly_connected_components: 26.
-# The value of strongly_connected_components represents the Neo4j internal node ID that has the lowest integer value
-# for a set of strongly connected nodes.
-# Strongly connected components are used to find clusters, that is, a
-# group of nodes that can reach every other node in the group through a
-# directed traversal.
 
+def compute_connected_components(subgraph):
+    undirected = subgraph.undirected()
+    labels = numpy.arange(subgraph.n)
+    while True:
+        # hook every node to its lowest neighbour, then shortcut
+        new = labels.copy()
+        numpy.minimum.at(new, undirected.src, labels[undirected.indices])
+        new = new[new]
+        if numpy.array_equal(new, labels):
+            break
+        labels = new
+    return lowest_id(subgraph, labels)
 
-def strongly_connected_components(relation="MEASUREDBY"):
 
-    # submit analysis to run
-    url = "%s/service/mazerunner/analysis/strongly_connected_components/%s" % (
-        DOMAIN, relation)
-    run_analysis(url)
+def connected_components(relation="MEASUREDBY", write=True):
+    return run_analysis("connected_components", relation, write=write)
 
+# STRONGLY_CONNECTED_COMPONENTS ##########################################
 
-def run_analysis(url):
-    '''run_analysis will submit a GET request to run a graph analysis with Mazerunner (under development)
-    :param url: the url of the request for GET.
+# Groups of nodes that can reach each other following the direction of the
+# relationship (Tarjan, 1972), labelled like connected components.
+
+def compute_strongly_connected_components(subgraph):
+    n = subgraph.n
+    indptr = subgraph.indptr.tolist()
+    indices = subgraph.indices.tolist()
+    order = [-1] * n
+    low = [0] * n
+    on_stack = [False] * n
+    stack = []
+    labels = numpy.zeros(n, dtype=numpy.int64)
+    counter = 0
+    for root in range(n):
+        if order[root] >= 0:
+            continue
+        work = [(root, indptr[root])]
+        order[root] = low[root] = counter
+        counter += 1
+        stack.append(root)
+        on_stack[root] = True
+        while work:
+            node, edge = work[-1]
+            if edge < indptr[node + 1]:
+                work[-1] = (node, edge + 1)
+                child = indices[edge]
+                if order[child] < 0:
+                    order[child] = low[child] = counter
+                    counter += 1
+                    stack.append(child)
+                    on_stack[child] = True
+                    work.append((child, indptr[child]))
+                elif on_stack[child]:
+                    low[node] = min(low[node], order[child])
+                continue
+            work.pop()
+            if work:
+                parent = work[-1][0]
+                low[parent] = min(low[parent], low[node])
+            if low[node] == order[node]:
+                while True:
+                    member = stack.pop()
+                    on_stack[member] = False
+                    labels[member] = node
+                    if member == node:
+                        break
+    return lowest_id(subgraph, labels)
+
+
+def strongly_connected_components(relation="MEASUREDBY", write=True):
+    return run_analysis("strongly_connected_components", relation,
+                        write=write)
+
+
+ANALYSES = {
+    "pagerank": compute_pagerank,
+    "closeness_centrality": compute_closeness_centrality,
+    "betweenness_centrality": compute_betweenness_centrality,
+    "triangle_count": compute_triangle_count,
+    "connected_components": compute_connected_components,
+    "strongly_connected_components": compute_strongly_connected_components,
+}
+
+
+def run_analysis(analysis, relation, write=True):
+    '''run_analysis computes an analysis over the subgraph of a relationship
+    type and, if write is True, stores it on the nodes under the analysis name
+    :param analysis: one of the keys of ANALYSES, eg pagerank
+    :param relation: the relationship type, eg KINDOF
+    :param write: write the result back to the graph (default True)
+    :returns: dictionary of {node id: value}
     '''
-    response = requests.get(url)
-    result = None
-    if response.status_code == 200:
-        result = response.json()
-    return result
-
-# Eg, how to get a result after submit -problems need to figure out:
-# 1) Under what context should different analyses be run for Cogat?
-# 2) How often should analyses be run, and how? (eg, daily celery job vs. on request)
-# 3) How do we know when the analysis has finished (and results are available?)
-#
-# and how do we implement different similarity metrics for nodes? (eg, wang)
+    subgraph = load_subgraph(relation)
+    if subgraph.n == 0:
+        return {}
+    values = ANALYSES[analysis](subgraph)
+    if write:
+        write_results(subgraph, analysis, values)
+    return dict(zip(subgraph.keys(), values.tolist()))
+
+# Eg, to read results back:
 #
-# MATCH (p:Person) WHERE has(p.pagerank) AND has(p.closeness_centrality)
-# RETURN p.name, p.pagerank as pagerank, p.closeness_centrality
+# MATCH (c:concept) WHERE exists(c.pagerank)
+# RETURN c.name, c.pagerank AS pagerank, c.closeness_centrality
 # ORDER BY pagerank DESC
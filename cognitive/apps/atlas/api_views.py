@@ -1,9 +1,29 @@
-from rest_framework.exceptions import NotFound
+from datetime import datetime, timezone
+import hashlib
+import json
+import os
+
+from django.conf import settings
+from django.http import FileResponse, Http404, StreamingHttpResponse
+from django.utils.decorators import method_decorator
+from django.views.decorators.cache import cache_control
+from django.views.decorators.http import condition, require_GET
+from rest_framework.exceptions import NotFound, ParseError
+from rest_framework.renderers import JSONRenderer
+from rest_framework.permissions import AllowAny
 from rest_framework.response import Response
 from rest_framework import status
 from rest_framework.views import APIView
 
 import cognitive.apps.atlas.query as query
+from cognitive.apps.atlas.autocomplete import (complete, AUTOCOMPLETE_LABELS,
+                                               AUTOCOMPLETE_LIMIT)
+from cognitive.apps.atlas.cache import generation
+from cognitive.apps.atlas.conditional import conditional_detail
+from cognitive.apps.atlas.hierarchy import (CLOSURE_RELATIONS,
+                                            concept_hierarchy,
+                                            concept_relation)
+from cognitive.apps.atlas.snapshot import snapshot_etag
 from .forms import (TaskForm, ConceptForm, ContrastForm, ConditionForm,
                     DisorderForm, TaskDisorderForm)
 
@@ -22,6 +42,60 @@ Task = query.Task()
 Theory = query.Theory()
 User = query.User()
 
+# the most records ?ids= (or a bulk POST) returns at once
+API_BULK_LIMIT = 500
+# the most nodes in a page of a list (?limit=), and how many are read at a
+# time when a list is streamed (?stream=1)
+API_PAGE_LIMIT = 1000
+API_STREAM_CHUNK = 1000
+
+
+def full_records(node_class, ids):
+    '''full_records responds with the full record of each of ids, given as a
+    list or a comma separated string, read with node_class.get_full_many
+    '''
+    if isinstance(ids, str):
+        ids = ids.split(",")
+    if not isinstance(ids, list) or not all(isinstance(x, str) for x in ids):
+        raise ParseError('ids must be a list of ids')
+    ids = [x.strip() for x in ids if x.strip()]
+    if len(ids) > API_BULK_LIMIT:
+        raise ParseError('At most {} ids at once'.format(API_BULK_LIMIT))
+    records = node_class.get_full_many(ids)
+    if not records:
+        raise NotFound('{} not found'.format(node_class.name.capitalize()))
+    return Response(records)
+
+
+def all_records(node_class, request):
+    '''all_records responds with the nodes of node_class: all of them at
+    once by default, a page of ?limit= of them by id after the id ?after=
+    (with the url of the next page, None on the last one), or all of them
+    streamed as one json object per line (ndjson) with ?stream=1
+    '''
+    if request.GET.get("stream", ""):
+        lines = (json.dumps(dict(node), default=str) + "\n"
+                 for node in node_class.iter_all(API_STREAM_CHUNK))
+        return StreamingHttpResponse(lines,
+                                     content_type="application/x-ndjson")
+    limit = request.GET.get("limit", "")
+    after = request.GET.get("after", "")
+    if not limit and not after:
+        return Response(node_class.api_all())
+    try:
+        limit = min(int(limit or API_PAGE_LIMIT), API_PAGE_LIMIT)
+    except ValueError:
+        raise ParseError('limit must be a number')
+    if limit < 1:
+        raise ParseError('limit must be positive')
+    results = node_class.api_all(limit=limit, after=after)
+    next_url = None
+    if len(results) == limit:
+        params = request.GET.copy()
+        params["after"] = results[-1]["id"]
+        next_url = request.build_absolute_uri("?" + params.urlencode())
+    return Response({"results": results, "next": next_url})
+
 
 class NodeAPI(APIView):
     node_class = None
@@ -58,10 +132,13 @@ class NodeAPI(APIView):
 
     def get(self, request, format=None, uid=None):
         id = request.GET.get('id', None)
+        ids = request.GET.get('ids', None)
+        if ids:
+            return full_records(self.node_class, ids)
         if id:
             return Response(self.node_class.get_full(request.GET['id'], 'id'))
         else:
-            return Response(self.node_class.api_all())
+            return all_records(self.node_class, request)
 
     def make_link(self, request, src_id, src_label, dest_id, dest_label, rel,
                   reverse=False):
@@ -114,10 +191,14 @@ class ConceptAPI(NodeAPI):
     form_class = ConceptForm
     name_field = 'term_name'
 
+    @method_decorator(conditional_detail("concept"))
     def get(self, request, format=None):
         id = request.GET.get("id", "")
+        ids = request.GET.get("ids", "")
         name = request.GET.get("name", "")
         contrast_id = request.GET.get("contrast_id", "")
+        if ids:
+            return full_records(Concept, ids)
         if id:
             concept = Concept.get_full(id, 'id')
         elif name:
@@ -125,7 +206,7 @@ class ConceptAPI(NodeAPI):
         elif contrast_id:
             concept = Contrast.api_get_concepts(contrast_id)
         else:
-            concept = Concept.api_all()
+            return all_records(Concept, request)
 
         if concept is None:
             raise NotFound('Concept not found')
@@ -137,16 +218,20 @@ class TaskAPI(NodeAPI):
     form_class = TaskForm
     name_field = 'term_name'
 
+    @method_decorator(conditional_detail("task"))
     def get(self, request, format=None):
         id = request.GET.get("id", "")
+        ids = request.GET.get("ids", "")
         name = request.GET.get("name", "")
 
+        if ids:
+            return full_records(Task, ids)
         if id:
             task = Task.get_full(id, 'id')
         elif name:
             task = Task.get_full(name, 'name')
         else:
-            task = Task.api_all()
+            return all_records(Task, request)
 
         if task is None:
             raise NotFound('Task not found')
@@ -158,34 +243,141 @@ class DisorderAPI(NodeAPI):
     form_class = DisorderForm
     name_field = 'name'
 
+    @method_decorator(conditional_detail("disorder"))
     def get(self, request, format=None):
         id = request.GET.get("id", "")
+        ids = request.GET.get("ids", "")
         name = request.GET.get("name", "")
 
+        if ids:
+            return full_records(Disorder, ids)
         if id:
             disorder = Disorder.get_full(id, 'id')
         elif name:
             disorder = Disorder.get_full(name, 'name')
         else:
-            disorder = Disorder.api_all()
+            return all_records(Disorder, request)
 
         if disorder is None:
             raise NotFound('Disorder not found')
         return Response(disorder)
 
 
+class BulkAPI(APIView):
+    ''' The full records of many terms at once: ?ids=a,b,c, or a POST of
+        {"ids": [a, b, c]} for id lists too long for a url. Only reads, so
+        anyone may POST. '''
+    node_class = None
+    permission_classes = [AllowAny]
+
+    def get(self, request, format=None):
+        return full_records(self.node_class, request.GET.get("ids", ""))
+
+    def post(self, request, format=None):
+        ids = request.data
+        if isinstance(ids, dict):
+            ids = ids.get("ids", "")
+        return full_records(self.node_class, ids)
+
+
 class SearchAPI(APIView):
     def get(self, request, format=None):
         search_classes = [Concept, Contrast, Disorder, Task]
         queries = request.GET.get("q", "")
+        try:
+            limit = int(request.GET.get("limit", query.SEARCH_LIMIT))
+        except ValueError:
+            limit = query.SEARCH_LIMIT
         results = []
         for sclass in search_classes:
-            result = sclass.search_all_fields(queries)
+            result = sclass.search_all_fields(queries, limit=limit)
             results += result
         if not results:
             raise NotFound('No results found')
         return Response(results)
 
+
+def generation_etag(request, *args, **kwargs):
+    '''the results only change with the graph, so the generation of the
+    graph and the query identify them'''
+    key = "{}:{}".format(generation(), request.GET.urlencode())
+    return hashlib.md5(key.encode("utf-8")).hexdigest()
+
+
+class AutocompleteAPI(APIView):
+    ''' Names and aliases starting with ?q=, optionally of the ?type= (eg
+        concept, or disorder,trait), at most ?limit= (default 10, at most 50)
+        of them. '''
+    renderer_classes = [JSONRenderer]
+
+    @method_decorator(cache_control(max_age=60))
+    @method_decorator(condition(etag_func=generation_etag))
+    def get(self, request, format=None):
+        labels = None
+        node_type = request.GET.get("type", "")
+        if node_type:
+            labels = node_type.split(",")
+            for label in labels:
+                if label not in AUTOCOMPLETE_LABELS:
+                    raise NotFound('Unknown type {}'.format(label))
+        try:
+            limit = min(int(request.GET.get("limit", AUTOCOMPLETE_LIMIT)), 50)
+        except ValueError:
+            limit = AUTOCOMPLETE_LIMIT
+        return Response(complete(request.GET.get("q", ""), labels, limit))
+
+
+class ConceptHierarchyAPI(APIView):
+    ''' The concepts the concept ?id= is a kind of (or with ?relation=PARTOF,
+        a part of) through any number of relations, and those that are a
+        kind (or part) of it. With ?other=, whether either concept is a kind
+        (or part) of the other and their lowest common ancestors instead. '''
+    renderer_classes = [JSONRenderer]
+
+    @method_decorator(condition(etag_func=generation_etag))
+    def get(self, request, format=None):
+        uid = request.GET.get("id", "")
+        other = request.GET.get("other", "")
+        relation = request.GET.get("relation", "KINDOF").upper()
+        if relation not in CLOSURE_RELATIONS:
+            raise ParseError('relation must be one of {}'.format(
+                ", ".join(CLOSURE_RELATIONS)))
+        if other:
+            return Response(concept_relation(uid, other, relation))
+        hierarchy = concept_hierarchy(uid, relation)
+        if hierarchy is None:
+            raise NotFound('No concept with id {}'.format(uid))
+        return Response(hierarchy)
+
+
+def snapshot_last_modified(request, *args, **kwargs):
+    try:
+        return datetime.fromtimestamp(
+            os.path.getmtime(settings.ATLAS_SNAPSHOT_PATH), timezone.utc)
+    except OSError:
+        return None
+
+
+def snapshot_etag_func(request, *args, **kwargs):
+    return snapshot_etag()
+
+
+# a plain view, as DRF would refuse an Accept: application/gzip
+@require_GET
+@condition(etag_func=snapshot_etag_func,
+           last_modified_func=snapshot_last_modified)
+def snapshot_download(request):
+    ''' The gzipped json snapshot of every task, concept and disorder (see
+        cognitive/apps/atlas/snapshot.py), answering 304 while it is
+        unchanged. '''
+    try:
+        snapshot = open(settings.ATLAS_SNAPSHOT_PATH, "rb")
+    except OSError:
+        raise Http404('No snapshot yet')
+    return FileResponse(snapshot, as_attachment=True,
+                        filename="atlas.json.gz",
+                        content_type="application/gzip")
+
 # def add_concept_relation(request, uid):
 # def make_link(self, request, src_id, src_label, dest_id, dest_label, rel,
 
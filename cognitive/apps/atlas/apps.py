@@ -2,4 +2,13 @@ from django.apps import AppConfig
 
 
 class AtlasConfig(AppConfig):
-    name = 'atlas'
+    name = 'cognitive.apps.atlas'
+    label = 'atlas'
+
+    def ready(self):
+        # connect the receivers that keep derived data in step with writes
+        import cognitive.apps.atlas.counts  # noqa: F401
+        import cognitive.apps.atlas.search  # noqa: F401
+        import cognitive.apps.atlas.autocomplete  # noqa: F401
+        import cognitive.apps.atlas.choices  # noqa: F401
+        import cognitive.apps.atlas.hierarchy  # noqa: F401
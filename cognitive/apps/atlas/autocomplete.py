@@ -0,0 +1,149 @@
+''' Prefix lookup of node names and aliases for the autocomplete api.
+
+For each label two sorted lists of (key, uid) are kept, keys being the case
+folded words of a name joined by single spaces: one with the whole names and
+aliases, and one with every tail of a name starting at a later word, so that
+"stroop" also finds "color word stroop". A lookup is a bisect to the first key
+with the prefix and a walk forward until limit nodes are found, names before
+inner words, so it costs the same however large the atlas is.
+'''
+from bisect import bisect_left, insort
+
+from cognitive.apps.atlas.indexes import GraphIndex
+from cognitive.apps.atlas.search import tokenize
+from cognitive.apps.atlas.signals import (node_created, node_deleted,
+                                          node_updated)
+from cognitive.settings import graph
+
+AUTOCOMPLETE_LABELS = ["concept", "task", "contrast", "condition", "disorder",
+                       "trait", "behavior", "theory", "battery", "assertion"]
+
+AUTOCOMPLETE_LIMIT = 10
+
+
+def normalize(text):
+    return " ".join(tokenize(text))
+
+
+def node_keys(name, alias=None):
+    '''node_keys returns the (starts, words) keys a node is found under'''
+    starts = set()
+    words = set()
+    for text in [name, alias]:
+        tokens = tokenize(text)
+        if tokens:
+            starts.add(" ".join(tokens))
+        for i in range(1, len(tokens)):
+            words.add(" ".join(tokens[i:]))
+    return sorted(starts), sorted(words - starts)
+
+
+class AutocompleteIndex(GraphIndex):
+
+    def build(self):
+        query = '''MATCH (n) WHERE {}
+                   RETURN labels(n)[0] AS label, n.id AS id, n.name AS name,
+                          n.alias AS alias
+                '''.format(" OR ".join(
+                    "n:{}".format(x) for x in AUTOCOMPLETE_LABELS))
+        self.nodes = {}
+        self.starts = {label: [] for label in AUTOCOMPLETE_LABELS}
+        self.words = {label: [] for label in AUTOCOMPLETE_LABELS}
+        for row in graph.run(query):
+            self.add(row['label'], row['id'], row['name'], row['alias'],
+                     insert=False)
+        for entries in list(self.starts.values()) + list(self.words.values()):
+            entries.sort()
+
+    def add(self, label, uid, name, alias=None, insert=True):
+        if uid is None or not isinstance(name, str):
+            return
+        starts, words = node_keys(name, alias)
+        self.nodes[uid] = {"id": uid, "name": name, "label": label,
+                           "alias": alias, "keys": (starts, words)}
+        for entries, keys in [(self.starts[label], starts),
+                              (self.words[label], words)]:
+            for key in keys:
+                if insert:
+                    insort(entries, (key, uid))
+                else:
+                    entries.append((key, uid))
+
+    def remove(self, uid):
+        node = self.nodes.pop(uid, None)
+        if node is None:
+            return None
+        starts, words = node["keys"]
+        for entries, keys in [(self.starts[node["label"]], starts),
+                              (self.words[node["label"]], words)]:
+            for key in keys:
+                i = bisect_left(entries, (key, uid))
+                if i < len(entries) and entries[i] == (key, uid):
+                    del entries[i]
+        return node
+
+    def apply(self, signal, label=None, uid=None, properties=None,
+              updates=None, **kwargs):
+        if label not in AUTOCOMPLETE_LABELS:
+            return True
+        if signal is node_created:
+            self.add(label, uid, properties.get("name"),
+                     properties.get("alias"))
+        elif signal is node_deleted:
+            self.remove(uid)
+        elif signal is node_updated and ("name" in updates or
+                                         "alias" in updates):
+            node = self.remove(uid)
+            if node is None:
+                return False
+            self.add(label, uid, updates.get("name", node["name"]),
+                     updates.get("alias", node["alias"]))
+        return True
+
+    def lookup(self, entries, prefix, limit, exclude):
+        '''lookup returns up to limit (key, uid) entries with keys starting
+        with prefix, one per node and skipping the nodes in exclude
+        '''
+        hits = {}
+        i = bisect_left(entries, (prefix,))
+        while (len(hits) < limit and i < len(entries) and
+               entries[i][0].startswith(prefix)):
+            key, uid = entries[i]
+            if uid not in hits and uid not in exclude:
+                hits[uid] = key
+            i += 1
+        return [(key, uid) for uid, key in hits.items()]
+
+    def complete(self, text, labels=None, limit=AUTOCOMPLETE_LIMIT):
+        '''complete returns up to limit nodes whose name or alias starts with
+        text, or has a word starting with it, names first and in alphabetical
+        order
+        :param labels: the labels to look in (default all)
+        '''
+        prefix = normalize(text)
+        if not prefix:
+            return []
+        if labels is None:
+            labels = AUTOCOMPLETE_LABELS
+        labels = [x for x in labels if x in self.starts]
+        found = []
+        for entries in [self.starts, self.words]:
+            hits = []
+            for label in labels:
+                hits += self.lookup(entries[label], prefix,
+                                    limit - len(found), found)
+            for _, uid in sorted(hits):
+                if len(found) < limit and uid not in found:
+                    found.append(uid)
+        return [{"id": uid, "name": self.nodes[uid]["name"],
+                 "label": self.nodes[uid]["label"]} for uid in found]
+
+
+autocomplete_index = AutocompleteIndex()
+
+
+def complete(text, labels=None, limit=AUTOCOMPLETE_LIMIT):
+    '''complete looks up text in the index, see AutocompleteIndex.complete'''
+    with autocomplete_index.lock:
+        return autocomplete_index.current().complete(text, labels=labels,
+                                                     limit=limit)
@@ -0,0 +1,110 @@
+''' Result cache for the read methods of the query layer.
+
+Results are stored in the "atlas" cache (see CACHES in settings), a file
+based store shared by every process on a host (uwsgi workers, manage.py
+commands, scripts), so a write made by any of them is seen by all. Every key
+embeds a generation token that is replaced after each write made through
+query.Node (create, update, link, unlink, ...), so entries
+written before an edit can never be read after it. Entries are only ever
+orphaned, never patched, and expire with ATLAS_CACHE_TIMEOUT.
+'''
+import functools
+import hashlib
+import re
+import uuid
+
+from django.conf import settings
+from django.core.cache import caches
+from py2neo import Node as NeoNode, Relationship
+
+from cognitive.apps.atlas.utils import NodeRecord
+
+GENERATION_KEY = "atlas:generation"
+
+_missing = object()
+
+
+def get_cache():
+    return caches["atlas"]
+
+
+def generation():
+    '''generation returns the token of the current state of the graph, creating
+    one if the cache is empty
+    '''
+    cache = get_cache()
+    token = cache.get(GENERATION_KEY)
+    if token is None:
+        cache.add(GENERATION_KEY, uuid.uuid4().hex, None)
+        token = cache.get(GENERATION_KEY)
+    return token
+
+
+def invalidate():
+    '''invalidate retires every cached result by replacing the generation
+    token. A fresh random token (rather than a counter) means two workers
+    writing at once can never hand out the same token. Returns the old and
+    new tokens.
+    '''
+    old = generation()
+    new = uuid.uuid4().hex
+    get_cache().set(GENERATION_KEY, new, None)
+    return old, new
+
+
+def make_key(label, method, args, kwargs):
+    '''make_key builds a cache key for one call of a read method, per label
+    and per uid (the first argument), eg atlas:<generation>:task:tsk_4a57:get
+    '''
+    uid = args[0] if args and isinstance(args[0], str) else ""
+    digest = hashlib.md5(
+        repr((args, sorted(kwargs.items()))).encode("utf-8")).hexdigest()
+    return "atlas:{}:{}:{}:{}:{}".format(
+        generation(), label, re.sub(r"[^\w.-]", "_", uid)[:64], method,
+        digest)
+
+
+def to_plain(value):
+    '''to_plain copies query results into plain python data that can be
+    pickled into the cache: py2neo nodes become NodeRecords and relationships
+    dictionaries of their properties.
+    '''
+    if isinstance(value, NeoNode):
+        return NodeRecord(value)
+    if isinstance(value, Relationship):
+        return dict(value)
+    if isinstance(value, dict):
+        return value.__class__(
+            (to_plain(k), to_plain(v)) for k, v in value.items())
+    if isinstance(value, (list, tuple)):
+        return value.__class__(to_plain(x) for x in value)
+    return value
+
+
+def cached_call(label, name, args, kwargs, call):
+    '''cached_call returns the cached result for a read, running call() and
+    storing its result on a miss
+    '''
+    if not settings.ATLAS_CACHE_ENABLED:
+        return call()
+    cache = get_cache()
+    key = make_key(label, name, args, kwargs)
+    value = cache.get(key, _missing)
+    if value is _missing:
+        value = to_plain(call())
+        cache.set(key, value, settings.ATLAS_CACHE_TIMEOUT)
+    return value
+
+
+def cached(method):
+    '''cached wraps a read method of query.Node, keying its results on the
+    label of the node class and the method's arguments. The qualified method
+    name is part of the key, so a subclass override calling super() does not
+    share an entry with the base implementation.
+    '''
+    @functools.wraps(method)
+    def wrapper(self, *args, **kwargs):
+        return cached_call(self.name, method.__qualname__, args, kwargs,
+                           lambda: method(self, *args, **kwargs))
+    return wrapper
+
@@ -0,0 +1,93 @@
+''' Choices for the form fields that pick an existing node (the concepts a
+task asserts, the tasks of a battery, the phenotypes of a task, ...).
+
+For each label the names of its nodes are held in memory by id, with a
+version that moves on whenever a node of the label is created, renamed or
+deleted. Forms check a submitted id against it and name the selected node
+without asking the graph, and the sorted list of choices is only made (once
+per version) for the few fields that still list every node.
+'''
+from cognitive.apps.atlas.indexes import GraphIndex
+from cognitive.apps.atlas.signals import (node_created, node_deleted,
+                                          node_updated)
+from cognitive.settings import graph
+
+CHOICE_LABELS = ["concept", "task", "battery", "disorder", "behavior", "trait",
+                 "concept_class"]
+
+
+class ChoiceProvider(GraphIndex):
+
+    def __init__(self):
+        self.names = {}
+        self.versions = {}
+        self.sorted = {}
+        super(ChoiceProvider, self).__init__()
+
+    def build(self):
+        query = '''MATCH (n) WHERE {}
+                   RETURN labels(n)[0] AS label, n.id AS id, n.name AS name
+                '''.format(" OR ".join(
+                    "n:{}".format(x) for x in CHOICE_LABELS))
+        self.names = {label: {} for label in CHOICE_LABELS}
+        for row in graph.run(query):
+            if row['id'] is not None:
+                self.names[row['label']][row['id']] = row['name']
+        for label in CHOICE_LABELS:
+            self.versions[label] = self.versions.get(label, 0) + 1
+
+    def apply(self, signal, label=None, uid=None, properties=None,
+              updates=None, **kwargs):
+        if label not in CHOICE_LABELS:
+            return True
+        names = self.names[label]
+        if signal is node_created:
+            if uid is None:
+                return True
+            names[uid] = properties.get("name")
+        elif signal is node_deleted:
+            if uid not in names:
+                return True
+            del names[uid]
+        elif signal is node_updated and "name" in updates:
+            if uid not in names:
+                return False
+            names[uid] = updates["name"]
+        else:
+            return True
+        self.versions[label] += 1
+        return True
+
+    def name(self, label, uid):
+        '''name returns the name of node uid of label, None if there is none'''
+        return self.names[label].get(uid)
+
+    def choices(self, label):
+        '''choices returns [(id, name)] for every node of label, by name'''
+        version, choices = self.sorted.get(label, (None, None))
+        if version != self.versions[label]:
+            choices = sorted(self.names[label].items(),
+                             key=lambda x: (str(x[1]).casefold(), x[0]))
+            self.sorted[label] = (self.versions[label], choices)
+        return choices
+
+
+choice_provider = ChoiceProvider()
+
+
+def choices(label):
+    '''choices lists the (id, name) of every node of label, by name'''
+    with choice_provider.lock:
+        return choice_provider.current().choices(label)
+
+
+def choice_label(labels, uid):
+    '''choice_label returns (label, name) for node uid if it has one of labels,
+    or None
+    '''
+    with choice_provider.lock:
+        provider = choice_provider.current()
+        for label in labels:
+            if uid in provider.names[label]:
+                return label, provider.name(label, uid)
+    return None
@@ -0,0 +1,128 @@
+''' Conditional GET for the detail pages, the json views and the api.
+
+A term's version (Node.version: its last_updated, the latest last_updated of
+the nodes up to two relations away and how many of them there are) is read
+with one small query. The ETag (and for json, Last-Modified) is made from it,
+so a client polling an unchanged term gets 304 Not Modified without the
+term being read or its page rendered. The pages also depend on who is
+looking and on the node counts in the header, so their ETag includes those,
+and none is given while messages are waiting to be shown.
+'''
+from datetime import datetime, timezone
+import functools
+import hashlib
+
+from django.contrib.messages import get_messages
+from django.middleware.csrf import get_token
+from django.views.decorators.http import condition
+
+from cognitive.apps.atlas.counts import get_counts
+from cognitive.apps.atlas.query import Node
+
+
+def node_version(request, label, value, field="id"):
+    '''node_version returns Node.version for the term, read once per request
+    (the ETag and Last-Modified functions both need it)
+    '''
+    versions = request.__dict__.setdefault("_node_versions", {})
+    key = (label, field, value)
+    if key not in versions:
+        versions[key] = Node(label).version(value, field)
+    return versions[key]
+
+
+def version_etag(version, *extra):
+    return hashlib.md5(repr((version,) + extra).encode("utf-8")).hexdigest()
+
+
+def version_last_modified(version):
+    stamps = [x for x in version[:2] if x is not None]
+    if not stamps:
+        return None
+    return datetime.fromtimestamp(max(stamps), timezone.utc)
+
+
+def csrf_secret(request):
+    '''csrf_secret returns the csrf secret of the request, making one (to be
+    set as the cookie) if there is none yet, so that the page rendered next
+    has the same one
+    '''
+    get_token(request)
+    return request.META.get("CSRF_COOKIE")
+
+
+def conditional_page(label, extra=None):
+    '''conditional_page decorates the detail view of a term of label,
+    view(request, uid, return_context=False), to answer 304 while the term
+    is unchanged. Calls asking for the context are passed straight through.
+    The pages embed csrf tokens, so the csrf secret (rotated on login) is part
+    of the ETag.
+    :param extra: extra(uid) returns what else the page shows, to be part of
+        the ETag, for pages showing more than two relations away
+    '''
+    def etag(request, uid, *args, **kwargs):
+        version = node_version(request, label, uid)
+        if version is None or len(get_messages(request)):
+            return None
+        user = request.user
+        return version_etag(version, label, user.pk,
+                            getattr(user, "rank", None),
+                            csrf_secret(request),
+                            sorted(get_counts().items()),
+                            extra(uid) if extra else None)
+
+    def decorator(view):
+        conditional = condition(etag_func=etag)(view)
+
+        @functools.wraps(view)
+        def wrapper(request, uid, return_context=False):
+            if return_context:
+                return view(request, uid, return_context=True)
+            return conditional(request, uid)
+        return wrapper
+    return decorator
+
+
+def conditional_json(label):
+    '''conditional_json decorates a view(request, uid) rendering the json of a
+    term of label to answer 304 while the term is unchanged
+    '''
+    def version(request, uid, *args, **kwargs):
+        return node_version(request, label, uid)
+
+    return node_condition(label, version)
+
+
+def conditional_detail(label):
+    '''conditional_detail decorates the get of an api view to answer 304 when
+    it returns the term of label given by ?id= or ?name=, and it is unchanged
+    '''
+    def version(request, *args, **kwargs):
+        if request.GET.get("ids", ""):
+            return None
+        for field in ("id", "name"):
+            value = request.GET.get(field, "")
+            if value:
+                return node_version(request, label, value, field)
+        return None
+
+    return node_condition(label, version)
+
+
+def node_condition(label, version):
+    '''node_condition is django's condition decorator with the ETag and
+    Last-Modified made from version(request, *args, **kwargs)
+    '''
+    def etag(request, *args, **kwargs):
+        current = version(request, *args, **kwargs)
+        if current is None:
+            return None
+        return version_etag(current, label, request.GET.urlencode())
+
+    def last_modified(request, *args, **kwargs):
+        current = version(request, *args, **kwargs)
+        if current is None:
+            return None
+        return version_last_modified(current)
+
+    return condition(etag_func=etag, last_modified_func=last_modified)
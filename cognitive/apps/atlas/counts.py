@@ -0,0 +1,96 @@
+''' Materialized node counts for the totals shown on every page.
+
+The count of each label in COUNTED_LABELS is kept in the "atlas" cache under
+atlas:count:<label>, so that rendering a page costs no graph queries. The
+counts are computed in one query the first time they are needed, then moved
+by one on every node_created / node_deleted signal from query.Node. Writes
+that bypass the query layer (scripts, the neo4j browser) make them drift,
+which the reconcile_counts management command repairs and reports; it is run
+periodically by uwsgi (see compose/uwsgi/uwsgi.ini), and reaches the web
+workers through the shared atlas cache. The counts also expire with
+ATLAS_CACHE_TIMEOUT, so drift never outlives it even where the cache is not
+shared.
+'''
+from django.conf import settings
+from django.dispatch import receiver
+
+from cognitive.apps.atlas.cache import get_cache
+from cognitive.apps.atlas.signals import node_created, node_deleted
+from cognitive.settings import graph
+
+COUNTED_LABELS = ["concept", "task", "disorder", "theory", "battery",
+                  "behavior", "trait"]
+
+
+def count_key(label):
+    return "atlas:count:{}".format(label)
+
+
+def count_nodes(labels=None):
+    '''count_nodes returns the true number of nodes of each label, read from
+    the graph's count store in a single query
+    :param labels: labels to count (default COUNTED_LABELS)
+    '''
+    if labels is None:
+        labels = COUNTED_LABELS
+    query = " UNION ALL ".join(
+        "MATCH (n:{0}) RETURN '{0}' AS label, count(n) AS count".format(label)
+        for label in labels)
+    return {row['label']: row['count'] for row in graph.run(query)}
+
+
+def store_counts(counts):
+    get_cache().set_many(
+        {count_key(label): count for label, count in counts.items()},
+        settings.ATLAS_CACHE_TIMEOUT)
+
+
+def get_counts():
+    '''get_counts returns a dictionary of {label: count} for COUNTED_LABELS,
+    materializing the counts from the graph if they are not stored yet
+    '''
+    if not settings.ATLAS_CACHE_ENABLED:
+        return count_nodes()
+    keys = {count_key(label): label for label in COUNTED_LABELS}
+    stored = get_cache().get_many(list(keys))
+    if len(stored) < len(keys):
+        counts = count_nodes()
+        store_counts(counts)
+        return counts
+    return {keys[key]: count for key, count in stored.items()}
+
+
+def reconcile():
+    '''reconcile recomputes the true counts, stores them, and returns the
+    drift as {label: (stored, true)} for every label whose stored count was
+    missing or wrong
+    '''
+    keys = {count_key(label): label for label in COUNTED_LABELS}
+    stored = get_cache().get_many(list(keys))
+    stored = {keys[key]: count for key, count in stored.items()}
+    counts = count_nodes()
+    store_counts(counts)
+    return {label: (stored.get(label), count)
+            for label, count in counts.items() if stored.get(label) != count}
+
+
+def adjust(label, delta):
+    '''adjust moves the stored count of a label by delta. A count that has not
+    been materialized is left alone, get_counts will compute it.
+    '''
+    if label not in COUNTED_LABELS or not settings.ATLAS_CACHE_ENABLED:
+        return
+    try:
+        get_cache().incr(count_key(label), delta)
+    except ValueError:
+        pass
+
+
+@receiver(node_created)
+def count_created(sender, label, **kwargs):
+    adjust(label, 1)
+
+
+@receiver(node_deleted)
+def count_deleted(sender, label, **kwargs):
+    adjust(label, -1)
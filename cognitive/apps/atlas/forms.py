@@ -1,12 +1,12 @@
 from django import forms
 from django.core.exceptions import ValidationError
-from django.urls import reverse
+from django.urls import reverse, reverse_lazy
 
 from crispy_forms.helper import FormHelper
 from crispy_forms.layout import Div, Field, HTML, Layout, Reset, Submit
 
-from cognitive.apps.atlas.query import Assertion, Disorder, Task, Battery, ConceptClass, Concept
-import cognitive.apps.atlas.query as query
+from cognitive.apps.atlas.choices import choice_label, choices
+from cognitive.apps.atlas.query import Assertion, Task, Concept
 
 
 def set_field_html_name(cls, new_name):
@@ -22,22 +22,81 @@ def set_field_html_name(cls, new_name):
     cls.widget.render = _widget_render_wrapper
 
 
+class RemoteLookupSelect(forms.Select):
+    '''RemoteLookupSelect renders only the selected option, the others are
+    looked up in the autocomplete api as the user types (see
+    remote_lookup.js)
+    '''
+
+    def __init__(self, labels, suffixes=None, attrs=None):
+        self.labels = labels
+        self.suffixes = suffixes or {}
+        attrs = dict(attrs or {})
+        attrs.update({
+            "class": "remote-lookup",
+            "data-lookup-url": reverse_lazy("autocomplete_api"),
+            "data-lookup-types": ",".join(labels),
+        })
+        super(RemoteLookupSelect, self).__init__(attrs)
+
+    def optgroups(self, name, value, attrs=None):
+        self.choices = []
+        for uid in value:
+            found = choice_label(self.labels, uid) if uid else None
+            if found is not None:
+                label, node_name = found
+                self.choices.append(
+                    (uid, "{}{}".format(node_name, self.suffixes.get(label, ""))))
+        return super(RemoteLookupSelect, self).optgroups(name, value, attrs)
+
+
+class GraphChoiceField(forms.ChoiceField):
+    '''GraphChoiceField picks an existing node of one of labels by id. The
+    choices are not listed, a submitted id is checked with the choice
+    provider (see choices.py)
+    :param labels: the labels of the nodes that can be picked
+    :param suffixes: text to add to the names of the nodes of a label, eg
+        {"disorder": " (Disorder)"}
+    '''
+
+    def __init__(self, labels, suffixes=None, **kwargs):
+        self.labels = labels
+        kwargs.setdefault("widget", RemoteLookupSelect(labels, suffixes))
+        super(GraphChoiceField, self).__init__(**kwargs)
+
+    def valid_value(self, value):
+        return choice_label(self.labels, value) is not None
+
+
 class TaskForm(forms.Form):
     term_name = forms.CharField(required=True)
     definition_text = forms.CharField(required=True)
 
 
+def concept_class_choices():
+    '''concept_class_choices lists the concept classes for ConceptForm. It is
+    called each time a form is made rather than when this module is imported,
+    and comes from the choice provider rather than the graph
+    '''
+    return [(None, "-no-")] + [(uid, "-yes- " + str(name))
+                               for uid, name in choices("concept_class")]
+
+
+def assertion_choices():
+    '''assertion_choices lists the assertions for TheoryAssertionForm. Most
+    have no name, so they are not in the autocomplete index and are listed
+    by subject and predicate instead of looked up
+    '''
+    return Assertion().descriptions()
+
+
 class ConceptForm(forms.Form):
     name = forms.CharField(required=True, label="Term:")
     definition_text = forms.CharField(required=True, widget=forms.Textarea(),
                                       label="Your Definition:")
-    concept_class = ConceptClass()
-    choices = [(x['id'], "-yes- " + str(x['name']))
-               for x in concept_class.all()]
-    choices.insert(0, (None, "-no-"))
     cc_label = "In your opinion, does this concept belong to a larger class of concepts?"
     concept_class = forms.ChoiceField(
-        choices=choices, label=cc_label, required=False)
+        choices=concept_class_choices, label=cc_label, required=False)
 
     def __init__(self, concept_id, *args, **kwargs):
         if not args or not args[0].get('submit'):
@@ -161,9 +220,8 @@ class DisorderForm(forms.Form):
 class TheoryAssertionForm(forms.Form):
     def __init__(self, *args, **kwargs):
         super(TheoryAssertionForm, self).__init__(*args, **kwargs)
-        assertions = Assertion()
-        choices = [(x['id'], x['name']) for x in assertions.all()]
-        self.fields['assertions'] = forms.ChoiceField(choices=choices)
+        self.fields['assertions'] = forms.ChoiceField(
+            choices=assertion_choices)
         self.helper = FormHelper()
         self.helper.form_tag = False
         self.helper.add_input(Submit('submit', 'Submit'))
@@ -173,23 +231,16 @@ class TheoryAssertionForm(forms.Form):
 class TaskDisorderForm(forms.Form):
     def __init__(self, task_id, *args, **kwargs):
         super(TaskDisorderForm, self).__init__(*args, **kwargs)
-        disorders = Disorder()
-        behaviors = query.Behavior()
-        traits = query.Trait()
         tasks = Task()
         contrasts = tasks.get_relation(task_id, "HASCONTRAST")
 
         cont_choices = [(x['id'], x['name']) for x in contrasts]
         self.fields['contrasts'] = forms.ChoiceField(choices=cont_choices)
 
-        pheno_choices = []
-        pheno_choices.extend(
-            [(x['id'], ''.join([x['name'], " (Disorder)"])) for x in disorders.all()])
-        pheno_choices.extend(
-            [(x['id'], ''.join([x['name'], " (Behavior)"])) for x in behaviors.all()])
-        pheno_choices.extend(
-            [(x['id'], ''.join([x['name'], " (Trait)"])) for x in traits.all()])
-        self.fields['disorders'] = forms.ChoiceField(choices=pheno_choices)
+        self.fields['disorders'] = GraphChoiceField(
+            ["disorder", "behavior", "trait"],
+            suffixes={"disorder": " (Disorder)", "behavior": " (Behavior)",
+                      "trait": " (Trait)"})
 
         self.helper = FormHelper()
         self.helper.form_tag = False
@@ -200,7 +251,6 @@ class TaskDisorderForm(forms.Form):
 class TaskConceptForm(forms.Form):
     def __init__(self, task_id, *args, **kwargs):
         super(TaskConceptForm, self).__init__(*args, **kwargs)
-        concept = Concept()
         tasks = Task()
         contrasts = tasks.get_relation(task_id, "HASCONTRAST")
 
@@ -208,8 +258,7 @@ class TaskConceptForm(forms.Form):
         self.fields['concept-contrasts'] = forms.ChoiceField(
             choices=cont_choices)
 
-        concept_choices = [(x['id'], x['name']) for x in concept.all()]
-        self.fields['concept'] = forms.ChoiceField(choices=concept_choices)
+        self.fields['concept'] = GraphChoiceField(["concept"])
 
         self.helper = FormHelper()
         self.helper.attrs = {'id': 'concept-form'}
@@ -251,10 +300,7 @@ class BatteryForm(forms.Form):
 class ConceptTaskForm(forms.Form):
     def __init__(self, *args, **kwargs):
         super(ConceptTaskForm, self).__init__(*args, **kwargs)
-
-        tasks = Task()
-        choices = [(x['id'], x['name']) for x in tasks.all()]
-        self.fields['tasks'] = forms.ChoiceField(choices=choices)
+        self.fields['tasks'] = GraphChoiceField(["task"])
 
         self.helper = FormHelper()
         self.helper.form_class = "hidden"
@@ -265,10 +311,7 @@ class ConceptTaskForm(forms.Form):
 class BatteryBatteryForm(forms.Form):
     def __init__(self, *args, **kwargs):
         super(BatteryBatteryForm, self).__init__(*args, **kwargs)
-
-        batteries = Battery()
-        choices = [(x['id'], x['name']) for x in batteries.all()]
-        self.fields['batteries'] = forms.ChoiceField(choices=choices)
+        self.fields['batteries'] = GraphChoiceField(["battery"])
 
         self.helper = FormHelper()
         self.helper.form_tag = False
@@ -279,10 +322,7 @@ class BatteryBatteryForm(forms.Form):
 class BatteryTaskForm(forms.Form):
     def __init__(self, *args, **kwargs):
         super(BatteryTaskForm, self).__init__(*args, **kwargs)
-
-        tasks = Task()
-        choices = [(x['id'], x['name']) for x in tasks.all()]
-        self.fields['tasks'] = forms.ChoiceField(choices=choices)
+        self.fields['tasks'] = GraphChoiceField(["task"])
 
         self.helper = FormHelper()
         self.helper.form_tag = False
@@ -314,14 +354,12 @@ class DisorderDisorderForm(forms.Form):
     def __init__(self, name=None, *args, **kwargs):
         super(DisorderDisorderForm, self).__init__(*args, **kwargs)
         name = (name if name is not None else '')
-        disorders = Disorder()
         type_choices = [
             ('parent', '{} is a kind of <selected disorder>'.format(name)),
             ('child', '<selected disorder> is a kind of {}'.format(name))
         ]
-        dis_choices = [(x['id'], x['name']) for x in disorders.all()]
         self.fields['type'] = forms.ChoiceField(choices=type_choices)
-        self.fields['disorders'] = forms.ChoiceField(choices=dis_choices)
+        self.fields['disorders'] = GraphChoiceField(["disorder"])
         self.helper = FormHelper()
         self.helper.form_tag = False
         self.helper.add_input(Submit('submit', 'Submit'))
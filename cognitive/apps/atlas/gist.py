@@ -0,0 +1,69 @@
+''' Graph gists: the cypher that recreates a term and its neighbourhood, for
+previewing it at graphgist.org or downloading it.
+
+The neighbourhood is every node up to depth outgoing relations away from the
+term (closest first, at most max_nodes of them counting the term) and the
+relations between them, read with one variable-length query. gist_lines
+yields the create statements for it, nodes first, so a download can be
+streamed as it is written.
+'''
+from collections import OrderedDict
+
+from cognitive.apps.atlas.query import cypher_node, cypher_relation
+from cognitive.settings import graph
+
+GIST_DEPTH = 2
+GIST_MAX_NODES = 500
+
+
+def neighbourhood(label, uid, depth=GIST_DEPTH, max_nodes=GIST_MAX_NODES):
+    '''neighbourhood returns (nodes, relations) for the term uid of label:
+    nodes an OrderedDict of {id: (label, name)}, the term first, relations a
+    list of (start id, relation type, end id) between them. Both are empty if
+    there is no such term.
+    :param label: the label of the term, eg task
+    :param uid: the unique id of the term
+    :param depth: how many relations away to follow
+    :param max_nodes: the most nodes to return, the closest ones first
+    '''
+    query = '''MATCH (n:{}) WHERE n.id = $id
+               OPTIONAL MATCH path = (n)-[*1..{}]->(m)
+               WHERE exists(m.id) AND m <> n
+               WITH n, m, min(length(path)) AS distance
+               ORDER BY distance, m.id
+               WITH n, collect(m)[..$limit] AS found
+               WITH [n] + found AS nodes
+               RETURN [x IN nodes | [x.id, labels(x)[0], x.name]] AS nodes,
+                      [x IN nodes | [(x)-[r]->(y) WHERE y IN nodes |
+                                     [x.id, type(r), y.id]]] AS relations
+            '''.format(label, int(depth))
+    rows = graph.run(query, {'id': uid, 'limit': max(max_nodes - 1, 0)}).data()
+    nodes = OrderedDict()
+    relations = []
+    if not rows:
+        return nodes, relations
+    for node_id, node_label, name in rows[0]['nodes']:
+        nodes[node_id] = (node_label, name)
+    seen = set()
+    for outgoing in rows[0]['relations']:
+        for relation in outgoing:
+            relation = tuple(relation)
+            if relation not in seen:
+                seen.add(relation)
+                relations.append(relation)
+    return nodes, relations
+
+
+def gist_cypher(nodes, relations):
+    '''gist_cypher yields the cypher_node line of each of nodes, then the
+    cypher_relation line of each of relations, as returned by neighbourhood
+    '''
+    for node_id, (node_label, name) in nodes.items():
+        yield cypher_node(node_id, node_label, name, node_id)
+    for start, relation_type, end in relations:
+        yield cypher_relation(relation_type, start, end)
+
+
+def gist_lines(label, uid, depth=GIST_DEPTH, max_nodes=GIST_MAX_NODES):
+    '''gist_lines yields the lines of the gist of the term's neighbourhood'''
+    return gist_cypher(*neighbourhood(label, uid, depth, max_nodes))
@@ -1,14 +1,15 @@
-from django.http import HttpResponse, JsonResponse
+from django.http import Http404, JsonResponse, StreamingHttpResponse
 from django.shortcuts import render
-from django.template import loader, Context
+from django.template import loader
 
-from cognitive.apps.atlas.query import Concept, Condition, Contrast, Task
-from cognitive.apps.atlas.utils import merge_cypher
+from cognitive.apps.atlas.conditional import conditional_json
+from cognitive.apps.atlas.gist import (GIST_DEPTH, GIST_MAX_NODES,
+                                       gist_cypher, gist_lines, neighbourhood)
+from cognitive.apps.atlas.query import Concept, Contrast, Task
 from cognitive.apps.atlas.views import node_class_lookup
 
 Task = Task()
 Concept = Concept()
-Condition = Condition()
 Contrast = Contrast()
 
 # Return full graph visualizations
@@ -39,11 +40,13 @@ def explore_graph(request):
 
 
 # Return just json
+@conditional_json("task")
 def task_json(request, uid):
     nodes = Task.get_full(uid, 'id')
     return JsonResponse(nodes)
 
 
+@conditional_json("concept")
 def concept_json(request, uid):
     nodes = Concept.get_full(uid, 'id')
     return JsonResponse(nodes)
@@ -53,6 +56,32 @@ def concept_json(request, uid):
 # graph gists
 
 
+def gist_params(request):
+    '''gist_params reads ?depth= and ?max_nodes= from request, within the
+    defaults' bounds
+    '''
+    try:
+        depth = min(max(int(request.GET.get("depth", GIST_DEPTH)), 1),
+                    GIST_DEPTH + 1)
+    except ValueError:
+        depth = GIST_DEPTH
+    try:
+        max_nodes = min(max(int(request.GET.get("max_nodes", GIST_MAX_NODES)),
+                            1), GIST_MAX_NODES)
+    except ValueError:
+        max_nodes = GIST_MAX_NODES
+    return depth, max_nodes
+
+
+def gist_context(label, uid, request, query):
+    nodes, relations = neighbourhood(label, uid, *gist_params(request))
+    lines = list(gist_cypher(nodes, relations))
+    return {"relations": "\n".join(lines[len(nodes):]),
+            "nodes": "\n".join(lines[:len(nodes)]),
+            "node_type": label,
+            "query": query}
+
+
 def contrast_gist(request, uid, query=None, return_gist=False):
     '''contrast_gist is currently a sub for some "view_contrast" view (that should
     be defined as views.view_contrast, as a simple graph seems more appropriate
@@ -61,28 +90,22 @@ def contrast_gist(request, uid, query=None, return_gist=False):
     :param query: a custom query. If not defined, will show a table of concepts asserted.
     :param return_gist: if True, will return the context with all needed variables
     '''
-    contrast_cypher, lookup = Contrast.cypher(uid, return_lookup=True)
-    contrast_cypher = add_cypher_relations(contrast_cypher, lookup)
-
-    contrast = Contrast.get(uid)[0]
+    contrast = Contrast.get(uid, get_relations=False)[0]
     if query is None:
         query = '''MATCH (c:condition)-[r:HASCONTRAST]->(con:contrast) WHERE con.id='%s' RETURN c.name as \
                     condition_name,con.name as contrast_name;" % (uid)'''
 
-    # Join by newline
-    contrast_cypher["links"] = "\n".join(contrast_cypher["links"])
-    contrast_cypher["nodes"] = "\n".join(contrast_cypher["nodes"])
-
-    context = {"relations": contrast_cypher["links"],
-               "nodes": contrast_cypher["nodes"],
-               "node_type": "contrast",
-               "node_name": contrast["name"],
-               "query": query}
+    context = gist_context("contrast", uid, request, query)
+    context["node_name"] = contrast["name"]
     if return_gist is True:
         return context
     return render(request, 'graph/gist.html', context)
 
 
+TASK_GIST_QUERY = ("MATCH (t:task)-[r:ASSERTS]->(c:concept) RETURN t.name as "
+                   "task_name,c.name as concept_name;")
+
+
 # Eg, This is the URL that can be linked to from a page
 # http://portal.graphgist.org/graph_gists/by_url?url=hello
 def task_gist(request, uid, query=None, return_gist=False):
@@ -91,22 +114,12 @@ def task_gist(request, uid, query=None, return_gist=False):
     :param query: a custom query. If not defined, will show a table of concepts asserted.
     :param return_gist: if True, will return the context with all needed variables
     '''
-    task_cypher, lookup = Task.cypher(uid, return_lookup=True)
-    task_cypher = add_cypher_relations(task_cypher, lookup)
-
-    task = Task.get(uid)[0]
+    task = Task.get(uid, get_relations=False)[0]
     if query is None:
-        query = "MATCH (t:task)-[r:ASSERTS]->(c:concept) RETURN t.name as task_name,c.name as concept_name;"
+        query = TASK_GIST_QUERY
 
-    # Join by newline
-    task_cypher["links"] = "\n".join(task_cypher["links"])
-    task_cypher["nodes"] = "\n".join(task_cypher["nodes"])
-
-    context = {"relations": task_cypher["links"],
-               "nodes": task_cypher["nodes"],
-               "node_type": "task",
-               "node_name": task["name"],
-               "query": query}
+    context = gist_context("task", uid, request, query)
+    context["node_name"] = task["name"]
     if return_gist is True:
         return context
     return render(request, 'graph/gist.html', context)
@@ -114,47 +127,29 @@ def task_gist(request, uid, query=None, return_gist=False):
 
 def download_task_gist(request, uid, query=None):
     '''download_task_gist generates the equivalent task gist, but instead downloads
-    it as a .gist file for the user to save locally
+    it as a .gist file for the user to save locally. The cypher is streamed
+    line by line between the head and tail of the gist template.
     :param uid: the uid for the task
     :param query: a custom query. If not defined, will show a table of concepts asserted.
     '''
-    context = task_gist(request, uid, query, return_gist=True)
-
-    # Create the HttpResponse object with the appropriate CSV header.
-    response = HttpResponse(content_type='text/csv')
+    try:
+        task = Task.get(uid, get_relations=False)[0]
+    except IndexError:
+        raise Http404("Task does not exist")
+    context = {"node_type": "task", "node_name": task["name"],
+               "query": query or TASK_GIST_QUERY}
+    depth, max_nodes = gist_params(request)
+
+    def content():
+        yield loader.render_to_string('graph/gist_head.html', context)
+        for line in gist_lines("task", uid, depth, max_nodes):
+            yield line + "\n"
+        yield loader.render_to_string('graph/gist_tail.html', context)
+
+    response = StreamingHttpResponse(content(), content_type='text/plain')
     response['Content-Disposition'] = 'attachment; filename="cogat_%s.gist"' % (
         uid)
-
-    t = loader.get_template('graph/gist.html')
-    c = Context(context)
-    response.write(t.render(c))
     return response
 
 # Note: may need to this:
 # https://docs.djangoproject.com/en/1.9/howto/outputting-csv/
-
-# Additional Graph Functions
-
-
-def add_cypher_relations(cypher, lookup):
-    '''add_cypher_relations will look up relations for connected nodes returned from an object. This is akin to
-    adding one layer of the tree to the graph (and the function could be modified to add more)
-    :param cypher: the cypher object, a dictionary with nodes and links as keys, each a list of them.
-    '''
-    node_types = list(lookup)
-    for node_type in node_types:
-        for term in lookup[node_type]:
-            if node_type == "condition":
-                new_cypher, lookup = Condition.cypher(
-                    term, lookup=lookup, return_lookup=True)
-            elif node_type == "task":
-                new_cypher, lookup = Task.cypher(
-                    term, lookup=lookup, return_lookup=True)
-            elif node_type == "contrast":
-                new_cypher, lookup = Contrast.cypher(
-                    term, lookup=lookup, return_lookup=True)
-            elif node_type == "concept":
-                new_cypher, lookup = Concept.cypher(
-                    term, lookup=lookup, return_lookup=True)
-            cypher = merge_cypher(cypher, new_cypher)
-    return cypher
@@ -0,0 +1,447 @@
+''' Hierarchies of the atlas, held in memory.
+
+The ISA hierarchy of the disorders: every disorder and every ISA relation
+between two of them is read with one query, and the tree (each disorder under
+the disorders it ISA, children by name, roots being the disorders that are not
+a kind of another) is kept by id, so the tree view of the disorders page and
+the lookup of a subtree only walk the part of the tree they show.
+
+The KINDOF and PARTOF hierarchies of the concepts: every concept and every
+KINDOF and PARTOF relation between two of them is read with one query, and
+the closure of each is kept as a set of ancestors per concept (an int with
+one bit per concept), so asking whether a concept is a kind (or part) of
+another, or what the lowest common ancestors of two concepts are, takes a
+few operations on ints. Ancestors and descendants are listed by walking the
+relations, nearest first.
+
+Linking, unlinking, creating, renaming and deleting terms through query.Node
+update both in place: a link adds the ancestors of the new parent to the
+concept and its descendants, an unlink works them out again for those only.
+'''
+from collections import OrderedDict
+
+from cognitive.apps.atlas.indexes import GraphIndex
+from cognitive.apps.atlas.signals import (node_created, node_deleted,
+                                          node_updated, node_linked,
+                                          node_unlinked)
+from cognitive.settings import graph
+
+HIERARCHY_LABEL = "disorder"
+HIERARCHY_RELATION = "ISA"
+
+
+def name_key(names):
+    return lambda uid: (str(names.get(uid)).casefold(), uid)
+
+
+class DisorderHierarchy(GraphIndex):
+
+    def __init__(self):
+        self.names = {}
+        self.parents = {}
+        self.children = {}
+        super(DisorderHierarchy, self).__init__()
+
+    def build(self):
+        query = '''MATCH (d:{0}) WHERE exists(d.id)
+                   OPTIONAL MATCH (d)-[:{1}]->(p:{0}) WHERE exists(p.id)
+                   RETURN d.id AS id, d.name AS name,
+                          collect(p.id) AS parents
+                '''.format(HIERARCHY_LABEL, HIERARCHY_RELATION)
+        self.names = {}
+        self.parents = {}
+        self.children = {}
+        for row in graph.run(query):
+            self.names[row['id']] = row['name']
+            self.parents[row['id']] = set(row['parents'])
+        for uid, parents in self.parents.items():
+            self.children.setdefault(uid, [])
+            for parent in parents:
+                self.children.setdefault(parent, []).append(uid)
+        for children in self.children.values():
+            children.sort(key=name_key(self.names))
+
+    def apply(self, signal, label=None, uid=None, properties=None,
+              updates=None, relation_type=None, endnode_type=None,
+              endnode_id=None, **kwargs):
+        if signal in (node_linked, node_unlinked):
+            if (label != HIERARCHY_LABEL or endnode_type != HIERARCHY_LABEL
+                    or relation_type != HIERARCHY_RELATION):
+                return True
+            if uid not in self.names or endnode_id not in self.names:
+                return False
+            if signal is node_linked:
+                self.add_edge(uid, endnode_id)
+            else:
+                self.remove_edge(uid, endnode_id)
+            return True
+        if label != HIERARCHY_LABEL:
+            return True
+        if signal is node_created:
+            if uid is None:
+                return True
+            self.names[uid] = properties.get("name")
+            self.parents[uid] = set()
+            self.children[uid] = []
+        elif signal is node_deleted:
+            if uid not in self.names:
+                return True
+            for parent in list(self.parents[uid]):
+                self.remove_edge(uid, parent)
+            for child in list(self.children[uid]):
+                self.remove_edge(child, uid)
+            del self.names[uid], self.parents[uid], self.children[uid]
+        elif signal is node_updated and "name" in updates:
+            if uid not in self.names:
+                return False
+            self.names[uid] = updates["name"]
+            for parent in self.parents[uid]:
+                self.children[parent].sort(key=name_key(self.names))
+        return True
+
+    def add_edge(self, child, parent):
+        if parent not in self.parents[child]:
+            self.parents[child].add(parent)
+            self.children[parent].append(child)
+            self.children[parent].sort(key=name_key(self.names))
+
+    def remove_edge(self, child, parent):
+        if parent in self.parents[child]:
+            self.parents[child].discard(parent)
+            self.children[parent].remove(child)
+
+    def roots(self):
+        '''roots lists the ids of the disorders that are not a kind of another,
+        by name
+        '''
+        return sorted((uid for uid, parents in self.parents.items()
+                       if not parents), key=name_key(self.names))
+
+    def tree(self, uids, ancestors=()):
+        '''tree returns {(id, name): tree of its children} for each of uids in
+        order, as disorder_populate made it: None for a disorder without
+        children. A disorder is not listed again under itself, so a cycle of
+        ISA relations ends the branch.
+        '''
+        if not uids:
+            return None
+        ret = OrderedDict()
+        for uid in uids:
+            if uid in ancestors:
+                continue
+            ret[(uid, self.names[uid])] = self.tree(
+                self.children[uid], ancestors + (uid,))
+        return ret
+
+    def subtree(self, uid):
+        '''subtree returns the tree under disorder uid (uid included), None if
+        there is no such disorder
+        '''
+        if uid not in self.names:
+            return None
+        return self.tree([uid])
+
+    def descendants(self, uid):
+        '''descendants lists the ids of the disorders that are, through any
+        number of ISA relations, a kind of disorder uid, closest first
+        '''
+        found = []
+        seen = {uid}
+        level = self.children.get(uid, [])
+        while level:
+            following = []
+            for child in level:
+                if child not in seen:
+                    seen.add(child)
+                    found.append(child)
+                    following.extend(self.children[child])
+            level = following
+        return found
+
+
+disorder_hierarchy = DisorderHierarchy()
+
+
+def disorder_tree():
+    '''disorder_tree returns the tree of every disorder, from the roots'''
+    with disorder_hierarchy.lock:
+        hierarchy = disorder_hierarchy.current()
+        return hierarchy.tree(hierarchy.roots()) or OrderedDict()
+
+
+def disorder_subtree(uid):
+    '''disorder_subtree returns the tree under disorder uid, None if there is
+    no such disorder
+    '''
+    with disorder_hierarchy.lock:
+        return disorder_hierarchy.current().subtree(uid)
+
+
+CLOSURE_LABEL = "concept"
+CLOSURE_RELATIONS = ["KINDOF", "PARTOF"]
+
+
+class Closure(object):
+    '''Closure is one hierarchy of ConceptClosure: the direct parents and
+    children of each concept by id, and the bits of all of its ancestors,
+    the bit of a concept being 1 << ConceptClosure.index[id].
+    '''
+
+    def __init__(self, index):
+        self.index = index
+        self.parents = {}
+        self.children = {}
+        self.ancestors = {}
+
+    def add(self, uid):
+        self.parents.setdefault(uid, set())
+        self.children.setdefault(uid, set())
+
+    def bit(self, uid):
+        return 1 << self.index[uid]
+
+    def close(self, uid):
+        '''close works out the ancestor bits of uid from its parents, using
+        the bits already known of other concepts as they are reached
+        '''
+        bits = 0
+        stack = list(self.parents[uid])
+        while stack:
+            parent = stack.pop()
+            if bits & self.bit(parent):
+                continue
+            bits |= self.bit(parent)
+            if parent in self.ancestors:
+                bits |= self.ancestors[parent]
+            else:
+                stack.extend(self.parents[parent])
+        self.ancestors[uid] = bits
+
+    def close_all(self):
+        self.ancestors = {}
+        for uid in self.parents:
+            self.close(uid)
+
+    def walk(self, uid, edges, key=None):
+        '''walk lists the concepts reached from uid through edges (parents
+        or children) breadth first, uid excluded, the neighbours of each
+        concept in the order of key
+        '''
+        found = []
+        seen = {uid}
+        level = [uid]
+        while level:
+            following = []
+            for node in level:
+                neighbours = edges[node]
+                if key is not None:
+                    neighbours = sorted(neighbours, key=key)
+                for other in neighbours:
+                    if other not in seen:
+                        seen.add(other)
+                        found.append(other)
+                        following.append(other)
+            level = following
+        return found
+
+    def link(self, child, parent):
+        if parent in self.parents[child]:
+            return
+        self.parents[child].add(parent)
+        self.children[parent].add(child)
+        bits = self.ancestors[parent] | self.bit(parent)
+        for uid in [child] + self.walk(child, self.children):
+            self.ancestors[uid] |= bits
+
+    def unlink(self, child, parent):
+        if parent not in self.parents[child]:
+            return
+        self.parents[child].discard(parent)
+        self.children[parent].discard(child)
+        stale = [child] + self.walk(child, self.children)
+        for uid in stale:
+            del self.ancestors[uid]
+        for uid in stale:
+            if uid not in self.ancestors:
+                self.close(uid)
+
+    def remove(self, uid):
+        for parent in list(self.parents[uid]):
+            self.unlink(uid, parent)
+        for child in list(self.children[uid]):
+            self.unlink(child, uid)
+        del self.parents[uid], self.children[uid], self.ancestors[uid]
+
+
+class ConceptClosure(GraphIndex):
+
+    def __init__(self):
+        self.names = {}
+        self.index = {}
+        self.ids = []
+        self.closures = {}
+        super(ConceptClosure, self).__init__()
+
+    def build(self):
+        query = '''MATCH (c:{0}) WHERE exists(c.id)
+                   OPTIONAL MATCH (c)-[r:{1}]->(p:{0}) WHERE exists(p.id)
+                   RETURN c.id AS id, c.name AS name,
+                          collect([type(r), p.id]) AS parents
+                '''.format(CLOSURE_LABEL, "|".join(CLOSURE_RELATIONS))
+        self.names = {}
+        self.index = {}
+        self.ids = []
+        self.closures = {x: Closure(self.index) for x in CLOSURE_RELATIONS}
+        rows = list(graph.run(query))
+        for row in rows:
+            self.add(row['id'], row['name'])
+        for row in rows:
+            for relation, parent in row['parents']:
+                if parent in self.index:
+                    closure = self.closures[relation]
+                    closure.parents[row['id']].add(parent)
+                    closure.children[parent].add(row['id'])
+        for closure in self.closures.values():
+            closure.close_all()
+
+    def add(self, uid, name):
+        self.names[uid] = name
+        if uid not in self.index:
+            self.index[uid] = len(self.ids)
+            self.ids.append(uid)
+        for closure in self.closures.values():
+            closure.add(uid)
+            closure.ancestors.setdefault(uid, 0)
+
+    def apply(self, signal, label=None, uid=None, properties=None,
+              updates=None, relation_type=None, endnode_type=None,
+              endnode_id=None, **kwargs):
+        if signal in (node_linked, node_unlinked):
+            if (label != CLOSURE_LABEL or endnode_type != CLOSURE_LABEL
+                    or relation_type not in CLOSURE_RELATIONS):
+                return True
+            if uid not in self.names or endnode_id not in self.names:
+                return False
+            closure = self.closures[relation_type]
+            if signal is node_linked:
+                closure.link(uid, endnode_id)
+            else:
+                closure.unlink(uid, endnode_id)
+            return True
+        if label != CLOSURE_LABEL:
+            return True
+        if signal is node_created:
+            if uid is not None:
+                self.add(uid, properties.get("name"))
+        elif signal is node_deleted:
+            if uid not in self.names:
+                return True
+            for closure in self.closures.values():
+                closure.remove(uid)
+            # the bit of a deleted concept is not given to another
+            del self.names[uid], self.index[uid]
+        elif signal is node_updated and "name" in updates:
+            if uid not in self.names:
+                return False
+            self.names[uid] = updates["name"]
+        return True
+
+    def nodes(self, uids):
+        return [{"id": uid, "name": self.names[uid]} for uid in uids]
+
+    def ancestors(self, uid, relation="KINDOF"):
+        '''ancestors lists the concepts uid is, through any number of
+        relations, a kind (or part) of, nearest first, as {id, name}. None if
+        there is no such concept.
+        '''
+        if uid not in self.names:
+            return None
+        closure = self.closures[relation]
+        return self.nodes(closure.walk(uid, closure.parents,
+                                       name_key(self.names)))
+
+    def descendants(self, uid, relation="KINDOF"):
+        '''descendants lists the concepts that are, through any number of
+        relations, a kind (or part) of uid, nearest first, as {id, name}. None
+        if there is no such concept.
+        '''
+        if uid not in self.names:
+            return None
+        closure = self.closures[relation]
+        return self.nodes(closure.walk(uid, closure.children,
+                                       name_key(self.names)))
+
+    def is_a(self, uid, other, relation="KINDOF"):
+        '''is_a tells whether concept uid is other, or a kind (or part) of
+        it through any number of relations
+        '''
+        if uid not in self.names or other not in self.names:
+            return False
+        closure = self.closures[relation]
+        return uid == other or bool(closure.ancestors[uid] & closure.bit(other))
+
+    def lowest_common_ancestors(self, uid, other, relation="KINDOF"):
+        '''lowest_common_ancestors lists, by name as {id, name}, the concepts
+        that both uid and other are (or are a kind or part of), and that no
+        other such concept is a kind or part of
+        '''
+        if uid not in self.names or other not in self.names:
+            return []
+        closure = self.closures[relation]
+        common = ((closure.ancestors[uid] | closure.bit(uid))
+                  & (closure.ancestors[other] | closure.bit(other)))
+        members = self.members(common)
+        covered = 0
+        for member in members:
+            covered |= closure.ancestors[member]
+        lowest = [x for x in members if not covered & closure.bit(x)]
+        return self.nodes(sorted(lowest, key=name_key(self.names)))
+
+    def members(self, bits):
+        uids = []
+        while bits:
+            low = bits & -bits
+            uids.append(self.ids[low.bit_length() - 1])
+            bits ^= low
+        return uids
+
+
+concept_closure = ConceptClosure()
+
+
+def concept_hierarchy(uid, relation="KINDOF"):
+    '''concept_hierarchy returns the ancestors and descendants of concept
+    uid in the relation (KINDOF or PARTOF), None if there is no such concept
+    '''
+    with concept_closure.lock:
+        closure = concept_closure.current()
+        if uid not in closure.names:
+            return None
+        return {"id": uid, "name": closure.names[uid], "relation": relation,
+                "ancestors": closure.ancestors(uid, relation),
+                "descendants": closure.descendants(uid, relation)}
+
+
+def concept_relation(uid, other, relation="KINDOF"):
+    '''concept_relation returns whether concept uid is a kind (or part) of
+    other, the other way around, and their lowest common ancestors
+    '''
+    with concept_closure.lock:
+        closure = concept_closure.current()
+        return {"id": uid, "other": other, "relation": relation,
+                "is_a": closure.is_a(uid, other, relation),
+                "other_is_a": closure.is_a(other, uid, relation),
+                "lowest_common_ancestors": closure.lowest_common_ancestors(
+                    uid, other, relation)}
+
+
+def concept_ancestry(uid):
+    '''concept_ancestry returns {relation: ancestors} of concept uid for
+    each of the closure relations, None if there is no such concept
+    '''
+    with concept_closure.lock:
+        closure = concept_closure.current()
+        if uid not in closure.names:
+            return None
+        return {relation: closure.ancestors(uid, relation)
+                for relation in CLOSURE_RELATIONS}
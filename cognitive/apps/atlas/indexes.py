@@ -0,0 +1,65 @@
+''' Base class for in memory structures derived from the graph (search and
+autocomplete indexes, hierarchies, form choices).
+
+An index is built from the graph on first use and remembers the cache
+generation (see cache.py) it was built at. Writes made through query.Node in
+this process are applied incrementally by the signal receivers, which move the
+index on to the new generation only if it was current before the write. A
+write anywhere else (another uwsgi worker, a management command) leaves the
+generations out of step and the index is rebuilt on its next use.
+'''
+import threading
+
+from django.conf import settings
+
+from cognitive.apps.atlas.cache import generation
+from cognitive.apps.atlas.signals import (link_updated, node_created,
+                                          node_deleted, node_updated,
+                                          node_linked, node_unlinked)
+
+
+class GraphIndex(object):
+    '''GraphIndex is subclassed with build(), which loads the whole structure
+    from the graph, and apply(signal, **kwargs), which applies one write and
+    returns False if that needs a rebuild instead.
+    '''
+    signals = [node_created, node_deleted, node_updated, node_linked,
+               node_unlinked, link_updated]
+
+    def __init__(self):
+        self.generation = None
+        self.lock = threading.RLock()
+        for signal in self.signals:
+            signal.connect(self.receive, weak=False)
+
+    def build(self):
+        raise NotImplementedError
+
+    def apply(self, signal, **kwargs):
+        return True
+
+    def current(self):
+        '''current makes sure the index reflects the graph, building it if it
+        is stale, and returns it. With ATLAS_CACHE_ENABLED off (eg under
+        tests, which write to the graph directly) it is rebuilt every time.
+        '''
+        with self.lock:
+            if not settings.ATLAS_CACHE_ENABLED:
+                self.build()
+                self.generation = None
+                return self
+            token = generation()
+            if self.generation != token:
+                self.build()
+                self.generation = token
+        return self
+
+    def receive(self, signal, sender, generation, **kwargs):
+        old, new = generation
+        with self.lock:
+            if self.generation is None:
+                return
+            if self.generation != old or self.apply(signal, **kwargs) is False:
+                self.generation = None
+            else:
+                self.generation = new
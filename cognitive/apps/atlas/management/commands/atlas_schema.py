@@ -0,0 +1,52 @@
+from django.core.management.base import BaseCommand, CommandError
+
+from cognitive.apps.atlas.schema import (create_schema, diff_schema,
+                                         explain_queries, statement)
+
+
+class Command(BaseCommand):
+    help = ("Create, verify or diff the indexes and constraints of the "
+            "graph, declared in cognitive/apps/atlas/schema.py, or explain "
+            "which of the most run queries use them.")
+
+    def add_arguments(self, parser):
+        parser.add_argument("action",
+                            choices=["create", "verify", "diff", "explain"])
+        parser.add_argument("--drop", action="store_true",
+                            help="with create, also drop what is not declared")
+        parser.add_argument("--label", action="append", dest="labels",
+                            help="with explain, the labels to explain the "
+                                 "queries for (default concept and task)")
+
+    def handle(self, *args, **options):
+        action = options["action"]
+        if action == "create":
+            errors = create_schema(drop=options["drop"])
+            for cypher, error in errors.items():
+                self.stderr.write("{}: {}".format(cypher, error))
+            if errors:
+                raise CommandError("{} statements failed".format(len(errors)))
+            self.stdout.write("schema is in place")
+        elif action == "diff":
+            missing, extra, failing = diff_schema()
+            for item in missing:
+                self.stdout.write("+ {}".format(statement(item)))
+            for item in extra:
+                self.stdout.write("- {}".format(statement(item, "DROP")))
+            for item in failing:
+                self.stdout.write("! {} (not online)".format(statement(item)))
+        elif action == "verify":
+            missing, extra, failing = diff_schema()
+            if missing or failing:
+                raise CommandError(
+                    "{} indexes or constraints missing, {} not online, see "
+                    "atlas_schema diff".format(len(missing), len(failing)))
+            self.stdout.write("schema verified, {} undeclared".format(
+                len(extra)))
+        elif action == "explain":
+            labels = options["labels"] or ["concept", "task"]
+            for label, description, access, operators in explain_queries(
+                    labels):
+                self.stdout.write("{:<11} {:<12} {:<38} {}".format(
+                    "SCAN" if access == "scan" else access, label,
+                    description, " <- ".join(operators)))
@@ -0,0 +1,24 @@
+from django.conf import settings
+from django.core.management.base import BaseCommand
+
+from cognitive.apps.atlas.snapshot import build_snapshot
+
+
+class Command(BaseCommand):
+    help = ("Write the gzipped json snapshot of every task, concept and "
+            "disorder, rendering again only the nodes that changed since the "
+            "previous snapshot. See cognitive/apps/atlas/snapshot.py.")
+
+    def add_arguments(self, parser):
+        parser.add_argument("--path", default=settings.ATLAS_SNAPSHOT_PATH,
+                            help="where to write the snapshot (default "
+                                 "ATLAS_SNAPSHOT_PATH)")
+        parser.add_argument("--full", action="store_true",
+                            help="render every node again")
+
+    def handle(self, *args, **options):
+        stats = build_snapshot(options["path"], full=options["full"])
+        for label, (rendered, reused, removed) in stats.items():
+            self.stdout.write("{:<10} {} rendered, {} reused, {} removed".format(
+                label, rendered, reused, removed))
+        self.stdout.write("snapshot written to {}".format(options["path"]))
@@ -0,0 +1,39 @@
+from django.core.management.base import BaseCommand
+
+from cognitive.apps.atlas.querylog import (read_slow_log, slow_query_report,
+                                           REPORT_ORDERS)
+
+
+class Command(BaseCommand):
+    help = ("Summarize the slow graph query log (GRAPH_SLOW_QUERY_LOG and its "
+            "rotated files): the slowest query fingerprints, with how often "
+            "they ran, their total, mean and longest time in ms and the mean "
+            "number of rows they read.")
+
+    def add_arguments(self, parser):
+        parser.add_argument("--path", default=None,
+                            help="the log to read, default "
+                                 "GRAPH_SLOW_QUERY_LOG")
+        parser.add_argument("--top", type=int, default=20,
+                            help="how many fingerprints to list")
+        parser.add_argument("--order", choices=REPORT_ORDERS,
+                            default="total",
+                            help="what to rank the fingerprints by")
+
+    def handle(self, *args, **options):
+        report = slow_query_report(read_slow_log(options["path"]),
+                                   options["top"], options["order"])
+        if not report:
+            self.stdout.write("no slow queries logged")
+            return
+        for group in report:
+            rows = "-" if group["rows"] is None else "{:.1f}".format(
+                group["rows"])
+            self.stdout.write(
+                "{count:6d} x  total {total:10.1f}  mean {mean:8.1f}  "
+                "max {max:8.1f}  rows {rows}".format(
+                    rows=rows, **{k: group[k] for k in
+                                  ("count", "total", "mean", "max")}))
+            self.stdout.write("    " + group["fingerprint"])
+            if group["paths"]:
+                self.stdout.write("    from " + ", ".join(group["paths"][:5]))
@@ -0,0 +1,98 @@
+''' Report what a web worker spends its start up time importing.
+
+A fresh interpreter is started with python -X importtime to import what a
+uwsgi worker imports before its first request (the wsgi application and the
+url conf). The report lists the slowest imports, the heavy packages that were
+loaded and whether the graph was connected to, which should not happen until
+a request needs it, and warns when the imports take longer than the budget.
+'''
+import json
+import os
+import subprocess
+import sys
+
+from django.conf import settings
+from django.core.management.base import BaseCommand
+
+# what a worker imports before serving a request
+STARTUP_MODULES = ["cognitive.wsgi", "cognitive.urls"]
+
+# packages only some requests (or management commands) need
+HEAVY_MODULES = ["pandas", "numpy", "lxml", "rdflib"]
+
+# seconds to import STARTUP_MODULES, checked by the report
+IMPORT_TIME_BUDGET = 2.0
+
+STARTUP_SCRIPT = '''
+import json, sys
+{imports}
+from cognitive.settings import graph
+print(json.dumps({{
+    "heavy": [x for x in {heavy!r} if x in sys.modules],
+    "connected": graph.connected,
+}}))
+'''
+
+
+def parse_importtime(stderr):
+    '''parse_importtime reads the -X importtime report into a list of
+    (module, self seconds, cumulative seconds, depth), in import order
+    '''
+    timings = []
+    for line in stderr.splitlines():
+        if not line.startswith("import time:") or "[us]" in line:
+            continue
+        own, cumulative, name = line[len("import time:"):].split("|", 2)
+        indent = len(name) - len(name.lstrip())
+        timings.append((name.strip(), int(own) / 1e6,
+                        int(cumulative) / 1e6, (indent - 1) // 2))
+    return timings
+
+
+def measure_startup(modules=STARTUP_MODULES):
+    '''measure_startup imports modules in a new interpreter and returns the
+    total seconds taken, the per module timings (see parse_importtime), the
+    heavy modules that were imported and whether the graph was connected to
+    '''
+    script = STARTUP_SCRIPT.format(
+        imports="\n".join("import " + x for x in modules), heavy=HEAVY_MODULES)
+    env = dict(os.environ, DJANGO_SETTINGS_MODULE="cognitive.settings")
+    process = subprocess.run([sys.executable, "-X", "importtime", "-c", script],
+                             cwd=settings.BASE_DIR, env=env,
+                             stdout=subprocess.PIPE, stderr=subprocess.PIPE,
+                             universal_newlines=True, check=True)
+    timings = parse_importtime(process.stderr)
+    total = sum(x[2] for x in timings if x[3] == 0)
+    state = json.loads(process.stdout.strip().splitlines()[-1])
+    return total, timings, state["heavy"], state["connected"]
+
+
+class Command(BaseCommand):
+    help = ("Report the time taken to import what a web worker imports "
+            "before its first request, and the slowest imports.")
+
+    def add_arguments(self, parser):
+        parser.add_argument("--top", type=int, default=20,
+                            help="how many of the slowest imports to list")
+        parser.add_argument("--budget", type=float,
+                            default=IMPORT_TIME_BUDGET,
+                            help="seconds the imports should take at most")
+
+    def handle(self, *args, **options):
+        total, timings, heavy, connected = measure_startup()
+        self.stdout.write("{:>10} {:>10}  {}".format(
+            "self ms", "cumul. ms", "module"))
+        slowest = sorted(timings, key=lambda x: x[2], reverse=True)
+        for name, own, cumulative, depth in slowest[:options["top"]]:
+            self.stdout.write("{:10.1f} {:10.1f}  {}{}".format(
+                own * 1000, cumulative * 1000, "  " * depth, name))
+        self.stdout.write("total {:.3f}s, budget {:.3f}s".format(
+            total, options["budget"]))
+        if total > options["budget"]:
+            self.stderr.write(self.style.WARNING(
+                "the imports took {:.3f}s over the budget".format(
+                    total - options["budget"])))
+        self.stdout.write("heavy modules imported: {}".format(
+            ", ".join(heavy) or "none"))
+        self.stdout.write("graph connected: {}".format(
+            "yes" if connected else "no"))
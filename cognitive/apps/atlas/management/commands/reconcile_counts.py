@@ -0,0 +1,22 @@
+from django.core.management.base import BaseCommand
+
+from cognitive.apps.atlas.counts import reconcile
+
+
+class Command(BaseCommand):
+    help = ("Recompute the materialized node counts from the graph and "
+            "report any drift from the stored counts. The counts are only "
+            "shared with the web workers if ATLAS_CACHE_LOCATION is set.")
+
+    def handle(self, *args, **options):
+        drift = reconcile()
+        if not drift:
+            self.stdout.write("counts are up to date")
+            return
+        for label, (stored, count) in sorted(drift.items()):
+            if stored is None:
+                self.stdout.write("{}: not stored, now {}".format(
+                    label, count))
+            else:
+                self.stdout.write("{}: stored {}, true {} (drift {:+d})".format(
+                    label, stored, count, stored - count))
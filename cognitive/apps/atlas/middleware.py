@@ -0,0 +1,47 @@
+from django.conf import settings
+from django.template.loader import render_to_string
+
+from cognitive.apps.atlas.querylog import log_slow_queries
+from cognitive.settings import graph
+
+
+class GraphQueryMiddleware(object):
+    ''' Records the graph queries each request makes. The response gets their
+        number and total time (in ms) as X-Graph-Queries and X-Graph-Time,
+        the slow ones are written to the slow query log (see querylog.py) and,
+        with GRAPH_DEBUG_PANEL on, html pages shown to superusers end with a
+        panel listing them. Streamed responses only count the queries made
+        before streaming starts. '''
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+
+    def __call__(self, request):
+        with graph.recording() as queries:
+            response = self.get_response(request)
+        seconds = sum(x["seconds"] for x in queries)
+        response["X-Graph-Queries"] = str(len(queries))
+        response["X-Graph-Time"] = "{:.1f}".format(seconds * 1000)
+        log_slow_queries(queries, request.path)
+        if self.show_panel(request, response):
+            self.add_panel(response, queries, seconds)
+        return response
+
+    def show_panel(self, request, response):
+        user = getattr(request, "user", None)
+        return (settings.GRAPH_DEBUG_PANEL
+                and user is not None and user.is_superuser
+                and not response.streaming
+                and response.get("Content-Type", "").startswith("text/html")
+                and b"</body>" in response.content)
+
+    def add_panel(self, response, queries, seconds):
+        panel = render_to_string("atlas/graph_panel.html", {
+            "queries": [dict(x, ms=x["seconds"] * 1000) for x in queries],
+            "ms": seconds * 1000,
+            "slow_ms": settings.GRAPH_SLOW_QUERY_MS})
+        head, _, tail = response.content.rpartition(b"</body>")
+        response.content = head + panel.encode(response.charset) + \
+            b"</body>" + tail
+        if response.has_header("Content-Length"):
+            response["Content-Length"] = str(len(response.content))
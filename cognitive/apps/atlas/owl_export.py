@@ -7,7 +7,21 @@ directly this will hopefully allow owl exports to work if db representation
 changes but api compatability is maintained. Also allows this to be run by any
 user remotely.
 
+With access to neo4j, iter_db_triples reads the same entries with a handful of
+bulk queries instead, and export() streams the triples to N-Triples or Turtle
+as they are produced, without holding the ontology in memory:
+
+    python -m cognitive.apps.atlas.owl_export cogat.nt --source db
+
 """
+import argparse
+from concurrent.futures import ThreadPoolExecutor
+import re
+import resource
+import sys
+import time
+from urllib.parse import urljoin
+
 import requests
 import rdflib
 from rdflib import Graph, Literal, BNode, Namespace, RDF, URIRef
@@ -16,6 +30,13 @@ from rdflib.namespace import RDF, RDFS, OWL, FOAF, SKOS, DC
 
 base_url = ""
 
+# base the relative (#id) references are resolved against when streaming, as
+# N-Triples only allows absolute IRIs
+ontology_base = "http://www.cognitiveatlas.org/ontology/cogat.owl"
+
+# formats export() can write incrementally, others are built in memory
+STREAM_FORMATS = ["nt", "turtle"]
+
 OBO_REL = Namespace("http://purl.org/obo/owl/OBO_REL#")
 SNAP = Namespace("http://www.ifomis.org/bfo/1.1/snap#")
 OBO = Namespace("http://purl.obolibrary.org/obo/")
@@ -99,13 +120,36 @@ def add_item(item, fields, graph, id='id'):
             exit()
 
 
-def add_concepts_to_graph(graph):
+def fetch_details(path, ids, workers=1, chunk_size=100):
+    ''' Fetch the detail json of each id, in order, chunk_size ids per request
+    to a bulk api view (eg api/concept/bulk). With more than one worker the
+    requests are made from a thread pool, the results are still consumed (and
+    added to the graph) from the calling thread.
+    '''
+    chunks = [ids[i:i + chunk_size] for i in range(0, len(ids), chunk_size)]
+
+    def fetch(chunk):
+        response = requests.post(base_url + path, json={'ids': chunk})
+        if response.status_code == 404:
+            return []
+        return response.json()
+
+    if workers <= 1:
+        for chunk in chunks:
+            yield from fetch(chunk)
+        return
+    with ThreadPoolExecutor(max_workers=workers) as pool:
+        for details in pool.map(fetch, chunks):
+            yield from details
+
+
+def add_concepts_to_graph(graph, workers=1):
     concept_request = requests.get(base_url + 'api/concept')
     concept_json = concept_request.json()
-    for concept in concept_json:
-        concept_detail = requests.get(base_url + 'concept/json/' + concept['id'] +  '/')
-        concept_detail_json = concept_detail.json()
-        print("adding" + concept['id'])
+    concept_ids = [concept['id'] for concept in concept_json]
+    for concept_detail_json in fetch_details('api/concept/bulk', concept_ids,
+                                             workers):
+        print("adding" + concept_detail_json['id'])
         add_item(concept_detail_json, concept_fields, graph)
         ref = URIRef('#' + concept_detail_json['id'])
         for concept_class in concept_detail_json.get('conceptclasses', []):
@@ -129,12 +173,11 @@ def add_concepts_to_graph(graph):
                 add_item(elem, x[2], graph)
                 Restriction(x[1], graph, someValuesFrom=URIRef(elem['id']), identifier=sc)
 
-def add_tasks_to_graph(graph):
+def add_tasks_to_graph(graph, workers=1):
     tasks_request = requests.get(base_url + 'api/task')
     tasks_json = tasks_request.json()
-    for task in tasks_json:
-        task_detail_req = requests.get(base_url + 'task/json/'+ task['id'] + '/')
-        task_detail_json = task_detail_req.json()
+    task_ids = [task['id'] for task in tasks_json]
+    for task_detail_json in fetch_details('api/task/bulk', task_ids, workers):
         add_item(task_detail_json, task_fields, graph)
         relations_to_add = [
             ('conditions', RO.has_part, condition_fields), 
@@ -145,7 +188,14 @@ def add_tasks_to_graph(graph):
                 add_item(elem, x[2], graph)
                 Restriction(x[1], graph=graph, someValuesFrom=URIRef('#' + elem['id']))
 
-def build_graph():
+def build_graph(workers=1):
+    graph = build_header()
+    add_tasks_to_graph(graph, workers)
+    add_concepts_to_graph(graph, workers)
+    return graph
+
+def build_header():
+    ''' The namespaces, properties and classes the individuals refer to. '''
     graph = rdflib.Graph()
 
     # on export uses this string instead of generic ns1, ns2, etc
@@ -182,14 +232,234 @@ def build_graph():
 
     # properties = properties + '<owl:Class rdf:about="&cogat;CAO_00001">\n\t<rdfs:subClassOf rdf:resource="&skos;Concept"/>\n</owl:Class>\n\n'
     concept = Class(URIRef('Concept'), [ SKOS.Concept ], graph=graph)
-
-    add_tasks_to_graph(graph)
-    add_concepts_to_graph(graph)
     return graph
 
-def export_to_owl(path, format="pretty-xml"):
-    graph = build_graph()
-    graph.serialize(path, format="pretty-xml")
+def export_to_owl(path, format="pretty-xml", workers=1):
+    graph = build_graph(workers)
+    graph.serialize(path, format=format)
+
+# Export straight from the database #########################################
+
+TASK_QUERY = '''
+    MATCH (t:task)
+    OPTIONAL MATCH (t)-[:HASCONDITION]->(cond:condition)
+    WITH t, collect(properties(cond)) AS conditions
+    OPTIONAL MATCH (t)-[:HASCONTRAST]->(cont:contrast)
+    RETURN properties(t) AS task, conditions,
+           collect(properties(cont)) AS contrasts
+'''
+
+CONCEPT_QUERY = '''
+    MATCH (c:concept)
+    OPTIONAL MATCH (c)-[:CLASSIFIEDUNDER]->(cc:concept_class)
+    WITH c, collect(properties(cc)) AS conceptclasses
+    OPTIONAL MATCH (c)-[r:KINDOF|PARTOF]->(p:concept)
+    WITH c, conceptclasses,
+         collect(CASE WHEN p IS NULL THEN NULL
+                 ELSE {relationship: type(r), id: p.id} END) AS concepts
+    OPTIONAL MATCH (c)-[:MEASUREDBY]->(cont:contrast)
+    RETURN properties(c) AS concept, conceptclasses, concepts,
+           collect(properties(cont)) AS contrasts
+'''
+
+
+def item_triples(item, fields, seen, id='id'):
+    ''' The triples add_item would add for an item, skipping items already
+    in seen (a set of ids) and fields that are missing or empty.
+    '''
+    if item[id] in seen:
+        return
+    seen.add(item[id])
+    ref = URIRef('#' + item[id])
+    yield (ref, RDF.type, OWL.Class)
+    for predicate, field in fields:
+        if item.get(field) not in ['', None]:
+            yield (ref, predicate, Literal(item[field]))
+
+
+def restriction_triples(on_property, values_from, identifier=None):
+    ''' The triples of an infixowl someValuesFrom Restriction. '''
+    if identifier is None:
+        identifier = BNode()
+    yield (identifier, RDF.type, OWL.Restriction)
+    yield (identifier, OWL.onProperty, on_property)
+    yield (identifier, OWL.someValuesFrom, values_from)
+
+
+def iter_db_triples(db=None):
+    ''' Generate the triples of build_graph from neo4j, one task or concept
+    at a time, with a query for all tasks and one for all concepts. Only the
+    ids of emitted items are kept in memory.
+    Args:
+        db: py2neo Graph, defaults to the one in cognitive.settings
+    '''
+    if db is None:
+        from cognitive.settings import graph as db
+    for triple in build_header():
+        yield triple
+
+    seen = set()
+    for row in db.run(TASK_QUERY):
+        yield from item_triples(row['task'], task_fields, seen)
+        relations_to_add = [
+            ('conditions', RO.has_part, condition_fields),
+            ('contrasts', COGPO.has_contrast, contrast_fields)
+        ]
+        for key, on_property, fields in relations_to_add:
+            for elem in row[key]:
+                yield from item_triples(elem, fields, seen)
+                yield from restriction_triples(on_property,
+                                               URIRef('#' + elem['id']))
+
+    for row in db.run(CONCEPT_QUERY):
+        concept = row['concept']
+        ref = URIRef('#' + concept['id'])
+        yield from item_triples(concept, concept_fields, seen)
+        for concept_class in row['conceptclasses']:
+            yield from item_triples(concept_class, concept_class_fields, seen)
+            yield (ref, SKOS.hasTopConcept, URIRef('#' + concept_class['id']))
+        for elem in row['concepts']:
+            if elem['relationship'] == 'KINDOF':
+                on_property = RO.kind_of
+            else:
+                on_property = RO.part_of
+            sc = BNode()
+            yield (ref, RDFS.subClassOf, sc)
+            yield from restriction_triples(on_property,
+                                           URIRef('#' + elem['id']), sc)
+        for elem in row['contrasts']:
+            yield from item_triples(elem, contrast_fields, seen)
+            yield from restriction_triples(COGPO.has_contrast,
+                                           URIRef('#' + elem['id']))
+
+
+class TripleWriter(object):
+    ''' Writes triples to a text stream one at a time, as N-Triples or as
+    Turtle (prefixed names, consecutive triples of a subject grouped).
+    Relative references are resolved against base.
+    '''
+
+    def __init__(self, out, format="nt", base=None, namespaces=None):
+        if format not in STREAM_FORMATS:
+            raise ValueError("Can not stream {}".format(format))
+        self.out = out
+        self.format = format
+        self.base = base or ontology_base
+        self.prefixes = []
+        self.subject = None
+        self.count = 0
+        if format == "turtle":
+            # the prefixes bound in build_header, longest namespace first
+            namespaces = build_header().namespace_manager.namespaces()
+            self.prefixes = sorted(
+                [(str(namespace), prefix) for prefix, namespace in namespaces
+                 if not re.match(r"ns\d+$", prefix)],
+                key=lambda x: -len(x[0]))
+            for namespace, prefix in self.prefixes:
+                out.write("@prefix {}: <{}> .\n".format(prefix, namespace))
+            out.write("\n")
+
+    def term(self, term):
+        if isinstance(term, Literal):
+            text = str(term)
+            for char, escaped in [('\\', '\\\\'), ('"', '\\"'),
+                                  ('\n', '\\n'), ('\r', '\\r')]:
+                text = text.replace(char, escaped)
+            text = '"{}"'.format(text)
+            if term.language:
+                return text + '@' + term.language
+            if term.datatype:
+                return text + '^^' + self.term(term.datatype)
+            return text
+        if isinstance(term, URIRef):
+            term = URIRef(urljoin(self.base, term))
+            for namespace, prefix in self.prefixes:
+                local = term[len(namespace):]
+                if (term.startswith(namespace) and
+                        re.match(r"[A-Za-z_][\w-]*$", local)):
+                    return "{}:{}".format(prefix, local)
+        return term.n3()
+
+    def write(self, triple):
+        subject, predicate, obj = [self.term(x) for x in triple]
+        if self.format == "nt":
+            self.out.write("{} {} {} .\n".format(subject, predicate, obj))
+        elif subject == self.subject:
+            self.out.write(" ;\n    {} {}".format(predicate, obj))
+        else:
+            if self.subject is not None:
+                self.out.write(" .\n")
+            self.out.write("{} {} {}".format(subject, predicate, obj))
+            self.subject = subject
+        self.count += 1
+
+    def close(self):
+        if self.format == "turtle" and self.subject is not None:
+            self.out.write(" .\n")
+
+
+def export(path, source="api", format="nt", workers=1, db=None):
+    ''' Export the ontology and report how long it took and the peak memory
+    of the process.
+    Args:
+        path: file to write
+        source: "api" (default, as on the command line) to crawl the api at
+            base_url, "db" to read from neo4j
+        format: "nt" or "turtle" are streamed, any other rdflib format (eg
+            "pretty-xml") is built in memory first
+        workers: number of concurrent requests when crawling the api
+        db: py2neo Graph for the db source
+    Returns:
+        dict with the number of triples, seconds and peak_memory_mb
+    '''
+    start = time.time()
+    if source == "db":
+        triples = iter_db_triples(db)
+    else:
+        triples = build_graph(workers)
+
+    if format in STREAM_FORMATS:
+        with open(path, "w", encoding="utf-8") as out:
+            writer = TripleWriter(out, format)
+            for triple in triples:
+                writer.write(triple)
+            writer.close()
+        count = writer.count
+    else:
+        graph = triples if source != "db" else build_header()
+        if source == "db":
+            for triple in triples:
+                graph.add(triple)
+        graph.serialize(path, format=format)
+        count = len(graph)
+
+    # ru_maxrss is in kilobytes on linux, bytes on mac
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    if sys.platform == "darwin":
+        peak = peak / 1024
+    return {"triples": count,
+            "seconds": round(time.time() - start, 2),
+            "peak_memory_mb": round(peak / 1024, 1)}
 
 if __name__ == '__main__':
-    export_to_owl('./test.rdf')
+    parser = argparse.ArgumentParser(description="Export the Cognitive Atlas "
+                                     "as an OWL ontology")
+    parser.add_argument("path", nargs="?", default="./test.rdf")
+    parser.add_argument("--source", choices=["db", "api"], default="api")
+    parser.add_argument("--format", default=None,
+                        help="nt, turtle or pretty-xml (default from path)")
+    parser.add_argument("--workers", type=int, default=1,
+                        help="concurrent requests when crawling the api")
+    parser.add_argument("--base-url", default=base_url,
+                        help="root of the site to crawl, eg "
+                             "https://www.cognitiveatlas.org/")
+    args = parser.parse_args()
+
+    base_url = args.base_url
+    format = args.format
+    if format is None:
+        format = {"nt": "nt", "ttl": "turtle"}.get(
+            args.path.rsplit(".", 1)[-1], "pretty-xml")
+    report = export(args.path, args.source, format, args.workers)
+    print("wrote {triples} triples in {seconds}s, "
+          "peak memory {peak_memory_mb} MB".format(**report))
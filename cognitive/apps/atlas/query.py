@@ -1,16 +1,47 @@
 ''' This file contains classes that are used to query and update the neo4j
     graph.'''
+from collections import OrderedDict
+import functools
 import re
 import time
 
 from py2neo import Node as NeoNode, Relationship
-import pandas
 
+from cognitive.apps.atlas.cache import cached, invalidate
+from cognitive.apps.atlas import signals
+from cognitive.apps.atlas.search import search as search_nodes, SEARCH_LIMIT
 from cognitive.apps.atlas.utils import (color_by_relation, generate_uid,
-                                        do_query, get_relation_nodetype)
+                                        do_query, drop_duplicate_rows,
+                                        get_relation_nodetype, NodeRecord)
 import cognitive.settings as settings
 
 
+# last_updated is in seconds, but nodes imported before bulk_import wrote
+# seconds have it in ms (cypher's timestamp()); a time in seconds stays below
+# this until year 5138
+MS_TIMESTAMPS = 10 ** 11
+
+# last_updated of node {0} in seconds
+SECONDS = ("CASE WHEN {{0}}.last_updated >= {0} "
+           "THEN {{0}}.last_updated / 1000 ELSE {{0}}.last_updated END"
+           .format(MS_TIMESTAMPS))
+
+# moves the last_updated of node {0} on to $now, or by one if that is not
+# later, so that two writes in the same second still tell apart. A time in
+# ms is replaced by $now
+TOUCH = ("{{0}}.last_updated = CASE WHEN {{0}}.last_updated >= $now "
+         "AND {{0}}.last_updated < {0} THEN {{0}}.last_updated + 1 "
+         "ELSE $now END".format(MS_TIMESTAMPS))
+
+
+def next_timestamp(last_updated):
+    '''next_timestamp is TOUCH for a node read into python'''
+    now = int(time.time())
+    if last_updated is not None and now <= last_updated < MS_TIMESTAMPS:
+        return last_updated + 1
+    return now
+
+
 class InvalidNodeOperation(Exception):
     def __init__(self, *args, **kwargs):
         super().__init__(*args, **kwargs)
@@ -61,6 +92,8 @@ class Node(object):
                 for property_name in properties.keys():
                     node[property_name] = properties[property_name]
             self.graph.create(node)
+            self.changed(signals.node_created, label=label, uid=uid,
+                         properties=dict(node), node_id=node.identity)
             if request and self.graph.exists(node):
                 self.log_create(request, uid, label)
         return node
@@ -130,6 +163,11 @@ class Node(object):
                 if properties is not None:
                     relation.update(properties)
                 self.graph.create(relation)
+                self.touch((label, uid), (endnode_type, endnode_id))
+                self.changed(signals.node_linked, label=label, uid=uid,
+                             relation_type=relation_type,
+                             endnode_type=endnode_type,
+                             endnode_id=endnode_id)
                 return relation
             else:
                 return True
@@ -149,6 +187,10 @@ class Node(object):
 
         try:
             self.graph.run(query, parameters={'n1id': uid, 'n2id': endnode_id})
+            self.touch((self.name, uid), (endnode_type, endnode_id))
+            self.changed(signals.node_unlinked, label=self.name, uid=uid,
+                         relation_type=relation_type,
+                         endnode_type=endnode_type, endnode_id=endnode_id)
             return None
         except Exception as e:
             return e
@@ -164,7 +206,10 @@ class Node(object):
         if node is not None:
             for field, update in updates.items():
                 node[field] = update
+            node['last_updated'] = next_timestamp(node.get('last_updated'))
             self.graph.push(node)
+            self.changed(signals.node_updated, label=label, uid=uid,
+                         updates=updates)
 
     def update_link_properties(self, uid, endnode_id, relation_type,
                                endnode_type, properties, label=None):
@@ -180,6 +225,77 @@ class Node(object):
             for property_name in properties.keys():
                 relation.properties[property_name] = properties[property_name]
             self.graph.push(relation)
+            self.touch((label, uid), (endnode_type, endnode_id))
+            self.changed(signals.link_updated, label=label, uid=uid,
+                         relation_type=relation_type,
+                         endnode_type=endnode_type, endnode_id=endnode_id,
+                         properties=properties)
+
+    def delete(self, uid, label=None):
+        '''delete removes a node and all of its relations
+        :param uid: the unique id of the node
+        :returns: True if a node was deleted
+        '''
+        if label is None:
+            label = self.name
+        # the neighbours lose a relation, so their last_updated moves on
+        query = '''MATCH (n:{}) WHERE n.id = $id
+                   OPTIONAL MATCH (n)--(m)
+                   WITH n, collect(DISTINCT m) AS neighbours
+                   FOREACH (m IN neighbours | SET {})
+                   DETACH DELETE n
+                   RETURN count(n) AS deleted'''.format(label, TOUCH.format("m"))
+        deleted = self.graph.run(query, {'id': uid,
+                                         'now': int(time.time())}).evaluate()
+        if not deleted:
+            return False
+        self.changed(signals.node_deleted, label=label, uid=uid)
+        return True
+
+    def touch(self, *nodes):
+        '''touch moves the last_updated of nodes, given as (label, uid), on,
+        in one query
+        '''
+        matches = []
+        updates = []
+        parameters = {'now': int(time.time())}
+        for i, (label, uid) in enumerate(nodes):
+            matches.append("OPTIONAL MATCH (n{0}:{1}) WHERE n{0}.id = $id{0}"
+                           .format(i, label))
+            updates.append(TOUCH.format("n{}".format(i)))
+            parameters["id{}".format(i)] = uid
+        query = "{} SET {}".format(" ".join(matches), ", ".join(updates))
+        self.graph.run(query, parameters)
+
+    def version(self, value, field="id"):
+        '''version returns (last_updated, the latest last_updated of the nodes
+        up to two relations away, how many of them there are) for the node
+        whose field is value, None if there is none. Every write through this
+        class moves one of them on, so it tells whether what the detail pages
+        and the api show of the node changed, for much less than reading it.
+        The times are in seconds, those in ms read as seconds too.
+        :param value: the value of field to look the node up by
+        :param field: id (default) or name
+        '''
+        query = '''MATCH (n:{}) WHERE n.{} = $value
+                   WITH n LIMIT 1
+                   OPTIONAL MATCH (n)-[*1..2]-(m)
+                   RETURN {} AS updated,
+                          max({}) AS neighbours,
+                          count(DISTINCT m) AS degree'''.format(
+            self.name, field, SECONDS.format("n"), SECONDS.format("m"))
+        rows = self.graph.run(query, {'value': value}).data()
+        if not rows:
+            return None
+        return (rows[0]['updated'], rows[0]['neighbours'], rows[0]['degree'])
+
+    def changed(self, signal, **kwargs):
+        '''changed retires cached reads after a write and then sends signal,
+        with the old and new cache generations, to the receivers keeping
+        derived data (counts, indexes) in step with the graph
+        '''
+        old, new = invalidate()
+        signal.send(sender=self.__class__, generation=(old, new), **kwargs)
 
     def cypher(self, uid, lookup=None, return_lookup=False):
         ''' cypher returns a data structure with nodes and relations for an
@@ -284,6 +400,7 @@ class Node(object):
         }
         return result
 
+    @cached
     def filter(self, filters, format="dict",
                fields=None, order_by=None, desc=None):
         '''filter will filter a node based on some set of filters
@@ -321,12 +438,37 @@ class Node(object):
         fields = fields + ["_id"]
         return do_query(query, output_format=format, fields=fields)
 
-    def api_all(self):
-        query = "match (n:{}) return n".format(self.name)
-        nodes = self.graph.run(query)
-        results = [x['n'] for x in nodes]
-        return results
-
+    def api_all(self, limit=None, after=None):
+        '''api_all returns every node of this label, or with limit, a page of
+        at most limit of them by id, starting after the id after
+        :param limit: the most nodes to return, default None returns all
+        :param after: the id of the last node of the previous page
+        '''
+        if limit is None and after is None:
+            query = "match (n:{}) return n".format(self.name)
+            nodes = self.graph.run(query)
+            results = [x['n'] for x in nodes]
+            return results
+        # a range seek on the id index, however far into the label after is
+        query = '''MATCH (n:{}) WHERE n.id > $after
+                   RETURN n ORDER BY n.id LIMIT $limit'''.format(self.name)
+        nodes = self.graph.run(query, after=after or "", limit=limit)
+        return [x['n'] for x in nodes]
+
+    def iter_all(self, chunk_size=1000):
+        '''iter_all yields every node of this label by id, reading chunk_size
+        of them at a time, so memory does not grow with the size of the label
+        :param chunk_size: how many nodes to read per query
+        '''
+        after = None
+        while True:
+            nodes = self.api_all(limit=chunk_size, after=after)
+            yield from nodes
+            if len(nodes) < chunk_size:
+                return
+            after = nodes[-1]['id']
+
+    @cached
     def all(self, fields=None, limit=None,
             format="dict", order_by=None, desc=False):
         '''all returns all concepts, or up to a limit
@@ -360,6 +502,7 @@ class Node(object):
         fields = fields + ["_id"]
         return do_query(query, fields=fields, output_format=format)
 
+    @cached
     def get(self, uid, field="id", get_relations=True,
             relations=None, label=None):
         ''' get returns one or more nodes based on a field of interest. If
@@ -372,39 +515,27 @@ class Node(object):
         '''
         if label is None:
             label = self.name
-        match_kwarg = {field: uid}
-        parents = self.graph.nodes.match(label, **match_kwarg)
-        nodes = []
-
-        for parent in parents:
-            new_node = {}
-            new_node.update(parent)
-            # new_node["_id"] = parent._id
-
-            if get_relations is True:
-                relation_nodes = dict()
-                for new_relation in self.graph.match([parent]):
-                    # cursor is lazily evaluated, print is easy way to force valuation
-                    print(new_relation)
-                    new_relation_node = {}
-                    new_relation_node.update(new_relation.end_node)
-                    # new_relation_node["_id"] = new_relation.end_node._id
-                    # new_relation_node["_relation_id"] = new_relation._id
-                    new_relation_node["relationship_type"] = list(new_relation.types())[0]
-                    if new_relation.type in relation_nodes:
-                        relation_nodes[list(new_relation.types())[0]].append(
-                            new_relation_node)
-                    else:
-                        relation_nodes[list(new_relation.types())[0]] = [new_relation_node]
-
-                # Does the user want a filtered set?
-                if relations is not None:
-                    relation_nodes = {
-                        k: v for k, v in relation_nodes.items() if k in relations}
-                new_node["relations"] = relation_nodes
+        if get_relations is not True:
+            parents = self.graph.nodes.match(label, **{field: uid})
+            return [dict(parent) for parent in parents]
+
+        # One round trip per call: every matched node comes back with all of
+        # its outgoing relations and their end node properties collected.
+        query = '''MATCH (p:{0}) WHERE p.{1} = $value
+                   OPTIONAL MATCH (p)-[r]->()
+                   WHERE $relations IS NULL OR type(r) IN $relations
+                   RETURN p, [rel IN collect(r) |
+                              [type(rel), properties(endNode(rel))]] AS relations
+                '''.format(label, field)
+        if relations is not None:
+            relations = list(relations)
+        parameters = {'value': uid, 'relations': relations}
 
+        nodes = []
+        for record in self.graph.run(query, parameters):
+            new_node = dict(record['p'])
+            new_node["relations"] = group_relations(record['relations'])
             nodes.append(new_node)
-
         return nodes
 
     def get_label(self, uid):
@@ -415,32 +546,29 @@ class Node(object):
         except (KeyError, AttributeError, TypeError, IndexError) as e:
             return None
 
-    def search_all_fields(self, params):
+    def search_all_fields(self, params, limit=SEARCH_LIMIT):
+        '''search_all_fields returns the nodes of this label whose name, alias
+        or definition match the search text(s), best match first
+        :param params: a search string, or list of them
+        :param limit: the maximum number of results per search string
+        '''
         if isinstance(params, str):
             params = [params]
-        return_fields = ",".join(["c.{} as {}".format(x, x)
-                                  for x in self.fields] + ["ID(c)"])
-        query = "MATCH (c:%s) WHERE c.{0} =~ $regex RETURN %s;" % (
-            self.name, return_fields)
-
-        # Combine queries into transaction
-        tx = self.graph.begin()
-
-        cursors = []
-        for field in self.fields:
-            for param in params:
-                regex_parameter = '(?i).*{}.*$'.format(param)
-                cursors.append(tx.run(query.format(field), parameters={'regex': regex_parameter}))
-
-        tx.commit()
-
         results = []
-        for cursor in cursors:
-            result = cursor.data()
-            if len(result):
-                results += result
+        seen = set()
+        for param in params:
+            for document in search_nodes(param, labels=[self.name],
+                                         limit=limit):
+                node = document["properties"]
+                if node["id"] in seen:
+                    continue
+                seen.add(node["id"])
+                result = {field: node.get(field) for field in self.fields}
+                result["ID(c)"] = document["node_id"]
+                results.append(result)
         return results
 
+    @cached
     def get_relation(self, id, relation, label=None):
         ''' get nodes that are related to a given task
             :param task_id: id of node to look for relations from
@@ -460,6 +588,7 @@ class Node(object):
             rel['relationship'] = relation
         return relations
 
+    @cached
     def get_reverse_relation(self, id, relation, label=None):
         '''As opposed to get_relation this gets relations where the
            given id is the subject in the relationship, not the predicate.
@@ -479,19 +608,63 @@ class Node(object):
             rel['relationship'] = relation
         return relations
 
+    def relation_calls(self, node_id):
+        '''relation_calls returns a call of get_relation for each of the
+        default relations, to be run with graph.parallel
+        :param node_id: the unique id of the node
+        '''
+        return [functools.partial(self.get_relation, node_id, rel)
+                for rel in self.relations]
+
+    @cached
     def get_full(self, value, field):
         ret = {'type': self.name}
-        node = self.graph.nodes.match(self.name, **{field: value}).first()
+
+        def find():
+            return self.graph.nodes.match(self.name, **{field: value}).first()
+
+        # the relations are read along with the node when its id is known
+        if field == "id":
+            node, *relations = self.graph.parallel(
+                find, *self.relation_calls(value))
+        else:
+            node = find()
         if not node:
             return None
         ret = {**node, **ret}
-        node_id = node['id']
+        if field != "id":
+            relations = self.graph.parallel(*self.relation_calls(node['id']))
 
-        for rel in self.relations:
-            ret[self.relations[rel]] = self.get_relation(node_id, rel)
+        for rel, related in zip(self.relations, relations):
+            ret[self.relations[rel]] = related
 
         return ret
 
+    @cached
+    def get_full_many(self, ids):
+        '''get_full_many returns what get_full(id, 'id') does for each of ids
+        that is a node of this label, in the order of ids, reading them all
+        with the same (small, fixed) number of queries whatever their number
+        :param ids: list of unique ids
+        '''
+        query = '''MATCH (n:{}) WHERE n.id IN $ids
+                   OPTIONAL MATCH (n)-[r]->() WHERE type(r) IN $relations
+                   RETURN n, [rel IN collect(r) |
+                              [type(rel), properties(endNode(rel))]] AS relations
+                '''.format(self.name)
+        parameters = {'ids': list(ids), 'relations': list(self.relations)}
+        records = {}
+        for row in self.graph.run(query, parameters):
+            ret = {**row['n'], 'type': self.name}
+            related = {rel: [] for rel in self.relations}
+            for relation, properties in row['relations']:
+                related[relation].append(
+                    {**properties, 'relationship': relation})
+            for rel in self.relations:
+                ret[self.relations[rel]] = related[rel]
+            records[ret['id']] = ret
+        return [records[x] for x in OrderedDict.fromkeys(ids) if x in records]
+
 
 # Each type of Cognitive Atlas Class extends Node class
 
@@ -510,25 +683,48 @@ class Concept(Node):
         }
         self.color = "#3C7263"  # sea green
 
+    @cached
     def get_full(self, value, field):
         ret = super().get_full(value, field)
         if not ret:
             return None
         # relationships is an old cogat api field for kindof and partofs
-        child_rel = []
-        child_rel.extend(self.get_reverse_relation(ret['id'], 'PARTOF'))
-        child_rel.extend(self.get_reverse_relation(ret['id'], 'KINDOF'))
+        child_partof, child_kindof, parent_partof, parent_kindof = \
+            self.graph.parallel(
+                lambda: self.get_reverse_relation(ret['id'], 'PARTOF'),
+                lambda: self.get_reverse_relation(ret['id'], 'KINDOF'),
+                lambda: self.get_relation(ret['id'], 'PARTOF'),
+                lambda: self.get_relation(ret['id'], 'KINDOF'))
+        child_rel = child_partof + child_kindof
         for child in child_rel:
             child['direction'] = "child"
-        parent_rel = []
-        parent_rel.extend(self.get_relation(ret['id'], 'PARTOF'))
-        parent_rel.extend(self.get_relation(ret['id'], 'KINDOF'))
+        parent_rel = parent_partof + parent_kindof
         for parent in parent_rel:
             parent['direction'] = "parent"
         child_rel.extend(parent_rel)
         ret['relationships'] = child_rel
         return ret
 
+    @cached
+    def get_full_many(self, ids):
+        full = super().get_full_many(ids)
+        query = '''MATCH (c:concept)-[r:PARTOF|KINDOF]-(o) WHERE c.id IN $ids
+                   RETURN c.id AS id, type(r) AS relation,
+                          startNode(r) = c AS parent, properties(o) AS node'''
+        related = {}
+        for row in self.graph.run(query, ids=[x['id'] for x in full]):
+            direction = "parent" if row['parent'] else "child"
+            related.setdefault((row['id'], direction, row['relation']), []).append(
+                {**row['node'], 'relationship': row['relation'],
+                 'direction': direction})
+        # children first, then parents, partofs before kindofs as get_full does
+        for ret in full:
+            ret['relationships'] = [
+                node for direction in ("child", "parent")
+                for relation in ("PARTOF", "KINDOF")
+                for node in related.get((ret['id'], direction, relation), [])]
+        return full
+
 
 class Task(Node):
 
@@ -548,18 +744,144 @@ class Task(Node):
         }
         self.color = "#63506D"  # purple
 
+    @cached
     def get_full(self, value, field):
         ret = super().get_full(value, field)
         if not ret:
             return None
         value = ret['id']
-        ret['contrasts'] = self.api_get_contrasts(value)
-        ret['disorders'] = self.api_get_disorders(value)
-        ret['concepts'] = self.api_update_concepts(ret['concepts'], value)
+        contrasts, disorders, concepts = self.graph.parallel(
+            lambda: self.api_get_contrasts(value),
+            lambda: self.api_get_disorders(value),
+            lambda: self.api_update_concepts(ret['concepts'], value))
+        ret['contrasts'] = contrasts
+        ret['disorders'] = disorders
+        ret['concepts'] = concepts
         return ret
 
+    @cached
+    def get_full_many(self, ids):
+        full = super().get_full_many(ids)
+        ids = [x['id'] for x in full]
+        query = '''MATCH (t:task)-[:HASCONTRAST]->(c:contrast) WHERE t.id IN $ids
+                   OPTIONAL MATCH (cond:condition)-[r:HASCONTRAST]->(c)
+                   RETURN t.id AS id, c,
+                          [x IN collect([cond, r]) WHERE x[0] IS NOT NULL]
+                          AS conditions'''
+        contrasts = {}
+        for row in self.graph.run(query, ids=ids):
+            contrast = dict(row['c'])
+            contrast['conditions'] = [(cond, r) for cond, r in row['conditions']]
+            contrasts.setdefault(row['id'], []).append(contrast)
+
+        query = '''MATCH (t:task)-[:HASCONTRAST]->(c:contrast)
+                         -[dif:HASDIFFERENCE]->(d:disorder)
+                   WHERE t.id IN $ids RETURN t.id AS id, dif, d'''
+        disorders = {}
+        for row in self.graph.run(query, ids=ids):
+            disorders.setdefault(row['id'], []).append(
+                self._api_disorder(row['dif'], row['d'], row['id']))
+
+        query = '''MATCH (con:contrast)<-[:HASCONTRAST]-(t:task)-[:ASSERTS]->
+                         (c:concept)-[:MEASUREDBY]->(con:contrast)
+                   WHERE t.id IN $ids
+                   RETURN t.id AS id, c.id AS concept_id, con.id AS contrast_id,
+                          con.name AS contrast_name'''
+        concept_contrasts = {}
+        for row in self.graph.run(query, ids=ids):
+            concept_contrasts[(row['id'], row['concept_id'])] = (
+                row['contrast_id'], row['contrast_name'])
+
+        for ret in full:
+            ret['contrasts'] = contrasts.get(ret['id'], [])
+            ret['disorders'] = disorders.get(ret['id'], [])
+            for concept in ret['concepts']:
+                concept['concept_id'] = concept.pop('id')
+                key = (ret['id'], concept['concept_id'])
+                if key in concept_contrasts:
+                    concept['contrasts'] = concept_contrasts[key]
+        return full
+
+    @cached
+    def get_page(self, task_id):
+        '''get_page gathers everything shown on the task detail page in two
+        queries, independent of how many contrasts the task has: the task with
+        its outgoing relations and creator, then its contrasts with their
+        weighted conditions, the concepts, behaviors and traits measured by
+        them and the disorders they differ on. Returns None if there is no
+        such task.
+        :param task_id: the task unique id (tsk_*) for the task
+        '''
+        query = '''MATCH (t:task) WHERE t.id = $id
+                   OPTIONAL MATCH (t)-[r]->()
+                   WITH t, collect(r) AS rels
+                   OPTIONAL MATCH (u:user)-[:CREATED]->(t)
+                   RETURN t, [rel IN rels |
+                              [type(rel), properties(endNode(rel))]] AS relations,
+                          collect(u.id) AS creators'''
+        result = self.graph.run(query, {'id': task_id}).data()
+        if not result:
+            return None
+        task = dict(result[0]['t'])
+        task['relations'] = group_relations(result[0]['relations'])
+        creators = result[0]['creators']
+
+        query = '''MATCH (t:task)-[:HASCONTRAST]->(c:contrast) WHERE t.id = $id
+                   OPTIONAL MATCH (cond:condition)-[w:HASCONTRAST]->(c)
+                   WITH c, collect(CASE WHEN cond IS NULL THEN NULL
+                                   ELSE [properties(cond), properties(w)]
+                                   END) AS conditions
+                   OPTIONAL MATCH (m)-[:MEASUREDBY]->(c)
+                   WHERE m:concept OR m:behavior OR m:trait
+                   WITH c, conditions,
+                        collect(CASE WHEN m IS NULL THEN NULL
+                                ELSE [labels(m)[0], properties(m)]
+                                END) AS measured_by
+                   OPTIONAL MATCH (c)-[:HASDIFFERENCE]->(d:disorder)
+                   RETURN properties(c) AS contrast, conditions, measured_by,
+                          collect(properties(d)) AS disorders'''
+        contrasts = []
+        measured_by = {"concept": OrderedDict(), "behavior": OrderedDict(),
+                       "trait": OrderedDict()}
+        disorders = OrderedDict()
+        for row in self.graph.run(query, {'id': task_id}):
+            contrast = dict(row['contrast'])
+            contrast['conditions'] = [(NodeRecord(cond), weight)
+                                      for cond, weight in row['conditions']]
+            contrasts.append(contrast)
+            for label, node in row['measured_by']:
+                measured_by[label].setdefault(
+                    NodeRecord(node), []).append(contrast)
+            for node in row['disorders']:
+                disorders.setdefault(NodeRecord(node), []).append(contrast)
+
+        def related(relation):
+            return [dict(node, relationship=relation)
+                    for node in task['relations'].get(relation, [])]
+
+        conditions = [{"condition_id": cond.get("id"),
+                       "condition_name": cond.get("name"),
+                       "condition_last_updated": cond.get("last_updated"),
+                       "condition_creation_time": cond.get("creation_time")}
+                      for cond in task['relations'].get("HASCONDITION", [])]
+
+        return {
+            "task": task,
+            "creator_id": creators[0] if creators else None,
+            "contrasts": contrasts,
+            "conditions": conditions,
+            "concepts": measured_by["concept"],
+            "behaviors": measured_by["behavior"],
+            "traits": measured_by["trait"],
+            "disorders": disorders,
+            "implementations": related("HASIMPLEMENTATION"),
+            "datasets": related("HASEXTERNALDATASET"),
+            "indicators": related("HASINDICATOR"),
+            "citations": related("HASCITATION"),
+        }
+
     def api_update_concepts(self, concepts, task_id):
-        for concept in concepts:
+        def update(concept):
             concept['concept_id'] = concept.pop('id')
             query = ("MATCH (con:contrast)<-[:HASCONTRAST]-(t:task)-[:ASSERTS]->"
                      "(c:concept)-[:MEASUREDBY]->(con:contrast) "
@@ -571,6 +893,9 @@ class Task(Node):
                 for contrast in contrasts:
                     concept['contrasts'] = (
                         contrast[0]['id'], contrast[0]['name'])
+
+        self.graph.parallel(*[functools.partial(update, concept)
+                              for concept in concepts])
         return concepts
 
     def api_get_contrasts(self, task_id):
@@ -578,13 +903,17 @@ class Task(Node):
                    RETURN c'''
         contrasts = do_query(query, "null", "list", parameters={'id': task_id})
         ret = [dict(x[0]) for x in contrasts]
-        for contrast in ret:
+
+        def conditions(contrast):
             query = '''MATCH (cont:contrast)<-[r:HASCONTRAST]-(cond:condition)
                        WHERE cont.id=$id  return cont, r, cond'''
             results = settings.graph.run(query, parameters= {'id': contrast['id']})
-            contrast.update({
-                'conditions': [(x['cond'], x['r']) for x in results]
-            })
+            return [(x['cond'], x['r']) for x in results]
+
+        results = self.graph.parallel(*[functools.partial(conditions, contrast)
+                                        for contrast in ret])
+        for contrast, contrast_conditions in zip(ret, results):
+            contrast.update({'conditions': contrast_conditions})
         return ret
 
     def api_get_disorders(self, task_id):
@@ -592,21 +921,21 @@ class Task(Node):
             MATCH (t:task)-[:HASCONTRAST]->(c:contrast)-[dif:HASDIFFERENCE]->(d:disorder)
             WHERE t.id=$id RETURN dif, d'''
         disorders = do_query(query, ["null", "null2"], "list", parameters={'id': task_id})
-        ret_disorders = []
-        for disorder in disorders:
-            node = disorder[0]
-            rel = disorder[1]
-            # ret_disorders.append({**node, 'id_disorder': node['id']})
-            ret_disorders.append({
-                'id': rel['id'],
-                'name': rel['name'],
-                'id_user': node['id_user'],
-                'id_disorder': node['properties.id'],
-                'id_task': task_id,
-                'id_contrast': rel['id_contrast'],
-                'event_stamp': rel['event_stamp']
-            })
-        return ret_disorders
+        return [self._api_disorder(disorder[0], disorder[1], task_id)
+                for disorder in disorders]
+
+    @staticmethod
+    def _api_disorder(node, rel, task_id):
+        # ret_disorders.append({**node, 'id_disorder': node['id']})
+        return {
+            'id': rel['id'],
+            'name': rel['name'],
+            'id_user': node['id_user'],
+            'id_disorder': node['properties.id'],
+            'id_task': task_id,
+            'id_contrast': rel['id_contrast'],
+            'event_stamp': rel['event_stamp']
+        }
 
     def _api_get_phenotypes(self, task_id, label):
         query = '''
@@ -666,12 +995,12 @@ class Task(Node):
         fields[-1] = "_id"  # consistent name for graph node id
 
         result = do_query(query, fields=fields, drop_duplicates=False,
-                          output_format="df", parameters={'id': task_id})
-        contrast_name = [r[0] if isinstance(
-            r, list) else r for r in result['contrast_name']]
-        result["contrast_name"] = contrast_name
-        result = result.drop_duplicates()
-        return result.to_dict(orient="records")
+                          parameters={'id': task_id})
+        for contrast in result:
+            name = contrast["contrast_name"]
+            if isinstance(name, list):
+                contrast["contrast_name"] = name[0]
+        return drop_duplicate_rows(result)
 
     def get_conditions(self, task_id):
         '''get_conditions looks up the condition(s) associated with a task
@@ -901,6 +1230,27 @@ class Assertion(Node):
             "HASCITATION": "citations"
         }
 
+    @cached
+    def descriptions(self):
+        '''descriptions lists (id, description) for every assertion, by
+        description: its name or, as the assertions made with a task or
+        disorder have none, the names of its subject and predicate
+        '''
+        query = '''MATCH (a:assertion) WHERE exists(a.id)
+                   OPTIONAL MATCH (a)-[:SUBJECT]->(s)
+                   OPTIONAL MATCH (a)-[:PREDICATE]->(p)
+                   RETURN a.id AS id, a.name AS name,
+                          collect(DISTINCT s.name) AS subjects,
+                          collect(DISTINCT p.name) AS predicates'''
+        described = []
+        for row in self.graph.run(query):
+            description = row['name']
+            if not isinstance(description, str) or not description.strip():
+                description = " ".join(str(x) for x in
+                                       row['subjects'] + row['predicates'])
+            described.append((row['id'], description or row['id']))
+        return sorted(described, key=lambda x: (x[1].casefold(), x[0]))
+
 
 class User(Node):
 
@@ -944,42 +1294,26 @@ class Disambiguation(Node):
 # General search function across nodes
 
 
-def search(searchstring, fields=["name", "id"], node_type=None):
+def search(searchstring, fields=["name", "id"], node_type=None,
+           limit=SEARCH_LIMIT):
+    '''search returns the nodes whose name, alias or definition match
+    searchstring, best match first, as dictionaries of fields plus _id and
+    label
+    :param node_type: only return nodes of this label (optional)
+    :param limit: the maximum number of results (None for all)
+    '''
     if isinstance(fields, str):
         fields = [fields]
-    return_fields = ",".join(["n.{}".format(x) for x in fields] + ["ID(n)"])
-
-    # Customize if specific kind of node requested
-    if node_type is None:
-        node_type = ""
-    else:
-        node_type = ":{}".format(node_type.lower())
-
-    searchstring = re.escape(searchstring)
-    search_param = '(?i).*{}.*'.format(searchstring.__repr__()[1:-1])
-    query = '''MATCH (n%s)
-               WHERE toString(n.name) =~ $search
-               AND (n:concept
-               OR n:task
-               OR n:theory
-               OR n:battery
-               OR n:disorder
-               OR n:trait
-               OR n:behavior
-               OR n:contrast
-               OR n:condition)
-               RETURN %s, labels(n)
-               ORDER BY n.name;''' % (node_type, return_fields)
-    fields = fields + ["_id", "label"]
-    result = do_query(query, fields=fields,
-                      drop_duplicates=False, output_format="df",
-                      parameters={'search': search_param})
-
-    if result.empty:
-        return {}
-    result["label"] = [r[0] for r in result['label']]
-    result = result.drop_duplicates()
-    return result.to_dict(orient="records")
+    labels = None
+    if node_type is not None:
+        labels = [node_type.lower()]
+    results = []
+    for document in search_nodes(searchstring, labels=labels, limit=limit):
+        result = {field: document["properties"].get(field) for field in fields}
+        result["_id"] = document["node_id"]
+        result["label"] = document["label"]
+        results.append(result)
+    return results
 
 
 def search_contrast(searchstring):
@@ -994,11 +1328,11 @@ def search_contrast(searchstring):
     result = do_query(
         query,
         fields=['tid', 'tname', 'cid', 'cname'],
-        drop_duplicates=True, output_format="df",
+        drop_duplicates=True, output_format="dict",
         parameters={'search': searchstring}
     )
 
-    return result.to_dict(orient="records")
+    return result
 
 
 # General get function across nodes, get by id
@@ -1012,6 +1346,20 @@ def get(nodeid, fields=["name", "id"]):
     return do_query(query, fields=fields, parameters={'search': nodeid})
 
 
+def group_relations(relations):
+    '''group_relations turns a list of [relation type, end node properties]
+    pairs into the relations dictionary returned by Node.get, keyed by
+    relation type
+    :param relations: list of [relation_type, properties] pairs
+    '''
+    relation_nodes = dict()
+    for relation_type, properties in relations:
+        relation_node = dict(properties)
+        relation_node["relationship_type"] = relation_type
+        relation_nodes.setdefault(relation_type, []).append(relation_node)
+    return relation_nodes
+
+
 # Functions to generate cypher queries for nodes and relations
 def cypher_node(uid, node_type, name, count):
     '''cyper_node creates a cypher node for including in a gist
@@ -0,0 +1,96 @@
+''' The slow query log: the graph queries of a request (see
+GraphPool.recording) that took at least GRAPH_SLOW_QUERY_MS, one json object
+per line
+
+    {"time": <unix time>, "path": "/concepts/...", "fingerprint": "MATCH ...",
+     "ms": 512.3, "rows": 20}
+
+written by the "cognitive.graph.slow" logger, which settings.LOGGING sends to
+the rotating file GRAPH_SLOW_QUERY_LOG. Summarize it with
+
+    python manage.py graph_slow_queries
+'''
+import json
+import logging
+import os
+import time
+
+from django.conf import settings
+
+slow_log = logging.getLogger("cognitive.graph.slow")
+
+REPORT_ORDERS = ["total", "count", "max", "mean"]
+
+
+def log_slow_queries(queries, path=""):
+    '''log_slow_queries writes the queries of a recording that took at least
+    GRAPH_SLOW_QUERY_MS to the slow query log
+    :param queries: the list GraphPool.recording yielded
+    :param path: the path of the request that made them
+    '''
+    threshold = settings.GRAPH_SLOW_QUERY_MS / 1000.0
+    now = time.time()
+    for query in queries:
+        if query["seconds"] >= threshold:
+            slow_log.info(json.dumps({
+                "time": round(now, 3), "path": path,
+                "fingerprint": query["fingerprint"],
+                "ms": round(query["seconds"] * 1000, 3),
+                "rows": query["rows"]}))
+
+
+def read_slow_log(path=None):
+    '''read_slow_log yields the entries of the slow query log at path and of
+    its rotated files (path.1, path.2, ...), oldest first, skipping lines
+    that are not entries
+    '''
+    path = path or settings.GRAPH_SLOW_QUERY_LOG
+    rotated = []
+    number = 1
+    while os.path.exists("{}.{}".format(path, number)):
+        rotated.append("{}.{}".format(path, number))
+        number += 1
+    for name in reversed(rotated + [path]):
+        try:
+            log = open(name, encoding="utf-8")
+        except OSError:
+            continue
+        with log:
+            for line in log:
+                try:
+                    entry = json.loads(line)
+                except ValueError:
+                    continue
+                if isinstance(entry, dict) and "fingerprint" in entry:
+                    yield entry
+
+
+def slow_query_report(entries, top=20, order="total"):
+    '''slow_query_report groups entries of the slow query log by fingerprint
+    and returns the top of them by order (total, count, max or mean time), as
+    {fingerprint, count, total, mean, max, rows, paths}: times in ms, rows
+    the mean number of rows, paths the distinct request paths
+    '''
+    groups = {}
+    for entry in entries:
+        group = groups.setdefault(entry["fingerprint"], {
+            "fingerprint": entry["fingerprint"], "count": 0, "total": 0.0,
+            "max": 0.0, "row_total": 0, "row_count": 0, "paths": set()})
+        group["count"] += 1
+        group["total"] += entry["ms"]
+        group["max"] = max(group["max"], entry["ms"])
+        if entry.get("rows") is not None:
+            group["row_total"] += entry["rows"]
+            group["row_count"] += 1
+        if entry.get("path"):
+            group["paths"].add(entry["path"])
+    report = []
+    for group in groups.values():
+        row_count = group.pop("row_count")
+        row_total = group.pop("row_total")
+        group["mean"] = group["total"] / group["count"]
+        group["rows"] = row_total / row_count if row_count else None
+        group["paths"] = sorted(group["paths"])
+        report.append(group)
+    report.sort(key=lambda x: (-x[order], x["fingerprint"]))
+    return report[:top]
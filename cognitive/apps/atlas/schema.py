@@ -0,0 +1,177 @@
+''' Indexes and constraints of the graph, declared from the Node classes of
+query.py.
+
+Every label has a uniqueness constraint on id, which also indexes it, and an
+index on name if its Node class has a name field. Looking a node up by id (or
+checking that a new uid is free, see utils.generate_uid) or by name is then
+an index seek rather than a scan of the label. The schema in the graph is
+compared with the declared one by diff_schema, and EXPLAIN shows which of the
+queries query.py runs most resolve to index seeks, index scans or label
+scans (see explain_queries).
+'''
+from collections import namedtuple
+
+from py2neo.database import ClientError
+
+from cognitive.apps.atlas import query
+from cognitive.apps.atlas.utils import UID_PREFIXES
+from cognitive.settings import graph
+
+# kind is "constraint" (a uniqueness constraint) or "index"
+SchemaItem = namedtuple("SchemaItem", ["kind", "label", "property"])
+
+# the queries query.py runs most, by what runs them, with {label} for the
+# label of the node class
+HOT_QUERIES = [
+    ("get, get_full, update, delete by id",
+     "MATCH (n:{label}) WHERE n.id = $id RETURN n LIMIT 1", {"id": ""}),
+    ("generate_uid",
+     "MATCH (n:{label}) WHERE n.id = $id RETURN n.id AS id", {"id": ""}),
+    ("get by name",
+     "MATCH (n:{label}) WHERE n.name = $name RETURN n", {"name": ""}),
+    ("get_relation",
+     "MATCH (p:{label})-->(r) WHERE p.id = $id RETURN r", {"id": ""}),
+    ("get_reverse_relation",
+     "MATCH (p)-->(s:{label}) WHERE s.id = $id RETURN p", {"id": ""}),
+    ("all ordered by name",
+     "MATCH (n:{label}) RETURN n.id, n.name ORDER BY LOWER(n.name)", {}),
+    ("filter starts_with",
+     "MATCH (n:{label}) WHERE n.name =~ '(?i)a.*' RETURN n.id, n.name", {}),
+]
+
+SEEK_OPERATORS = ["NodeIndexSeek", "NodeUniqueIndexSeek",
+                  "NodeIndexSeekByRange", "NodeUniqueIndexSeekByRange"]
+
+# operators reading every entry of an index: better than a label scan, but
+# still as slow as the label is large
+INDEX_SCAN_OPERATORS = ["NodeIndexScan", "NodeIndexContainsScan",
+                        "NodeIndexEndsWithScan"]
+
+
+def node_classes():
+    '''node_classes returns every subclass of query.Node'''
+    classes = []
+    pending = [query.Node]
+    while pending:
+        for subclass in pending.pop().__subclasses__():
+            classes.append(subclass)
+            pending.append(subclass)
+    return classes
+
+
+def declared_schema():
+    '''declared_schema returns the SchemaItems the graph should have'''
+    fields = {label: ["id", "name"] for label in UID_PREFIXES}
+    for node_class in node_classes():
+        node = node_class()
+        fields[node.name] = fields.get(node.name, []) + node.fields
+    items = set()
+    for label, names in fields.items():
+        if "id" in names:
+            items.add(SchemaItem("constraint", label, "id"))
+        if "name" in names:
+            items.add(SchemaItem("index", label, "name"))
+    return sorted(items)
+
+
+def statement(item, action="CREATE"):
+    '''statement returns the cypher to CREATE or DROP a SchemaItem'''
+    if item.kind == "constraint":
+        return "{} CONSTRAINT ON (n:{}) ASSERT n.{} IS UNIQUE".format(
+            action, item.label, item.property)
+    return "{} INDEX ON :{}({})".format(action, item.label, item.property)
+
+
+def existing_schema():
+    '''existing_schema returns {SchemaItem: state} for the single label and
+    property indexes and uniqueness constraints in the graph
+    '''
+    existing = {}
+    for row in graph.run("CALL db.indexes()"):
+        if len(row['tokenNames']) != 1 or len(row['properties']) != 1:
+            continue
+        kind = "constraint" if "unique" in row['type'] else "index"
+        item = SchemaItem(kind, row['tokenNames'][0], row['properties'][0])
+        existing[item] = row['state']
+    return existing
+
+
+def diff_schema():
+    '''diff_schema compares the declared and existing schemas and returns
+    (missing, extra, failing) SchemaItems, failing being the declared items
+    that exist but are not online (eg still populating, or failed)
+    '''
+    declared = declared_schema()
+    existing = existing_schema()
+    missing = [x for x in declared if x not in existing]
+    extra = sorted(x for x in existing if x not in declared)
+    failing = [x for x in declared if existing.get(x, "ONLINE") != "ONLINE"]
+    return missing, extra, failing
+
+
+def create_schema(drop=False):
+    '''create_schema creates the missing indexes and constraints, and drops
+    the ones that are not declared if drop is True. It returns
+    {statement: error} for the statements that failed (eg a uniqueness
+    constraint on a label where two nodes share an id)
+    '''
+    missing, extra, _ = diff_schema()
+    statements = [statement(x) for x in missing]
+    if drop:
+        statements += [statement(x, "DROP") for x in extra]
+    errors = {}
+    for cypher in statements:
+        try:
+            graph.run(cypher)
+        except ClientError as error:
+            errors[cypher] = error
+    return errors
+
+
+def plan_operators(plan):
+    '''plan_operators lists the operators of an EXPLAIN plan, root first'''
+    if plan is None:
+        return []
+    if isinstance(plan, dict):
+        operator = plan.get("operatorType", plan.get("operator_type"))
+        children = plan.get("children", [])
+    else:
+        operator = plan.operator_type
+        children = plan.children
+    operators = [operator.split("@")[0]]
+    for child in children:
+        operators += plan_operators(child)
+    return operators
+
+
+def explain(cypher, parameters=None):
+    '''explain returns the operators of the plan neo4j would run cypher
+    with, without running it
+    '''
+    cursor = graph.run("EXPLAIN " + cypher, parameters or {})
+    return plan_operators(cursor.plan())
+
+
+def plan_access(operators):
+    '''plan_access returns how a plan finds its nodes: "seek" if it seeks
+    them in an index, "index scan" if it reads a whole index, else "scan"
+    '''
+    if any(x in SEEK_OPERATORS for x in operators):
+        return "seek"
+    if any(x in INDEX_SCAN_OPERATORS for x in operators):
+        return "index scan"
+    return "scan"
+
+
+def explain_queries(labels=("concept", "task")):
+    '''explain_queries explains HOT_QUERIES for each of labels, returning
+    (label, description, access, operators) with access as plan_access gives
+    it
+    '''
+    report = []
+    for label in labels:
+        for description, cypher, parameters in HOT_QUERIES:
+            operators = explain(cypher.format(label=label), parameters)
+            report.append((label, description, plan_access(operators),
+                           operators))
+    return report
@@ -0,0 +1,171 @@
+''' In memory full text search over the names, aliases and definitions of the
+nodes users look for (concepts, tasks, contrasts, disorders, ...).
+
+Text is split into case folded word tokens. Each token maps to the nodes it
+appears in, with the weight of the best field it appears in, and the sorted
+list of all tokens is searched with bisect to expand a query token to every
+token it is a prefix of. A node matches if each query token prefixes one of
+its tokens; matches are ranked on field weights, exact over prefix matches
+and how closely the name matches the whole query.
+'''
+from bisect import bisect_left, insort
+import re
+
+from cognitive.apps.atlas.indexes import GraphIndex
+from cognitive.apps.atlas.signals import (node_created, node_deleted,
+                                          node_updated)
+from cognitive.settings import graph
+
+SEARCH_LABELS = ["concept", "task", "theory", "battery", "disorder", "trait",
+                 "behavior", "contrast", "condition"]
+
+# searched fields and their weight, definitions differ in name per label
+SEARCH_FIELDS = {
+    "name": 4,
+    "alias": 3,
+    "definition_text": 1,
+    "definition": 1,
+    "description": 1,
+    "collection_description": 1,
+}
+
+SEARCH_LIMIT = 50
+
+
+def tokenize(text):
+    if not isinstance(text, str):
+        return []
+    return re.findall(r"\w+", text.casefold())
+
+
+class SearchIndex(GraphIndex):
+
+    def build(self):
+        query = '''MATCH (n) WHERE {}
+                   RETURN n, labels(n)[0] AS label, id(n) AS node_id
+                '''.format(" OR ".join("n:{}".format(x) for x in SEARCH_LABELS))
+        self.documents = {}
+        self.postings = {}
+        self.tokens = []
+        for row in graph.run(query):
+            self.add(row['label'], dict(row['n']), row['node_id'],
+                     insert=False)
+        self.tokens = sorted(self.postings)
+
+    def add(self, label, properties, node_id=None, insert=True):
+        uid = properties.get("id")
+        if uid is None:
+            return
+        weights = {}
+        for field, weight in SEARCH_FIELDS.items():
+            for token in tokenize(properties.get(field)):
+                weights[token] = max(weight, weights.get(token, 0))
+        self.documents[uid] = {"label": label, "node_id": node_id,
+                               "properties": properties,
+                               "weights": weights}
+        for token, weight in weights.items():
+            if token not in self.postings:
+                self.postings[token] = {}
+                if insert:
+                    insort(self.tokens, token)
+            self.postings[token][uid] = weight
+
+    def remove(self, uid):
+        document = self.documents.pop(uid, None)
+        if document is None:
+            return None
+        for token in document["weights"]:
+            postings = self.postings[token]
+            postings.pop(uid, None)
+            if not postings:
+                del self.postings[token]
+                del self.tokens[bisect_left(self.tokens, token)]
+        return document
+
+    def apply(self, signal, label=None, uid=None, properties=None,
+              updates=None, node_id=None, **kwargs):
+        if label not in SEARCH_LABELS:
+            return True
+        if signal is node_created:
+            self.add(label, properties, node_id)
+        elif signal is node_deleted:
+            self.remove(uid)
+        elif signal is node_updated:
+            document = self.remove(uid)
+            if document is None:
+                return False
+            self.add(label, dict(document["properties"], **updates),
+                     document["node_id"])
+        return True
+
+    def expand(self, prefix):
+        '''expand returns every indexed token starting with prefix'''
+        start = bisect_left(self.tokens, prefix)
+        end = start
+        while end < len(self.tokens) and self.tokens[end].startswith(prefix):
+            end += 1
+        return self.tokens[start:end]
+
+    def search(self, text, labels=None, limit=SEARCH_LIMIT):
+        '''search returns the best matching documents for text, best first
+        :param text: the query, eg "stroop col"
+        :param labels: only return nodes with one of these labels (optional)
+        :param limit: the maximum number of results (None for all)
+        '''
+        query = tokenize(text)
+        if not query:
+            return []
+        scores = None
+        # the query terms matching the fewest documents first (by the summed
+        # sizes of the postings of the tokens they expand to), so the
+        # candidate set shrinks quickly
+        expanded = sorted(
+            ([(token, token == q) for token in self.expand(q)]
+             for q in query),
+            key=lambda matches: sum(len(self.postings[token])
+                                    for token, _ in matches))
+        for matches in expanded:
+            token_scores = {}
+            for token, exact in matches:
+                for uid, weight in self.postings[token].items():
+                    if scores is not None and uid not in scores:
+                        continue
+                    score = weight if exact else weight / 2
+                    if score > token_scores.get(uid, 0):
+                        token_scores[uid] = score
+            if scores is None:
+                scores = token_scores
+            else:
+                scores = {uid: scores[uid] + score
+                          for uid, score in token_scores.items()}
+            if not scores:
+                return []
+
+        phrase = " ".join(query)
+        results = []
+        for uid, score in scores.items():
+            document = self.documents[uid]
+            if labels is not None and document["label"] not in labels:
+                continue
+            name = " ".join(tokenize(document["properties"].get("name")))
+            if name == phrase:
+                score += 10
+            elif name.startswith(phrase):
+                score += 5
+            results.append((-score, len(name), name, uid))
+        results.sort()
+        if limit is not None:
+            results = results[:limit]
+        return [self.documents[uid] for _, _, _, uid in results]
+
+
+search_index = SearchIndex()
+
+
+def search(text, labels=None, limit=SEARCH_LIMIT):
+    '''search the index, see SearchIndex.search. Returns a list of
+    {"label", "node_id", "properties"} dictionaries.
+    '''
+    with search_index.lock:
+        return search_index.current().search(text, labels=labels,
+                                             limit=limit)
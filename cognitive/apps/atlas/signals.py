@@ -0,0 +1,27 @@
+''' Signals sent by query.Node after each write to the graph.
+
+They are sent after the cache generation has been replaced, with the old and
+new tokens as generation=(old, new), so that in memory structures derived from
+the graph (counts, indexes) can apply the change incrementally and adopt the
+new token instead of rebuilding. Receivers are connected in
+AtlasConfig.ready().
+'''
+from django.dispatch import Signal
+
+# label, uid, properties, generation
+node_created = Signal()
+
+# label, uid, generation
+node_deleted = Signal()
+
+# label, uid, updates, generation
+node_updated = Signal()
+
+# label, uid, relation_type, endnode_type, endnode_id, generation
+node_linked = Signal()
+
+# label, uid, relation_type, endnode_type, endnode_id, generation
+node_unlinked = Signal()
+
+# label, uid, relation_type, endnode_type, endnode_id, properties, generation
+link_updated = Signal()
@@ -0,0 +1,127 @@
+''' A snapshot of the whole atlas: the get_full record of every task, concept
+and disorder in one gzipped json file, for consumers that want all of it
+(instead of listing a label and fetching every record from the api).
+
+    {"generated": <unix time>,
+     "versions": {"task": {"tsk_...": [last_updated, neighbours, degree]}},
+     "task": [...], "concept": [...], "disorder": [...]}
+
+A node's version is the one Node.version gives (its own last_updated, the
+latest last_updated of the nodes up to two relations away and how many of
+them there are, in seconds), read for a whole label in one query.
+Regenerating the snapshot only renders again the nodes whose version changed
+since the previous one (or that are new), and reuses the records of the
+others. The file is replaced atomically, so it can be served as is: it is
+written under STATIC_ROOT by default, where nginx serves it with an ETag,
+and the api_snapshot view serves it too. Regenerate it with
+
+    python manage.py atlas_snapshot
+'''
+import gzip
+import json
+import os
+import tempfile
+import time
+
+from django.conf import settings
+
+from cognitive.apps.atlas.query import Concept, Disorder, SECONDS, Task
+from cognitive.settings import graph
+
+SNAPSHOT_CLASSES = [Task, Concept, Disorder]
+# how many records are rendered with one get_full_many
+SNAPSHOT_CHUNK = 200
+
+
+def versions(label):
+    '''versions returns {id: [last_updated, neighbours, degree]} for every
+    node of label, in one query
+    '''
+    query = '''MATCH (n:{}) WHERE exists(n.id)
+               OPTIONAL MATCH (n)-[*1..2]-(m)
+               RETURN n.id AS id, {} AS updated,
+                      max({}) AS neighbours,
+                      count(DISTINCT m) AS degree'''.format(
+        label, SECONDS.format("n"), SECONDS.format("m"))
+    return {row['id']: [row['updated'], row['neighbours'], row['degree']]
+            for row in graph.run(query)}
+
+
+def read_snapshot(path=None):
+    '''read_snapshot returns the snapshot at path, or None if there is none
+    (or it can't be read)
+    '''
+    path = path or settings.ATLAS_SNAPSHOT_PATH
+    try:
+        with gzip.open(path, "rt", encoding="utf-8") as snapshot:
+            return json.load(snapshot)
+    except (OSError, ValueError):
+        return None
+
+
+def build_snapshot(path=None, full=False):
+    '''build_snapshot writes the snapshot to path, rendering only the nodes
+    whose version changed since the snapshot already there unless full is
+    True. Returns {label: (rendered, reused, removed)}
+    :param path: where to write it, default ATLAS_SNAPSHOT_PATH
+    :param full: if True, render every node again
+    '''
+    path = path or settings.ATLAS_SNAPSHOT_PATH
+    previous = None if full else read_snapshot(path)
+    if previous is None:
+        previous = {"versions": {}}
+    snapshot = {"generated": int(time.time()), "versions": {}}
+    stats = {}
+    for node_class in SNAPSHOT_CLASSES:
+        node = node_class()
+        label = node.name
+        current = versions(label)
+        old_versions = previous["versions"].get(label, {})
+        old_records = {x["id"]: x for x in previous.get(label, [])}
+        stale = sorted(uid for uid, version in current.items()
+                       if old_versions.get(uid) != version
+                       or uid not in old_records)
+        records = {uid: old_records[uid] for uid in current
+                   if uid in old_records}
+        rendered = 0
+        for start in range(0, len(stale), SNAPSHOT_CHUNK):
+            for record in node.get_full_many(
+                    stale[start:start + SNAPSHOT_CHUNK]):
+                records[record["id"]] = record
+                rendered += 1
+        snapshot[label] = [records[uid] for uid in sorted(records)]
+        snapshot["versions"][label] = {uid: current[uid] for uid in records}
+        stats[label] = (rendered, len(records) - rendered,
+                        len(set(old_records) - set(current)))
+    write_snapshot(snapshot, path)
+    return stats
+
+
+def write_snapshot(snapshot, path):
+    '''write_snapshot gzips snapshot to a file next to path, and moves it
+    over path once it is complete
+    '''
+    directory = os.path.dirname(os.path.abspath(path))
+    os.makedirs(directory, exist_ok=True)
+    handle, partial = tempfile.mkstemp(dir=directory, suffix=".partial")
+    try:
+        with os.fdopen(handle, "wb") as raw:
+            with gzip.GzipFile(fileobj=raw, mode="wb") as compressed:
+                compressed.write(json.dumps(snapshot, default=str).encode(
+                    "utf-8"))
+        os.chmod(partial, 0o644)
+        os.replace(partial, path)
+    except BaseException:
+        os.unlink(partial)
+        raise
+
+
+def snapshot_etag(path=None):
+    '''snapshot_etag identifies the snapshot file by its size and mtime, as
+    static file servers do, None if there is no snapshot
+    '''
+    try:
+        stat = os.stat(path or settings.ATLAS_SNAPSHOT_PATH)
+    except OSError:
+        return None
+    return "{:x}-{:x}".format(stat.st_mtime_ns, stat.st_size)
@@ -0,0 +1,34 @@
+// Select boxes rendered by forms.RemoteLookupSelect hold only the selected
+// option, the rest are looked up in the autocomplete api as the user types.
+$(function() {
+    $('select.remote-lookup').each(function() {
+        var select = $(this);
+        var types = select.data('lookup-types').split(',');
+        select.select2({
+            width: '100%',
+            placeholder: 'Search',
+            minimumInputLength: 2,
+            ajax: {
+                type: 'GET',
+                url: select.data('lookup-url'),
+                delay: 250,
+                data: function (params) {
+                    return {'q': params.term, 'type': types.join(',')};
+                },
+                dataType: 'json',
+                processResults: function (data) {
+                    return {
+                        results: $.map(data, function(datum) {
+                            var text = datum.name;
+                            if (types.length > 1) {
+                                text += ' (' + datum.label.charAt(0).toUpperCase() +
+                                    datum.label.slice(1) + ')';
+                            }
+                            return {id: datum.id, text: text};
+                        })
+                    };
+                }
+            }
+        });
+    });
+});
@@ -0,0 +1,48 @@
+from django.test import TestCase
+
+from cognitive.apps.atlas.analysis import (
+    Subgraph, compute_pagerank, compute_closeness_centrality,
+    compute_betweenness_centrality, compute_triangle_count,
+    compute_connected_components, compute_strongly_connected_components
+)
+
+
+class AnalysisTest(TestCase):
+    def setUp(self):
+        # a directed cycle 0 -> 1 -> 2 -> 0, a tail 2 -> 3 -> 4, and a
+        # separate edge 5 -> 6
+        self.subgraph = Subgraph(
+            [10, 11, 12, 13, 14, 15, 16],
+            ["trm_0", "trm_1", "trm_2", "trm_3", "trm_4", "trm_5", None],
+            [0, 1, 2, 2, 3, 5],
+            [1, 2, 0, 3, 4, 6])
+
+    def test_pagerank(self):
+        rank = compute_pagerank(self.subgraph)
+        self.assertAlmostEqual(rank.sum(), 1)
+        self.assertGreater(rank[4], rank[3])
+        self.assertGreater(rank[6], rank[5])
+
+    def test_closeness_centrality(self):
+        closeness = compute_closeness_centrality(self.subgraph)
+        self.assertEqual(closeness.argmax(), 2)
+        self.assertAlmostEqual(closeness[5], 1 / 6)
+
+    def test_betweenness_centrality(self):
+        betweenness = compute_betweenness_centrality(self.subgraph)
+        self.assertEqual(list(betweenness), [0, 0, 4, 3, 0, 0, 0])
+
+    def test_triangle_count(self):
+        triangles = compute_triangle_count(self.subgraph)
+        self.assertEqual(list(triangles), [1, 1, 1, 0, 0, 0, 0])
+
+    def test_connected_components(self):
+        components = compute_connected_components(self.subgraph)
+        self.assertEqual(list(components), [10, 10, 10, 10, 10, 15, 15])
+
+    def test_strongly_connected_components(self):
+        components = compute_strongly_connected_components(self.subgraph)
+        self.assertEqual(list(components), [10, 10, 10, 13, 14, 15, 16])
+
+    def test_keys(self):
+        self.assertEqual(self.subgraph.keys()[-2:], ["trm_5", 16])
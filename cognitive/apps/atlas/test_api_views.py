@@ -44,6 +44,115 @@ class ConceptApiTest(TestCase):
         self.assertEqual(content['id'], self.con1['id'])
         self.assertEqual(response.status_code, 200)
 
+    def test_conceptapidetail_not_modified(self):
+        url = reverse('concept_api_list')
+        response = self.client.get(url, {'id': self.con1['id']})
+        self.assertTrue(response.has_header('Last-Modified'))
+        etag = response['ETag']
+        response = self.client.get(url, {'id': self.con1['id']},
+                                   HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 304)
+        response = self.client.get(url, {'id': self.con2['id']},
+                                   HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 200)
+
+    def test_conceptapidetail_ms_last_updated(self):
+        # imported nodes have their last_updated in ms
+        graph.run("MATCH (n:concept) WHERE n.id = $id "
+                  "SET n.last_updated = 1466000000000", id=self.con1['id'])
+        response = self.client.get(reverse('concept_api_list'),
+                                   {'id': self.con1['id']})
+        self.assertEqual(response.status_code, 200)
+        self.assertIn("2016", response['Last-Modified'])
+
+    def test_conceptapidetail_ms_neighbour_updated(self):
+        # a neighbour in ms must not hide the update of one in seconds
+        concept = Concept()
+        con3 = concept.create("test_view_concept3")
+        concept.link(con3['id'], self.con1['id'], "KINDOF")
+        concept.link(con3['id'], self.con2['id'], "KINDOF")
+        graph.run("MATCH (n:concept) WHERE n.id = $id "
+                  "SET n.last_updated = 1466000000000", id=self.con2['id'])
+        url = reverse('concept_api_list')
+        response = self.client.get(url, {'id': self.con1['id']})
+        etag = response['ETag']
+        concept.update(con3['id'], {"definition_text": "updated"})
+        response = self.client.get(url, {'id': self.con1['id']},
+                                   HTTP_IF_NONE_MATCH=etag)
+        concept.delete(con3['id'])
+        self.assertEqual(response.status_code, 200)
+
+    def test_conceptapi_pages(self):
+        ids = sorted([self.con1['id'], self.con2['id']])
+        response = self.client.get(reverse('concept_api_list'),
+                                   {'limit': 1, 'after': ids[0]})
+        content = json.loads(response.content.decode('utf-8'))
+        self.assertEqual(len(content['results']), 1)
+        page_id = content['results'][0]['id']
+        self.assertTrue(ids[0] < page_id <= ids[1])
+        response = self.client.get(content['next'])
+        content = json.loads(response.content.decode('utf-8'))
+        self.assertTrue(all(x['id'] > page_id for x in content['results']))
+        response = self.client.get(reverse('concept_api_list'),
+                                   {'limit': 'x'})
+        self.assertEqual(response.status_code, 400)
+
+    def test_conceptapi_stream(self):
+        concept = Concept()
+        response = self.client.get(reverse('concept_api_list'),
+                                   {'stream': 1})
+        self.assertEqual(response['Content-Type'], "application/x-ndjson")
+        lines = b"".join(response.streaming_content).decode('utf-8')
+        ids = [json.loads(x)['id'] for x in lines.splitlines()]
+        self.assertEqual(ids, sorted(ids))
+        self.assertEqual(len(ids), concept.count())
+        self.assertEqual([x['id'] for x in concept.iter_all(chunk_size=2)],
+                         ids)
+
+    def test_conceptapidetail_by_ids(self):
+        ids = [self.con2['id'], self.con1['id']]
+        response = self.client.get(reverse('concept_api_list'),
+                                   {'ids': ",".join(ids)})
+        content = json.loads(response.content.decode('utf-8'))
+        self.assertEqual([x['id'] for x in content], ids)
+        self.assertEqual(content[0]['relationships'], [])
+        self.assertEqual(response.status_code, 200)
+
+    def test_conceptapi_bulk(self):
+        ids = [self.con1['id'], self.con2['id']]
+        response = self.client.post(reverse('concept_api_bulk'),
+                                    json.dumps({'ids': ids}),
+                                    content_type="application/json")
+        content = json.loads(response.content.decode('utf-8'))
+        self.assertEqual([x['name'] for x in content],
+                         ["test_view_concept", "test_view_concept2"])
+        response = self.client.post(reverse('concept_api_bulk'),
+                                    json.dumps({'ids': ["trm_missing"]}),
+                                    content_type="application/json")
+        self.assertEqual(response.status_code, 404)
+
+    def test_concept_hierarchy_api(self):
+        Concept().link(self.con2['id'], self.con1['id'], "KINDOF")
+        response = self.client.get(reverse('concept_hierarchy_api'),
+                                   {'id': self.con2['id']})
+        content = json.loads(response.content.decode('utf-8'))
+        self.assertEqual(content['ancestors'], [
+            {'id': self.con1['id'], 'name': "test_view_concept"}])
+        response = self.client.get(reverse('concept_hierarchy_api'),
+                                   {'id': self.con2['id'],
+                                    'other': self.con1['id']})
+        content = json.loads(response.content.decode('utf-8'))
+        self.assertTrue(content['is_a'])
+        self.assertFalse(content['other_is_a'])
+        self.assertEqual([x['id'] for x in content['lowest_common_ancestors']],
+                         [self.con1['id']])
+        response = self.client.get(reverse('concept_hierarchy_api'),
+                                   {'id': "trm_missing"})
+        self.assertEqual(response.status_code, 404)
+        response = self.client.get(reverse('concept_hierarchy_api'),
+                                   {'id': self.con2['id'], 'relation': "ISA"})
+        self.assertEqual(response.status_code, 400)
+
 
 class TaskApiTest(TestCase):
 
@@ -131,3 +240,31 @@ class SearchApiTest(TestCase):
                                    'q': "super silly not existing thing"})
         self.assertEqual(response.status_code, 404)
 '''
+
+
+class AutocompleteApiTest(TestCase):
+    def setUp(self):
+        concept = Concept()
+        self.con = concept.create("test autocomplete concept")
+
+    def tearDown(self):
+        graph.delete(self.con)
+
+    def test_autocomplete(self):
+        response = self.client.get(reverse('autocomplete_api'), {
+                                   'q': 'Test Autoc', 'type': 'concept'})
+        content = json.loads(response.content.decode('utf-8'))
+        self.assertEqual(response.status_code, 200)
+        self.assertIn(self.con['id'], [x['id'] for x in content])
+        self.assertIn('max-age=60', response['Cache-Control'])
+        response = self.client.get(reverse('autocomplete_api'), {
+                                   'q': 'autocomplete conc', 'type': 'task'})
+        content = json.loads(response.content.decode('utf-8'))
+        self.assertNotIn(self.con['id'], [x['id'] for x in content])
+
+    def test_autocomplete_not_modified(self):
+        params = {'q': 'autocomplete conc'}
+        response = self.client.get(reverse('autocomplete_api'), params)
+        response = self.client.get(reverse('autocomplete_api'), params,
+                                   HTTP_IF_NONE_MATCH=response['ETag'])
+        self.assertEqual(response.status_code, 304)
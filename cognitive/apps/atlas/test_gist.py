@@ -0,0 +1,49 @@
+from django.test import TestCase
+from django.urls import reverse
+
+from cognitive.apps.atlas.gist import gist_lines, neighbourhood
+from cognitive.apps.atlas.query import Concept, Contrast, Task
+
+
+class GistTest(TestCase):
+    def setUp(self):
+        self.task = Task()
+        self.concept = Concept()
+        self.contrast = Contrast()
+        self.tsk = self.task.create("test_gist_task")
+        self.con = self.concept.create("test_gist_concept")
+        self.cont = self.contrast.create("test_gist_contrast")
+        self.task.link(self.tsk['id'], self.con['id'], "ASSERTS",
+                       endnode_type="concept")
+        self.task.link(self.tsk['id'], self.cont['id'], "HASCONTRAST",
+                       endnode_type="contrast")
+        self.concept.link(self.con['id'], self.cont['id'], "MEASUREDBY",
+                          endnode_type="contrast")
+
+    def tearDown(self):
+        self.task.delete(self.tsk['id'])
+        self.concept.delete(self.con['id'])
+        self.contrast.delete(self.cont['id'])
+
+    def test_neighbourhood(self):
+        nodes, relations = neighbourhood("task", self.tsk['id'], depth=2)
+        self.assertEqual(list(nodes)[0], self.tsk['id'])
+        self.assertEqual(nodes[self.con['id']], ("concept", "test_gist_concept"))
+        self.assertEqual(sorted(relations), sorted([
+            (self.tsk['id'], "ASSERTS", self.con['id']),
+            (self.tsk['id'], "HASCONTRAST", self.cont['id']),
+            (self.con['id'], "MEASUREDBY", self.cont['id'])]))
+        nodes, relations = neighbourhood("concept", self.con['id'], depth=1)
+        self.assertEqual(list(nodes), [self.con['id'], self.cont['id']])
+        nodes, relations = neighbourhood("task", self.tsk['id'], max_nodes=2)
+        self.assertEqual(len(nodes), 2)
+        self.assertEqual(len(relations), 1)
+        self.assertEqual(neighbourhood("task", "tsk_missing"), ({}, []))
+
+    def test_download(self):
+        response = self.client.get(reverse('download_task_gist',
+                                           kwargs={'uid': self.tsk['id']}))
+        content = b"".join(response.streaming_content).decode('utf-8')
+        for line in gist_lines("task", self.tsk['id']):
+            self.assertIn(line, content)
+        self.assertIn("test_gist_task", content)
@@ -0,0 +1,93 @@
+from concurrent.futures import ThreadPoolExecutor
+
+from django.test import TestCase
+
+from cognitive.apps.atlas.query import Concept, Task
+from cognitive.graphdb import GraphPool, GraphPoolTimeout, fingerprint
+from cognitive.settings import graph
+
+
+class GraphPoolTest(TestCase):
+    def setUp(self):
+        self.concept = Concept()
+        self.uids = []
+
+    def tearDown(self):
+        for uid in self.uids:
+            self.concept.delete(uid)
+
+    def create_and_get(self, i):
+        name = "test_pool_{}".format(i)
+        node = self.concept.create(name)
+        found = self.concept.get(node['id'])
+        return node['id'], name, found[0]['name']
+
+    def test_threads(self):
+        with ThreadPoolExecutor(max_workers=graph.size * 3) as executor:
+            results = list(executor.map(self.create_and_get, range(100)))
+        self.uids = [x[0] for x in results]
+        self.assertEqual(len(set(self.uids)), 100)
+        for uid, name, found in results:
+            self.assertEqual(name, found)
+        self.assertLessEqual(graph.peak, graph.size)
+        self.assertEqual(graph.in_use, 0)
+
+    def test_timeout(self):
+        pool = GraphPool("http://graphdb:7474", auth=("neo4j", "test"),
+                         size=1, timeout=0.1)
+        with pool.session():
+            # the thread holding the session reuses it
+            self.assertEqual(pool.run("RETURN 1").evaluate(), 1)
+            with ThreadPoolExecutor(max_workers=1) as executor:
+                other = executor.submit(pool.evaluate, "RETURN 1")
+                self.assertRaises(GraphPoolTimeout, other.result)
+        self.assertEqual(pool.evaluate("RETURN 1"), 1)
+
+    def test_parallel(self):
+        def nested():
+            # calls made on a worker run in turn rather than wait on others
+            return graph.parallel(lambda: 1, lambda: 2)
+
+        self.assertEqual(graph.parallel(), [])
+        self.assertEqual(
+            graph.parallel(lambda: graph.evaluate("RETURN 1"), nested,
+                           lambda: graph.evaluate("RETURN 3")),
+            [1, [1, 2], 3])
+        with graph.session():
+            self.assertEqual(graph.parallel(nested, nested),
+                             [[1, 2], [1, 2]])
+        self.assertRaises(ZeroDivisionError, graph.parallel,
+                          lambda: 1, lambda: 1 / 0)
+        self.assertEqual(graph.in_use, 0)
+
+    def test_get_full(self):
+        task = Task()
+        node = task.create("test_parallel_task")
+        self.addCleanup(task.delete, node['id'])
+        concept = self.concept.create("test_parallel_concept")
+        self.uids.append(concept['id'])
+        task.link(node['id'], concept['id'], "ASSERTS", endnode_type="concept")
+        full = task.get_full(node['id'], "id")
+        self.assertEqual(full['name'], "test_parallel_task")
+        self.assertEqual([x['concept_id'] for x in full['concepts']],
+                         [concept['id']])
+        self.assertEqual(full['contrasts'], [])
+        self.assertEqual(task.get_full(node['name'], "name")['concepts'],
+                         full['concepts'])
+
+    def test_recording(self):
+        self.assertEqual(
+            fingerprint("MATCH (n:concept)\n  WHERE n.id = 'trm_1' "
+                        "AND n.x IN [1, 2.5, \"a\"] RETURN n LIMIT 10"),
+            "MATCH (n:concept) WHERE n.id = ? AND n.x IN [?] RETURN n LIMIT ?")
+        with graph.recording() as queries:
+            rows = graph.run("UNWIND range(1, 3) AS x RETURN x").data()
+            graph.parallel(lambda: graph.evaluate("RETURN 1"),
+                           lambda: graph.evaluate("RETURN 2"))
+        self.assertEqual(len(rows), 3)
+        self.assertEqual([x["rows"] for x in queries], [3, 1, 1])
+        self.assertEqual(sorted(x["fingerprint"] for x in queries[1:]),
+                         ["RETURN ?", "RETURN ?"])
+        # nothing is recorded outside the block
+        graph.evaluate("RETURN 1")
+        self.assertEqual(len(queries), 3)
@@ -0,0 +1,126 @@
+from django.test import TestCase
+from django.urls import reverse
+
+from cognitive.apps.atlas.hierarchy import (ConceptClosure, DisorderHierarchy,
+                                            concept_hierarchy,
+                                            disorder_subtree, disorder_tree)
+from cognitive.apps.atlas.query import Concept, Disorder
+from cognitive.apps.atlas.signals import (node_deleted, node_linked,
+                                          node_unlinked, node_updated)
+
+
+class DisorderHierarchyTest(TestCase):
+    def setUp(self):
+        self.disorder = Disorder()
+        self.parent = self.disorder.create("test_hierarchy_parent")
+        self.child = self.disorder.create("test_hierarchy_b_child")
+        self.other = self.disorder.create("test_hierarchy_a_child")
+        self.disorder.link(self.child['id'], self.parent['id'], "ISA")
+        self.disorder.link(self.other['id'], self.parent['id'], "ISA")
+
+    def tearDown(self):
+        self.disorder.delete(self.parent['id'])
+        self.disorder.delete(self.child['id'])
+        self.disorder.delete(self.other['id'])
+
+    def test_disorder_tree(self):
+        parent = (self.parent['id'], "test_hierarchy_parent")
+        tree = disorder_tree()
+        self.assertIn(parent, tree)
+        self.assertEqual(list(tree[parent]), [
+            (self.other['id'], "test_hierarchy_a_child"),
+            (self.child['id'], "test_hierarchy_b_child")])
+        self.assertNotIn((self.child['id'], "test_hierarchy_b_child"), tree)
+        self.assertEqual(list(disorder_subtree(self.child['id'])), [
+            (self.child['id'], "test_hierarchy_b_child")])
+        self.assertIsNone(disorder_subtree("dso_missing"))
+
+    def test_apply(self):
+        hierarchy = DisorderHierarchy()
+        hierarchy.build()
+        uid = self.parent['id']
+        hierarchy.apply(node_unlinked, label="disorder", uid=self.other['id'],
+                        relation_type="ISA", endnode_type="disorder",
+                        endnode_id=uid)
+        self.assertEqual(hierarchy.children[uid], [self.child['id']])
+        self.assertIn(self.other['id'], hierarchy.roots())
+        hierarchy.apply(node_linked, label="disorder", uid=self.other['id'],
+                        relation_type="ISA", endnode_type="disorder",
+                        endnode_id=self.child['id'])
+        self.assertEqual(hierarchy.descendants(uid),
+                         [self.child['id'], self.other['id']])
+        hierarchy.apply(node_updated, label="disorder", uid=self.child['id'],
+                        updates={"name": "renamed"})
+        self.assertEqual(list(hierarchy.subtree(self.child['id'])),
+                         [(self.child['id'], "renamed")])
+        hierarchy.apply(node_deleted, label="disorder", uid=self.child['id'])
+        self.assertEqual(hierarchy.children[uid], [])
+        self.assertIn(self.other['id'], hierarchy.roots())
+
+    def test_all_disorders(self):
+        response = self.client.get(reverse('all_disorders'))
+        self.assertEqual(response.status_code, 200)
+        self.assertIn((self.parent['id'], "test_hierarchy_parent"),
+                      response.context['disorder_tree'])
+        self.assertContains(response, "test_hierarchy_a_child")
+
+
+class ConceptClosureTest(TestCase):
+    def setUp(self):
+        self.concept = Concept()
+        self.top = self.concept.create("test_closure_top")
+        self.middle = self.concept.create("test_closure_middle")
+        self.left = self.concept.create("test_closure_left")
+        self.right = self.concept.create("test_closure_right")
+        self.concept.link(self.middle['id'], self.top['id'], "KINDOF")
+        self.concept.link(self.left['id'], self.middle['id'], "KINDOF")
+        self.concept.link(self.right['id'], self.middle['id'], "KINDOF")
+        self.concept.link(self.right['id'], self.top['id'], "PARTOF")
+
+    def tearDown(self):
+        for node in (self.top, self.middle, self.left, self.right):
+            self.concept.delete(node['id'])
+
+    def test_closure(self):
+        closure = ConceptClosure().current()
+        top, middle = self.top['id'], self.middle['id']
+        left, right = self.left['id'], self.right['id']
+        self.assertEqual([x['id'] for x in closure.ancestors(left)],
+                         [middle, top])
+        self.assertEqual([x['id'] for x in closure.descendants(top)],
+                         [middle, left, right])
+        self.assertEqual([x['id'] for x in closure.ancestors(right, "PARTOF")],
+                         [top])
+        self.assertTrue(closure.is_a(left, top))
+        self.assertFalse(closure.is_a(top, left))
+        self.assertFalse(closure.is_a(left, top, "PARTOF"))
+        self.assertEqual(closure.lowest_common_ancestors(left, right),
+                         [{'id': middle, 'name': "test_closure_middle"}])
+        self.assertIsNone(closure.ancestors("trm_missing"))
+
+    def test_apply(self):
+        closure = ConceptClosure()
+        closure.build()
+        middle, top = self.middle['id'], self.top['id']
+        closure.apply(node_unlinked, label="concept", uid=middle,
+                      relation_type="KINDOF", endnode_type="concept",
+                      endnode_id=top)
+        self.assertFalse(closure.is_a(self.left['id'], top))
+        self.assertEqual(closure.descendants(top), [])
+        closure.apply(node_linked, label="concept", uid=middle,
+                      relation_type="KINDOF", endnode_type="concept",
+                      endnode_id=top)
+        self.assertTrue(closure.is_a(self.right['id'], top))
+        closure.apply(node_deleted, label="concept", uid=middle)
+        self.assertFalse(closure.is_a(self.left['id'], top))
+        self.assertEqual(closure.lowest_common_ancestors(
+            self.left['id'], self.right['id']), [])
+
+    def test_view_concept(self):
+        response = self.client.get(reverse('concept',
+                                           kwargs={'uid': self.left['id']}))
+        self.assertEqual(response.context['further_kinds_of'],
+                         [{'id': self.top['id'], 'name': "test_closure_top"}])
+        self.assertEqual(
+            concept_hierarchy(self.left['id'])['ancestors'][0]['id'],
+            self.middle['id'])
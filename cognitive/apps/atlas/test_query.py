@@ -1,11 +1,19 @@
+from unittest import mock
+
 from py2neo import Graph
 
-from django.test import TestCase
+from django.test import TestCase, override_settings
 
 from cognitive.apps.atlas.query import (
-    Node, Task, Condition, Concept, Contrast, search
+    Assertion, Node, Task, Condition, Concept, Contrast, search
 )
 
+from cognitive.apps.atlas.choices import choice_label, choices
+from cognitive.apps.atlas.counts import get_counts, reconcile
+from cognitive.apps.atlas.forms import BatteryTaskForm, TheoryAssertionForm
+from cognitive.apps.atlas.utils import (do_query, drop_duplicate_rows,
+                                        generate_uid)
+from cognitive.apps.main.context_processors import counts_processor
 from cognitive.settings import graph
 
 
@@ -103,6 +111,138 @@ class NodeTest(TestCase):
         pass
 
 
+@override_settings(ATLAS_CACHE_ENABLED=True)
+class NodeCacheTest(TestCase):
+    def setUp(self):
+        self.concept = Concept()
+        self.con1 = self.concept.create("test_cache_concept")
+        self.con2 = None
+
+    def tearDown(self):
+        graph.delete(self.con1)
+        if self.con2:
+            graph.delete(self.con2)
+
+    def test_read_is_cached(self):
+        first = self.concept.get(self.con1['id'])
+        with mock.patch.object(graph, 'run', wraps=graph.run) as run:
+            second = self.concept.get(self.con1['id'])
+        self.assertEqual(run.call_count, 0)
+        self.assertEqual(first, second)
+
+    def test_write_invalidates(self):
+        self.concept.all()
+        self.con2 = self.concept.create("test_cache_concept2")
+        ids = [x['id'] for x in self.concept.all()]
+        self.assertIn(self.con2['id'], ids)
+        self.concept.update(self.con1['id'], {'name': 'test_cache_renamed'})
+        self.assertEqual(self.concept.get(self.con1['id'])[0]['name'],
+                         'test_cache_renamed')
+
+
+@override_settings(ATLAS_CACHE_ENABLED=True)
+class NodeCountsTest(TestCase):
+    def setUp(self):
+        self.concept = Concept()
+        reconcile()
+
+    def test_counts_follow_writes(self):
+        count = get_counts()['concept']
+        con = self.concept.create("test_counts_concept")
+        self.assertEqual(get_counts()['concept'], count + 1)
+        self.assertTrue(self.concept.delete(con['id']))
+        self.assertEqual(get_counts()['concept'], count)
+        self.assertEqual(reconcile(), {})
+
+    def test_counts_processor_queries(self):
+        counts_processor(None)
+        with mock.patch.object(graph, 'run', wraps=graph.run) as run:
+            counts = counts_processor(None)['counts']
+        self.assertEqual(run.call_count, 0)
+        self.assertEqual(counts['concepts'], self.concept.count())
+
+
+@override_settings(ATLAS_CACHE_ENABLED=True)
+class SearchIndexTest(TestCase):
+    def setUp(self):
+        self.concept = Concept()
+        self.con1 = self.concept.create(
+            "test_index_alpha", {"alias": "test_index_beta"})
+        self.con2 = self.concept.create("test_index_alpha extra")
+
+    def tearDown(self):
+        self.concept.delete(self.con1['id'])
+        self.concept.delete(self.con2['id'])
+
+    def test_prefix_rank(self):
+        result = search('TEST_INDEX_AL')
+        self.assertEqual([x['id'] for x in result],
+                         [self.con1['id'], self.con2['id']])
+        result = search('extra test_index_alpha')
+        self.assertEqual(result[0]['id'], self.con2['id'])
+        self.assertEqual(search('test_index_alpha', limit=1)[0]['id'],
+                         self.con1['id'])
+
+    def test_alias(self):
+        result = self.concept.search_all_fields('test_index_beta')
+        self.assertEqual([x['id'] for x in result], [self.con1['id']])
+
+    def test_update(self):
+        search('test_index_alpha')
+        self.concept.update(self.con1['id'], {'name': 'test_index_gamma'})
+        with mock.patch.object(graph, 'run', wraps=graph.run) as run:
+            result = search('test_index_gamma')
+        self.assertEqual(run.call_count, 0)
+        self.assertEqual([x['id'] for x in result], [self.con1['id']])
+
+
+@override_settings(ATLAS_CACHE_ENABLED=True)
+class ChoiceProviderTest(TestCase):
+    def setUp(self):
+        self.task = Task()
+        self.task1 = self.task.create("test_choice_task")
+
+    def tearDown(self):
+        self.task.delete(self.task1['id'])
+
+    def test_form(self):
+        form = BatteryTaskForm({'tasks': self.task1['id']})
+        self.assertTrue(form.is_valid())
+        self.assertIn('test_choice_task', str(form['tasks']))
+        self.assertEqual(str(form['tasks']).count('<option'), 1)
+        form = BatteryTaskForm({'tasks': 'trm_not_a_task'})
+        self.assertFalse(form.is_valid())
+
+    def test_assertion_form(self):
+        assertion = Assertion()
+        concept = Concept()
+        con1 = concept.create("test_choice_concept")
+        asrt = assertion.create("")
+        assertion.link(asrt['id'], con1['id'], "SUBJECT",
+                       endnode_type="concept")
+        assertion.link(asrt['id'], self.task1['id'], "PREDICATE",
+                       endnode_type="task")
+        form = TheoryAssertionForm({'assertions': asrt['id']})
+        valid = form.is_valid()
+        rendered = str(form['assertions'])
+        assertion.delete(asrt['id'])
+        concept.delete(con1['id'])
+        self.assertTrue(valid)
+        self.assertIn('test_choice_concept test_choice_task', rendered)
+
+    def test_update(self):
+        self.assertIn((self.task1['id'], 'test_choice_task'), choices('task'))
+        self.task.update(self.task1['id'], {'name': 'test_choice_renamed'})
+        with mock.patch.object(graph, 'run', wraps=graph.run) as run:
+            found = choice_label(['concept', 'task'], self.task1['id'])
+            listed = choices('task')
+        self.assertEqual(run.call_count, 0)
+        self.assertEqual(found, ('task', 'test_choice_renamed'))
+        self.assertIn((self.task1['id'], 'test_choice_renamed'), listed)
+        self.task.delete(self.task1['id'])
+        self.assertIsNone(choice_label(['task'], self.task1['id']))
+
+
 class NodeChildrenTest(TestCase):
     def setUp(self):
         self.task = Task()
@@ -194,6 +334,23 @@ class NodeChildrenTest(TestCase):
         self.assertEqual(len(tasks), 1)
         self.assertEqual(tasks[0]['task_id'], self.task1['id'])
 
+    def test_task_get_full_many(self):
+        ids = [self.task2['id'], "tsk_missing", self.task1['id']]
+        full = self.task.get_full_many(ids)
+        self.assertEqual([x['id'] for x in full],
+                         [self.task2['id'], self.task1['id']])
+        single = self.task.get_full(self.task1['id'], 'id')
+        self.assertEqual(set(full[1]), set(single))
+        self.assertEqual(full[1]['concepts'][0]['concept_id'],
+                         single['concepts'][0]['concept_id'])
+        self.assertEqual(full[1]['concepts'][0]['contrasts'],
+                         single['concepts'][0]['contrasts'])
+        self.assertEqual(
+            [dict(cond) for cond, r in full[1]['contrasts'][0]['conditions']],
+            [dict(cond) for cond, r in single['contrasts'][0]['conditions']])
+        self.assertEqual([x['id'] for x in full[1]['conditions']],
+                         [self.cond['id']])
+
 
 class GraphUtilsTest(TestCase):
     def setUp(self):
@@ -253,6 +410,43 @@ class GraphUtilsTest(TestCase):
         result = search('test_name')
         self.assertEqual(len(result), 5)
 
+    def test_do_query(self):
+        query = '''MATCH (t:task) WHERE t.id IN $ids
+                   RETURN t.name, [t.name] ORDER BY t.id'''
+        ids = {'ids': [self.task1['id'], self.task2['id']]}
+        result = do_query(query, fields=["name", "names"], parameters=ids)
+        self.assertEqual(result, [{"name": "test_name",
+                                   "names": ["test_name"]}])
+        result = do_query(query, fields=None, output_format="list",
+                          drop_duplicates=False, parameters=ids)
+        self.assertEqual(result, [["test_name", ["test_name"]]] * 2)
+        result = do_query(query, fields=["name", "names"],
+                          output_format="df", parameters=ids)
+        self.assertEqual(list(result.columns), ["name", "names"])
+        self.assertEqual(len(result), 1)
+
+    def test_do_query_relationships(self):
+        # distinct relationships with the same (no) properties are kept
+        query = "MATCH (t:task)-[r]->() WHERE t.id = $id RETURN r"
+        result = do_query(query, fields=["relation"], output_format="list",
+                          parameters={'id': self.task1['id']})
+        self.assertEqual(len(result), 2)
+
+    def test_generate_uid(self):
+        with mock.patch.object(graph, 'run', wraps=graph.run) as run:
+            uid = generate_uid("battery")
+        self.assertTrue(uid.startswith("tco_"))
+        self.assertEqual(len(uid), 17)
+        query = run.call_args[0][0]
+        self.assertIn("n:battery", query)
+        self.assertIn("n:collection", query)
+        self.assertNotIn("node(*)", query)
+
+    def test_drop_duplicate_rows(self):
+        rows = [{"a": 2, "b": [1]}, {"a": 1, "b": {"c": 1}},
+                {"a": 2, "b": [1]}, {"a": 1, "b": {"c": 1}}]
+        self.assertEqual(drop_duplicate_rows(rows), rows[:2])
+
     '''
     def test_get(self):
         result = get(self.task1['name'])
@@ -0,0 +1,52 @@
+import json
+import os
+import shutil
+import tempfile
+
+from django.test import TestCase, override_settings
+from django.urls import reverse
+
+from cognitive.apps.atlas.querylog import read_slow_log, slow_query_report
+
+
+class QueryLogTest(TestCase):
+    def setUp(self):
+        self.directory = tempfile.mkdtemp()
+        self.path = os.path.join(self.directory, "slow.log")
+
+    def tearDown(self):
+        shutil.rmtree(self.directory)
+
+    def test_headers(self):
+        response = self.client.get(reverse('all_concepts'))
+        self.assertGreater(int(response['X-Graph-Queries']), 0)
+        self.assertGreaterEqual(float(response['X-Graph-Time']), 0)
+
+    def test_report(self):
+        entries = [
+            {"fingerprint": "A", "ms": 300.0, "rows": 10, "path": "/a"},
+            {"fingerprint": "A", "ms": 500.0, "rows": 30, "path": "/b"},
+            {"fingerprint": "B", "ms": 700.0, "rows": None, "path": "/a"}]
+        with open(self.path + ".1", "w") as log:
+            log.write(json.dumps(entries[0]) + "\nnot json\n")
+        with open(self.path, "w") as log:
+            log.write("\n".join(json.dumps(x) for x in entries[1:]) + "\n")
+        read = list(read_slow_log(self.path))
+        self.assertEqual(read, entries)
+        report = slow_query_report(read)
+        self.assertEqual([x["fingerprint"] for x in report], ["A", "B"])
+        self.assertEqual(report[0]["count"], 2)
+        self.assertEqual(report[0]["mean"], 400.0)
+        self.assertEqual(report[0]["rows"], 20.0)
+        self.assertEqual(report[0]["paths"], ["/a", "/b"])
+        self.assertEqual(report[1]["rows"], None)
+        self.assertEqual([x["fingerprint"] for x in
+                          slow_query_report(read, order="max", top=1)], ["B"])
+
+    @override_settings(GRAPH_SLOW_QUERY_MS=0)
+    def test_slow_log(self):
+        with self.assertLogs("cognitive.graph.slow") as logs:
+            self.client.get(reverse('all_concepts'))
+        entry = json.loads(logs.records[0].getMessage())
+        self.assertEqual(entry["path"], reverse('all_concepts'))
+        self.assertIn("fingerprint", entry)
@@ -0,0 +1,44 @@
+from django.test import TestCase
+
+from cognitive.apps.atlas.schema import (
+    SchemaItem, create_schema, declared_schema, diff_schema, explain,
+    plan_access, plan_operators, statement
+)
+
+
+class SchemaTest(TestCase):
+    def test_declared_schema(self):
+        schema = declared_schema()
+        self.assertIn(SchemaItem("constraint", "concept", "id"), schema)
+        self.assertIn(SchemaItem("index", "task", "name"), schema)
+        self.assertIn(SchemaItem("constraint", "collection", "id"), schema)
+
+    def test_statement(self):
+        self.assertEqual(
+            statement(SchemaItem("constraint", "concept", "id")),
+            "CREATE CONSTRAINT ON (n:concept) ASSERT n.id IS UNIQUE")
+        self.assertEqual(
+            statement(SchemaItem("index", "task", "name"), "DROP"),
+            "DROP INDEX ON :task(name)")
+
+    def test_create_schema(self):
+        self.assertEqual(create_schema(), {})
+        missing, _, _ = diff_schema()
+        self.assertEqual(missing, [])
+        operators = explain("MATCH (n:concept) WHERE n.id = $id RETURN n",
+                            {"id": "trm_1"})
+        self.assertIn("NodeUniqueIndexSeek", operators)
+
+    def test_plan_operators(self):
+        plan = {"operatorType": "ProduceResults@neo4j", "children": [
+            {"operatorType": "NodeByLabelScan@neo4j", "children": []}]}
+        self.assertEqual(plan_operators(plan),
+                         ["ProduceResults", "NodeByLabelScan"])
+
+    def test_plan_access(self):
+        self.assertEqual(plan_access(["ProduceResults", "NodeIndexSeek"]),
+                         "seek")
+        self.assertEqual(plan_access(["ProduceResults", "NodeIndexScan"]),
+                         "index scan")
+        self.assertEqual(plan_access(["ProduceResults", "NodeByLabelScan"]),
+                         "scan")
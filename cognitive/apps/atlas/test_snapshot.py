@@ -0,0 +1,75 @@
+import os
+import shutil
+import tempfile
+
+from django.test import TestCase, override_settings
+from django.urls import reverse
+
+from cognitive.apps.atlas.query import Concept
+from cognitive.apps.atlas.snapshot import (build_snapshot, read_snapshot,
+                                           versions)
+from cognitive.settings import graph
+
+
+class SnapshotTest(TestCase):
+    def setUp(self):
+        self.directory = tempfile.mkdtemp()
+        self.path = os.path.join(self.directory, "atlas.json.gz")
+        self.concept = Concept()
+        self.con1 = self.concept.create("test_snapshot_concept")
+        self.con2 = self.concept.create("test_snapshot_concept2")
+
+    def tearDown(self):
+        self.concept.delete(self.con1['id'])
+        self.concept.delete(self.con2['id'])
+        shutil.rmtree(self.directory)
+
+    def test_build_snapshot(self):
+        build_snapshot(self.path)
+        snapshot = read_snapshot(self.path)
+        records = {x['id']: x for x in snapshot['concept']}
+        self.assertEqual(records[self.con1['id']]['name'],
+                         "test_snapshot_concept")
+        self.assertEqual(records[self.con1['id']]['relationships'], [])
+
+        stats = build_snapshot(self.path)
+        self.assertEqual(stats['concept'][0], 0)
+
+        self.concept.link(self.con1['id'], self.con2['id'], "KINDOF")
+        stats = build_snapshot(self.path)
+        self.assertEqual(stats['concept'][0], 2)
+        records = {x['id']: x for x in read_snapshot(self.path)['concept']}
+        self.assertEqual(
+            [x['id'] for x in records[self.con1['id']]['relationships']],
+            [self.con2['id']])
+
+        self.concept.delete(self.con2['id'])
+        stats = build_snapshot(self.path)
+        self.assertEqual(stats['concept'][2], 1)
+        self.assertNotIn(self.con2['id'],
+                         [x['id'] for x in read_snapshot(self.path)['concept']])
+
+    def test_versions_ms_neighbour(self):
+        # an imported neighbour in ms must not hide updates of the others
+        con3 = self.concept.create("test_snapshot_concept3")
+        self.concept.link(con3['id'], self.con1['id'], "KINDOF")
+        self.concept.link(con3['id'], self.con2['id'], "KINDOF")
+        graph.run("MATCH (n:concept) WHERE n.id = $id "
+                  "SET n.last_updated = 1466000000000", id=self.con2['id'])
+        before = versions("concept")[self.con1['id']]
+        self.concept.update(con3['id'], {"definition_text": "updated"})
+        after = versions("concept")[self.con1['id']]
+        self.concept.delete(con3['id'])
+        self.assertNotEqual(before, after)
+
+    def test_download(self):
+        with override_settings(ATLAS_SNAPSHOT_PATH=self.path):
+            response = self.client.get(reverse('snapshot_api'))
+            self.assertEqual(response.status_code, 404)
+            build_snapshot(self.path)
+            response = self.client.get(reverse('snapshot_api'))
+            self.assertEqual(response.status_code, 200)
+            self.assertEqual(response['Content-Type'], "application/gzip")
+            response = self.client.get(
+                reverse('snapshot_api'), HTTP_IF_NONE_MATCH=response['ETag'])
+            self.assertEqual(response.status_code, 304)
@@ -0,0 +1,28 @@
+from django.test import TestCase
+
+from cognitive.apps.atlas.forms import ConceptForm
+from cognitive.apps.atlas.management.commands.import_time import (
+    measure_startup, parse_importtime
+)
+
+
+class StartupTest(TestCase):
+    def test_startup(self):
+        total, timings, heavy, connected = measure_startup()
+        self.assertFalse(connected)
+        self.assertEqual(heavy, [])
+        self.assertIn("cognitive.urls", [x[0] for x in timings])
+        self.assertGreater(total, 0)
+
+    def test_parse_importtime(self):
+        stderr = ("import time: self [us] | cumulative | imported package\n"
+                  "import time:       120 |        320 |   json.decoder\n"
+                  "import time:       200 |        520 | json\n")
+        self.assertEqual(parse_importtime(stderr), [
+            ("json.decoder", 0.00012, 0.00032, 1),
+            ("json", 0.0002, 0.00052, 0)])
+
+    def test_concept_class_choices(self):
+        form = ConceptForm("trm_test", {"submit": True})
+        choices = list(form.fields["concept_class"].choices)
+        self.assertEqual(choices[0], (None, "-no-"))
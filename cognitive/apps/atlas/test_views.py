@@ -1,5 +1,7 @@
 import string
+from unittest import mock
 
+from django.conf import settings
 from django.urls import reverse
 from django.test import TestCase
 
@@ -109,6 +111,31 @@ class AtlasViewTestCase(TestCase):
         self.assertEqual(response.context['concept']['id'], uid)
         graph.delete(con)
 
+    def test_view_concept_not_modified(self):
+        concept = Concept()
+        con = concept.create("test_view_concept", {"prop": "prop"})
+        other = concept.create("test_view_concept_other")
+        url = reverse('concept', kwargs={'uid': con['id']})
+        response = self.client.get(url)
+        etag = response['ETag']
+        response = self.client.get(url, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 304)
+        concept.link(con['id'], other['id'], "KINDOF")
+        response = self.client.get(url, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 200)
+        etag = response['ETag']
+        # a rename is seen by the nodes it is linked to
+        concept.update(other['id'], {"name": "test_view_concept_renamed"})
+        response = self.client.get(url, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 200)
+        # a new csrf secret (as on login) makes the page new
+        etag = response['ETag']
+        self.client.cookies.pop(settings.CSRF_COOKIE_NAME)
+        response = self.client.get(url, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 200)
+        concept.delete(con['id'])
+        concept.delete(other['id'])
+
     def test_view_task(self):
         task = Task()
         tsk = task.create("test_view_task",
@@ -120,6 +147,43 @@ class AtlasViewTestCase(TestCase):
         # should also test linked concepts and contrasts
         graph.delete(tsk)
 
+    def test_view_task_query_count(self):
+        task = Task()
+        condition = Condition()
+        contrast = Contrast()
+        concept = Concept()
+        tsk = task.create("test_view_task_query_count", {"prop": "prop"})
+        con = concept.create("test_view_task_query_count", {"prop": "prop"})
+        cond = condition.create("test_view_task_query_count", {"prop": "prop"})
+        task.link(tsk['id'], cond['id'], "HASCONDITION",
+                  endnode_type='condition')
+
+        def add_contrast():
+            cont = contrast.create("test_view_task_query_count")
+            task.link(tsk['id'], cont['id'], "HASCONTRAST",
+                      endnode_type='contrast')
+            condition.link(cond['id'], cont['id'], "HASCONTRAST",
+                           endnode_type='contrast', properties={'weight': 1})
+            concept.link(con['id'], cont['id'], "MEASUREDBY",
+                         endnode_type='contrast')
+
+        def count_queries():
+            with mock.patch.object(graph, 'run', wraps=graph.run) as run:
+                response = self.client.get(
+                    reverse('task', kwargs={'uid': tsk['id']}))
+            self.assertEqual(response.status_code, 200)
+            return run.call_count, response
+
+        add_contrast()
+        one_contrast, response = count_queries()
+        self.assertEqual(len(response.context['contrasts']), 1)
+        for _ in range(4):
+            add_contrast()
+        five_contrasts, response = count_queries()
+        self.assertEqual(len(response.context['contrasts']), 5)
+        self.assertEqual(len(list(response.context['concepts'].values())[0]), 5)
+        self.assertEqual(one_contrast, five_contrasts)
+
     def test_view_theory(self):
         theory = Theory()
         thry = theory.create("test_view_theory", {"prop": "prop"})
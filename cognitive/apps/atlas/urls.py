@@ -213,6 +213,10 @@ urlpatterns = [
         views.set_unreviewed, name="set_unreviewed"),
 
     # Graph views
+    url(r'^graph/task/(?P<uid>[\w\+%_& ]+)/gist$', graph.task_gist,
+        name="task_gist"),
+    url(r'^graph/task/(?P<uid>[\w\+%_& ]+)/gist/download$',
+        graph.download_task_gist, name="download_task_gist"),
     url(r'^graph/(?P<label>[\w\+])/(?P<uid>[\w\+%_& ]+)', graph.graph_view,
         name="graph_view"),
     url(r'^graph/task/(?P<uid>[\w\+%_& ]+)', graph.graph_view,
@@ -223,10 +227,25 @@ urlpatterns = [
 
 api_urls = [
     url(r'^api/search$', api_views.SearchAPI.as_view(), name='search_api_list'),
+    url(r'^api/autocomplete$', api_views.AutocompleteAPI.as_view(),
+        name='autocomplete_api'),
     url(r'^api/concept$',
         api_views.ConceptAPI.as_view(),
         name='concept_api_list'),
     url(r'^api/task$', api_views.TaskAPI.as_view(), name='task_api_list'),
+    url(r'^api/snapshot$', api_views.snapshot_download,
+        name='snapshot_api'),
+    url(r'^api/concept/hierarchy$', api_views.ConceptHierarchyAPI.as_view(),
+        name='concept_hierarchy_api'),
+    url(r'^api/concept/bulk$',
+        api_views.BulkAPI.as_view(node_class=api_views.Concept),
+        name='concept_api_bulk'),
+    url(r'^api/task/bulk$',
+        api_views.BulkAPI.as_view(node_class=api_views.Task),
+        name='task_api_bulk'),
+    url(r'^api/disorder/bulk$',
+        api_views.BulkAPI.as_view(node_class=api_views.Disorder),
+        name='disorder_api_bulk'),
     url(r'^api/disorder$',
         api_views.DisorderAPI.as_view(),
         name='disorder_api_list'),
@@ -2,50 +2,64 @@ from datetime import date
 from urllib.parse import quote
 from urllib.request import urlopen
 
-from lxml import etree
-import pandas
-
 from django.utils.crypto import get_random_string
+from py2neo import Node as NeoNode, Relationship
 
 from cognitive.settings import graph
 
 
+class NodeRecord(dict):
+    '''NodeRecord is a plain dictionary of node properties that hashes on the
+    node id, so it can be used as a key when grouping (eg concept -> contrasts)
+    the same way py2neo nodes are in the detail views.
+    '''
+
+    def __hash__(self):
+        return hash(self.get("id"))
+
+
+# the first letters of the uids of each node type
+UID_PREFIXES = {
+    "concept": "trm",
+    "task": "tsk",
+    "theory": "thc",
+    "contrast": "cnt",
+    "battery": "tco",
+    "disorder": "dso",
+    "collection": "tco",
+    "condition": "con",
+    "implementation": "imp",
+    "external_dataset": "dst",
+    "indicator": "ind",
+    "citation": "cit",
+    "assertion": "ass",
+    "concept_class": "ctp",
+    "disambiguation": "disam",
+    "trait": "trt",
+    "behavior": "bvr"
+}
+
+
 def generate_uid(node_type):
     '''generte_uid will generate a unique identifier for a new node, with first three letters
-    dependent on the term type
+    dependent on the term type. A uid can only clash with one of a node type
+    sharing its prefix, so only those are looked in, by the id index of each
+    label (see schema.py) rather than by scanning every node.
     :param node_type: one of concept, battery, condition, etc.
     '''
-    nodetypes = {
-        "concept": "trm",
-        "task": "tsk",
-        "theory": "thc",
-        "contrast": "cnt",
-        "battery": "tco",
-        "disorder": "dso",
-        "collection": "tco",
-        "condition": "con",
-        "implementation": "imp",
-        "external_dataset": "dst",
-        "indicator": "ind",
-        "citation": "cit",
-        "assertion": "ass",
-        "concept_class": "ctp",
-        "disambiguation": "disam",
-        "trait": "trt",
-        "behavior": "bvr"
-    }
+    prefix = UID_PREFIXES.get(node_type, None)
+    labels = [node_type] + [x for x, y in sorted(UID_PREFIXES.items())
+                            if y == prefix and x != node_type]
+    query = " UNION ALL ".join(
+        "MATCH (n:{}) WHERE n.id = $id RETURN n.id AS id".format(x)
+        for x in labels)
 
     # generate new node uid that doesn't exist
-    result = " "
-    while len(result) > 0:
+    while True:
         suffix = get_random_string(13)
-        uid = "{}_{}".format(nodetypes.get(node_type, None), suffix)
-        query = """start n=node(*)
-                   match (n)
-                   where n.id = '%s'
-                   return n.id""" % (uid)
-        result = do_query(query, fields=["n.id"])
-    return uid
+        uid = "{}_{}".format(prefix, suffix)
+        if graph.run(query, id=uid).evaluate() is None:
+            return uid
 
 
 def get_relation_nodetype(relation):
@@ -140,26 +154,67 @@ def color_by_relation(relation_name):
 # Query helper functions ######################################################
 
 
+def hashable(value):
+    '''hashable returns a hashable stand in for a query result value, with
+    graph nodes and relationships as their identity (they are dictionaries of
+    their properties, which distinct ones can share), lists (eg collected
+    names) as tuples and maps as sorted item tuples
+    '''
+    if isinstance(value, NeoNode) and value.identity is not None:
+        return ("node", value.identity)
+    if isinstance(value, Relationship) and value.identity is not None:
+        return ("relationship", value.identity)
+    if isinstance(value, list):
+        return tuple(hashable(x) for x in value)
+    if isinstance(value, dict):
+        return tuple(sorted((k, hashable(v)) for k, v in value.items()))
+    return value
+
+
+def drop_duplicate_rows(rows):
+    '''drop_duplicate_rows returns rows without repeats, keeping the first of
+    each in order, like pandas drop_duplicates
+    :param rows: a list of result rows, each a list or a dictionary
+    '''
+    seen = set()
+    unique = []
+    for row in rows:
+        values = row.values() if isinstance(row, dict) else row
+        key = tuple(hashable(x) for x in values)
+        if key not in seen:
+            seen.add(key)
+            unique.append(row)
+    return unique
+
+
 def do_query(query, fields, output_format="dict", drop_duplicates=True, parameters={}):
     ''' do_query will return the result of a cypher query in the format
         specified (default is dict)
     :param query: string of cypher query
-    :param output_format: desired output format. Default is "dict"
+    :param fields: the names to give the returned columns (default the keys of
+        the query)
+    :param output_format: desired output format, "dict" (a list of records),
+        "list" (a list of rows) or "df" (a pandas DataFrame). Default is "dict"
     '''
     if isinstance(fields, str):
         fields = [fields]
     result = graph.run(query, parameters)
-    df = result.to_data_frame()
-    if fields is not None and not df.empty:
-        df.columns = fields
+    columns = result.keys()
+    rows = [list(record.values()) for record in result]
+    if fields is not None and rows:
+        if len(fields) != len(columns):
+            raise ValueError("Expected {} fields for the columns {}, got {}"
+                             .format(len(columns), columns, fields))
+        columns = fields
     if drop_duplicates is True:
-        df = df.drop_duplicates()
+        rows = drop_duplicate_rows(rows)
     if output_format == "df":
-        return df
+        import pandas
+        return pandas.DataFrame(rows, columns=columns)
     elif output_format == "list":
-        return df.values.tolist()
+        return rows
     elif output_format == "dict":
-        return df.to_dict(orient="records")
+        return [dict(zip(columns, row)) for row in rows]
 
 
 def do_transaction(tx=None, query=None, params=None):
@@ -186,6 +241,7 @@ def do_transaction(tx=None, query=None, params=None):
     if not results or sum(len(res) for res in results) == 0:
         return None
     # Return as pandas Data Frame
+    import pandas
     column_names = [x.split(".")[-1] for x in results[0].columns]
     df = pandas.DataFrame(columns=column_names)
     for r in range(len(results)):
@@ -223,6 +279,7 @@ def get_paper_properties(doi):
         '?pid=k.j.gorgolewski@sms.ed.ac.uk&format=unixref&id=' + quote(doi)
     print(xmlpath)
     xml_str = urlopen(xmlpath).read()
+    from lxml import etree
     doc = etree.fromstring(xml_str)
     if len(doc.getchildren()) == 0 or len(
             doc.findall('.//crossref/error')) > 0:
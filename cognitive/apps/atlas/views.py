@@ -1,6 +1,6 @@
 ''' Functional views to create, update, and view the various types of terms
     and their relationships in cognitive atlas. '''
-from collections import OrderedDict
+import functools
 import json
 
 from django.contrib import messages
@@ -21,6 +21,8 @@ from cognitive.apps.atlas.forms import (CitationForm, DisorderForm,
                                         BatteryBatteryForm, BatteryTaskForm,
                                         ConceptForm)
 import cognitive.apps.atlas.forms as forms
+from cognitive.apps.atlas.conditional import conditional_page
+import cognitive.apps.atlas.hierarchy as hierarchy
 import cognitive.apps.atlas.query as query
 from cognitive.apps.atlas.utils import (clean_html, add_update,
                                         get_paper_properties, InvalidDoiException)
@@ -88,14 +90,17 @@ def own_or_admin(func):
 ''' Test meant for use inside views instead of as function decorator '''
 
 
-def owner_or_admin(user, term_id, label=None):
+def owner_or_admin(user, term_id, label=None, owner_id=None):
+    ''' owner_id may be passed in by views that already looked up the
+        creator of the term, to save a query. '''
     if not user.is_authenticated:
         return False
-    if not label:
-        label = Node.get_label(term_id)
     if is_admin(user):
         return True
-    owner_id = get_creator(term_id, label, by_uid=True)
+    if owner_id is None:
+        if not label:
+            label = Node.get_label(term_id)
+        owner_id = get_creator(term_id, label, by_uid=True)
     if owner_id is not None and owner_id == user.id:
         return True
     return False
@@ -126,6 +131,21 @@ def get_creator(uid, label, by_uid=False):
     return creator
 
 
+def group_by_task(contrasts):
+    '''group_by_task returns {task: [contrast]} for the contrasts that belong
+    to a task, reading the task of every contrast at once
+    '''
+    contrast_tasks = graph.parallel(*[
+        functools.partial(Contrast.get_reverse_relation, contrast["id"],
+                          "HASCONTRAST", "task")
+        for contrast in contrasts])
+    tasks = {}
+    for contrast, contrast_task in zip(contrasts, contrast_tasks):
+        if contrast_task:
+            tasks.setdefault(contrast_task[0], []).append(contrast)
+    return tasks
+
+
 # VIEWS FOR ALL NODES #########################################################
 
 def all_nodes(request, nodes, node_type, node_type_plural):
@@ -198,34 +218,11 @@ def all_concept_classes(request, return_context=False):
     return render(request, "atlas/all_concept_classes.html", context)
 
 
-def disorder_populate(disorders):
-    ''' recursive function that fills a dictionary with all disorders and their
-        children disorders'''
-    if bool(disorders) is False:
-        return None
-    ret = OrderedDict()
-    for dis in disorders:
-        key = (str(dis['id']), str(dis['name']))
-        children = [x.start_node for x in dis.match_incoming(rel_type="ISA")]
-        if children:
-            children.sort(key=lambda x: str.lower(x['name']))
-        ret[key] = disorder_populate(children)
-    return ret
-
-
 def all_disorders(request, return_context=False):
     '''all_disorders returns page with list of all disorders'''
     disorder_form = DisorderForm
-
-    '''
-    dis_records = graph.run(
-        "match (dis:disorder) where not (dis:disorder)-[:ISA]->() return dis order by dis.name"
-    )
-    top_level_disorders = [x['dis'] for x in dis_records]
-    top_level_disorders.sort(key=lambda x: str.lower(x['name']))
-    disorders = disorder_populate(top_level_disorders)
-    '''
     disorders = Disorder.all(order_by="name")
+    disorder_tree = hierarchy.disorder_tree()
     traits = Trait.all(order_by="name")
     behaviors = Behavior.all(order_by="name")
 
@@ -234,6 +231,7 @@ def all_disorders(request, return_context=False):
         'active': "disorders",
         'disorder_form': disorder_form,
         'disorders': disorders,
+        'disorder_tree': disorder_tree,
         'phenotype_form': forms.PhenotypeForm(),
         'traits': traits,
         'behaviors': behaviors
@@ -296,44 +294,46 @@ def view_term(request, uid):
         raise Http404("Term does not exist")
 
 
+@conditional_page("concept", extra=hierarchy.concept_ancestry)
 def view_concept(request, uid, return_context=False):
     ''' detail view for a give concept '''
+    (concept, creator_id, citations, contrasts, are_kinds_of,
+     are_parts_of) = graph.parallel(
+        functools.partial(Concept.get, uid),
+        functools.partial(get_creator, uid, "concept", by_uid=True),
+        functools.partial(Concept.get_relation, uid, "HASCITATION"),
+        functools.partial(Concept.get_relation, uid, "MEASUREDBY"),
+        functools.partial(Concept.get_reverse_relation, uid, "KINDOF"),
+        functools.partial(Concept.get_reverse_relation, uid, "PARTOF"))
     try:
-        concept = Concept.get(uid)[0]
+        concept = concept[0]
     except IndexError:
         raise Http404("Concept does not exist")
 
     # For each measured by (contrast), get the task
-    if "MEASUREDBY" in concept["relations"]:
-        for c in range(len(concept["relations"]["MEASUREDBY"])):
-            contrast = concept["relations"]["MEASUREDBY"][c]
-            tasks = Contrast.get_tasks(contrast["id"])
-            concept["relations"]["MEASUREDBY"][c]["tasks"] = tasks
-
-    citations = Concept.get_relation(concept["id"], "HASCITATION")
-    tasks = Concept.get_reverse_relation(concept["id"], "ASSERTS")
-    contrasts = Concept.get_relation(concept["id"], "MEASUREDBY")
+    measured_by = concept["relations"].get("MEASUREDBY", [])
+    measured_by_tasks = graph.parallel(*[
+        functools.partial(Contrast.get_tasks, contrast["id"])
+        for contrast in measured_by])
+    for contrast, tasks in zip(measured_by, measured_by_tasks):
+        contrast["tasks"] = tasks
 
     assertions_no_cont = []
-    are_kinds_of = Concept.get_reverse_relation(concept["id"], "KINDOF")
-    are_parts_of = Concept.get_reverse_relation(concept["id"], "PARTOF")
+    tasks = group_by_task(contrasts)
 
-    tasks = {}
-    for contrast in contrasts:
-        contrast_task = Contrast.get_reverse_relation(
-            contrast["id"], "HASCONTRAST", "task")
-        try:
-            tasks[contrast_task[0]]
-        except KeyError:
-            tasks[contrast_task[0]] = []
-        except IndexError:
-            continue
-        tasks[contrast_task[0]].append(contrast)
+    # what the concept is a kind (or part) of through its direct parents
+    ancestry = hierarchy.concept_ancestry(uid) or {}
+    further = {}
+    for relation, ancestors in ancestry.items():
+        direct = {x["id"] for x in concept["relations"].get(relation, [])}
+        further[relation] = [x for x in ancestors if x["id"] not in direct]
 
     context = {
-        "creator": get_creator(uid, "concept"),
+        "creator": get_display_name(creator_id) if creator_id else None,
         "are_kinds_of": are_kinds_of,
         "are_parts_of": are_parts_of,
+        "further_kinds_of": further.get("KINDOF", []),
+        "further_parts_of": further.get("PARTOF", []),
         "concept": concept,
         "assertions": tasks,
         "assertions_no_cont": assertions_no_cont,
@@ -341,7 +341,8 @@ def view_concept(request, uid, return_context=False):
         "doi_form": forms.DoiForm(uid, 'concept'),
         "concept_task_form": ConceptTaskForm(),
         "concept_form": ConceptForm(concept["id"], concept),
-        "owner_or_admin": owner_or_admin(request.user, uid),
+        "owner_or_admin": owner_or_admin(request.user, uid,
+                                         owner_id=creator_id),
     }
 
     if return_context is True:
@@ -350,82 +351,42 @@ def view_concept(request, uid, return_context=False):
     return render(request, 'atlas/view_concept.html', context)
 
 
-def get_measured_by(contrasts, label):
-    ret = {}
-    for contrast in contrasts:
-        label_node = Contrast.get_reverse_relation(
-            contrast["id"], "MEASUREDBY", label)
-        try:
-            ret[label_node[0]]
-        except KeyError:
-            ret[label_node[0]] = []
-        except IndexError:
-            continue
-        ret[label_node[0]].append(contrast)
-    return ret
-
-
-def get_hasdifference(contrasts):
-    ret = {}
-    for contrast in contrasts:
-        label_node = Contrast.get_relation(
-            contrast["id"], "HASDIFFERENCE", "disorder")
-        try:
-            ret[label_node[0]]
-        except KeyError:
-            ret[label_node[0]] = []
-        except IndexError:
-            continue
-        ret[label_node[0]].append(contrast)
-    return ret
-
-
+@conditional_page("task")
 def view_task(request, uid, return_context=False):
     ''' Detail view for a given task '''
-    try:
-        task = Task.get(uid)[0]
-    except IndexError:
+    page = Task.get_page(uid)
+    if page is None:
         raise Http404("Task does not exist")
+    task = page["task"]
 
     # Replace newlines with <br>, etc.
     task["definition_text"] = clean_html(
         task.get("definition_text", "No definition provided"))
-    contrasts = Task.api_get_contrasts(task["id"])
-
-    conditions = Task.get_conditions(task["id"])
-
-    implementations = Task.get_relation(task["id"], "HASIMPLEMENTATION")
-    datasets = Task.get_relation(task["id"], "HASEXTERNALDATASET")
-    indicators = Task.get_relation(task["id"], "HASINDICATOR")
-    citations = Task.get_relation(task["id"], "HASCITATION")
-    disorders = get_hasdifference(contrasts)
-
-    concepts = get_measured_by(contrasts, "concept")
-    behaviors = get_measured_by(contrasts, "behavior")
-    traits = get_measured_by(contrasts, "trait")
 
+    creator_id = page["creator_id"]
     context = {
         "task": task,
-        "creator": get_creator(uid, "task"),
-        "concepts": concepts,
-        "contrasts": contrasts,
-        "conditions": conditions,
-        "implementations": implementations,
-        "datasets": datasets,
+        "creator": get_display_name(creator_id) if creator_id else None,
+        "concepts": page["concepts"],
+        "contrasts": page["contrasts"],
+        "conditions": page["conditions"],
+        "implementations": page["implementations"],
+        "datasets": page["datasets"],
         "domain": DOMAIN,
         "implementation_form": ImplementationForm(),
         "dataset_form": ExternalDatasetForm(),
         "indicator_form": IndicatorForm(),
-        "indicators": indicators,
-        "citations": citations,
+        "indicators": page["indicators"],
+        "citations": page["citations"],
         "doi_form": forms.DoiForm(uid, 'task'),
-        "disorders": disorders,
-        "traits": traits,
-        "behaviors": behaviors,
+        "disorders": page["disorders"],
+        "traits": page["traits"],
+        "behaviors": page["behaviors"],
         "task_disorder_form": TaskDisorderForm(uid),
         "task_concept_form": forms.TaskConceptForm(uid),
         "disambiguation_form": forms.DisambiguationForm("task", uid, task),
-        "owner_or_admin": owner_or_admin(request.user, uid),
+        "owner_or_admin": owner_or_admin(request.user, uid, label="task",
+                                         owner_id=creator_id),
     }
 
     if return_context is True:
@@ -433,24 +394,29 @@ def view_task(request, uid, return_context=False):
     return render(request, 'atlas/view_task.html', context)
 
 
+@conditional_page("battery")
 def view_battery(request, uid, return_context=False):
     ''' detail view for a battery. '''
+    (battery, creator_id, progenitors, descendants, indicators,
+     constituent_tasks, constituent_batteries, citations) = graph.parallel(
+        functools.partial(Battery.get, uid),
+        functools.partial(get_creator, uid, "battery", by_uid=True),
+        functools.partial(Battery.get_relation, uid, "PARTOF"),
+        functools.partial(Battery.get_reverse_relation, uid, "PARTOF"),
+        functools.partial(Battery.get_relation, uid, "HASINDICATOR"),
+        functools.partial(Battery.get_reverse_relation, uid, "INBATTERY",
+                          label='task'),
+        functools.partial(Battery.get_reverse_relation, uid, "INBATTERY",
+                          label='battery'),
+        functools.partial(Battery.get_relation, uid, "HASCITATION"))
     try:
-        battery = Battery.get(uid)[0]
+        battery = battery[0]
     except IndexError:
         raise Http404("Theory does not exist")
-    progenitors = Battery.get_relation(uid, "PARTOF")
-    descendants = Battery.get_reverse_relation(uid, "PARTOF")
-    indicators = Battery.get_relation(uid, "HASINDICATOR")
-    constituent_tasks = Battery.get_reverse_relation(uid, "INBATTERY",
-                                                     label='task')
-    constituent_batteries = Battery.get_reverse_relation(uid, "INBATTERY",
-                                                         label='battery')
-    citations = Battery.get_relation(uid, "HASCITATION")
 
     context = {
         "battery": battery,
-        "creator": get_creator(uid, "battery"),
+        "creator": get_display_name(creator_id) if creator_id else None,
         "citations": citations,
         "doi_form": forms.DoiForm(uid, 'battery'),
         "indicators": indicators,
@@ -461,38 +427,46 @@ def view_battery(request, uid, return_context=False):
         "constituent_batteries": constituent_batteries,
         "task_form": BatteryTaskForm(),
         "battery_form": BatteryBatteryForm(),
-        "owner_or_admin": owner_or_admin(request.user, uid),
+        "owner_or_admin": owner_or_admin(request.user, uid,
+                                         owner_id=creator_id),
     }
     if return_context:
         return context
     return render(request, 'atlas/view_battery.html', context)
 
 
+@conditional_page("theory")
 def view_theory(request, uid, return_context=False):
     ''' detail view for a given assertion '''
+    theory, creator_id, assertions, citations = graph.parallel(
+        functools.partial(Theory.get, uid),
+        functools.partial(get_creator, uid, "theory", by_uid=True),
+        functools.partial(Theory.get_reverse_relation, uid, "INTHEORY"),
+        functools.partial(Theory.get_relation, uid, "HASCITATION"))
     try:
-        theory = Theory.get(uid)[0]
+        theory = theory[0]
     except IndexError:
         raise Http404("Theory does not exist")
-    assertions = Theory.get_reverse_relation(uid, "INTHEORY")
-    # test if logged in, this might be an expensive operation since choices
-    # field is populated on each instantiation
     theory_assertions_form = TheoryAssertionForm()
-    citations = Theory.get_relation(uid, "HASCITATION")
-    referenced_terms = {}
-    for asrt in assertions:
+
+    def assertion_terms(asrt):
+        ''' the predicate and subject of an assertion, with their labels '''
         pred = Assertion.get_relation(asrt['id'], "PREDICATE")
         subj = Assertion.get_relation(asrt['id'], "SUBJECT")
         if not pred or not subj:
-            continue
-        pred = pred[0]
-        subj = subj[0]
-        for term in [pred, subj]:
+            return []
+        terms = []
+        for term in [pred[0], subj[0]]:
             term_node = graph.run(
-                "match (t) where t.id = '{}' return t".format(term['id'])
-            ).one
+                "match (t) where t.id = $id return t", id=term['id']).one
             # we only ever create nodes with one label:
-            node_type = [x for x in term_node.labels][0]
+            terms.append((term, [x for x in term_node.labels][0]))
+        return terms
+
+    referenced_terms = {}
+    for terms in graph.parallel(*[functools.partial(assertion_terms, asrt)
+                                  for asrt in assertions]):
+        for term, node_type in terms:
             url = reverse(node_type, kwargs={'uid': term['id']})
             if term['name'] in referenced_terms:
                 referenced_terms[term['name']][0] += 1
@@ -501,44 +475,42 @@ def view_theory(request, uid, return_context=False):
 
     context = {
         "theory": theory,
-        "creator": get_creator(uid, "theory"),
+        "creator": get_display_name(creator_id) if creator_id else None,
         "assertions": assertions,
         "theory_assertions_form": theory_assertions_form,
         "referenced_terms": referenced_terms,
         "doi_form": forms.DoiForm(uid, 'theory'),
         "citations": citations,
-        "owner_or_admin": owner_or_admin(request.user, uid),
+        "owner_or_admin": owner_or_admin(request.user, uid,
+                                         owner_id=creator_id),
     }
     if return_context is True:
         return context
     return render(request, 'atlas/view_theory.html', context)
 
 
+@conditional_page("disorder")
 def view_disorder(request, uid, return_context=False):
     ''' detail view for a given disorder '''
+    (disorder, creator_id, contrasts, parent_disorders, child_disorders,
+     external_links, citations) = graph.parallel(
+        functools.partial(Disorder.get, uid),
+        functools.partial(get_creator, uid, "disorder", by_uid=True),
+        functools.partial(Disorder.get_reverse_relation, uid, "HASDIFFERENCE"),
+        functools.partial(Disorder.get_relation, uid, "ISA"),
+        functools.partial(Disorder.get_reverse_relation, uid, "ISA"),
+        functools.partial(Disorder.get_relation, uid, "HASLINK"),
+        functools.partial(Disorder.get_relation, uid, "HASCITATION"))
     try:
-        disorder = Disorder.get(uid)[0]
+        disorder = disorder[0]
     except IndexError:
         raise Http404("Disorder does not exist")
-    contrasts = Disorder.get_reverse_relation(uid, "HASDIFFERENCE")
-    parent_disorders = Disorder.get_relation(uid, "ISA")
-    child_disorders = Disorder.get_reverse_relation(uid, "ISA")
-    external_links = Disorder.get_relation(uid, "HASLINK")
 
-    tasks = {}
-    for contrast in contrasts:
-        contrast_task = Contrast.get_reverse_relation(
-            contrast["id"], "HASCONTRAST", "task")
-        try:
-            tasks[contrast_task[0]]
-        except KeyError:
-            tasks[contrast_task[0]] = []
-        tasks[contrast_task[0]].append(contrast)
-
-    citations = Disorder.get_relation(disorder["id"], "HASCITATION")
+    tasks = group_by_task(contrasts)
+
     context = {
         "disorder": disorder,
-        "creator": get_creator(uid, "disorder"),
+        "creator": get_display_name(creator_id) if creator_id else None,
         "citations": citations,
         "doi_form": forms.DoiForm(uid, 'disorder'),
         "assertions": tasks,
@@ -547,7 +519,8 @@ def view_disorder(request, uid, return_context=False):
         "child_disorders": child_disorders,
         "external_links": external_links,
         "external_link_form": ExternalLinkForm(),
-        "owner_or_admin": owner_or_admin(request.user, uid),
+        "owner_or_admin": owner_or_admin(request.user, uid,
+                                         owner_id=creator_id),
     }
 
     if return_context:
@@ -555,35 +528,32 @@ def view_disorder(request, uid, return_context=False):
     return render(request, 'atlas/view_disorder.html', context)
 
 
+@conditional_page("trait")
 def view_trait(request, uid, return_context=False):
+    trait, creator_id, contrasts, external_links, citations = graph.parallel(
+        functools.partial(Trait.get, uid),
+        functools.partial(get_creator, uid, "trait", by_uid=True),
+        functools.partial(Trait.get_relation, uid, "MEASUREDBY"),
+        functools.partial(Trait.get_relation, uid, "HASLINK"),
+        functools.partial(Trait.get_relation, uid, "HASCITATION"))
     try:
-        trait = Trait.get(uid)[0]
+        trait = trait[0]
     except IndexError:
         raise Http404("Trait does not exist")
-    contrasts = Trait.get_relation(uid, "MEASUREDBY")
-    external_links = Trait.get_relation(uid, "HASLINK")
-    citations = Trait.get_relation(uid, "HASCITATION")
 
-    tasks = {}
-    for contrast in contrasts:
-        contrast_task = Contrast.get_reverse_relation(
-            contrast["id"], "HASCONTRAST", "task")
-        try:
-            tasks[contrast_task[0]]
-        except KeyError:
-            tasks[contrast_task[0]] = []
-        tasks[contrast_task[0]].append(contrast)
+    tasks = group_by_task(contrasts)
 
     context = {
         "trait": trait,
-        "creator": get_creator(uid, "trait"),
+        "creator": get_display_name(creator_id) if creator_id else None,
         "citations": citations,
         "doi_form": forms.DoiForm(uid, 'trait'),
         "assertions": tasks,
         "trait_form": forms.TraitForm(trait['id'], trait=trait),
         "external_links": external_links,
         "external_link_form": ExternalLinkForm(),
-        "owner_or_admin": owner_or_admin(request.user, uid),
+        "owner_or_admin": owner_or_admin(request.user, uid,
+                                         owner_id=creator_id),
     }
 
     if return_context:
@@ -591,35 +561,32 @@ def view_trait(request, uid, return_context=False):
     return render(request, 'atlas/view_trait.html', context)
 
 
+@conditional_page("behavior")
 def view_behavior(request, uid, return_context=False):
+    behavior, creator_id, contrasts, external_links, citations = graph.parallel(
+        functools.partial(Behavior.get, uid),
+        functools.partial(get_creator, uid, "behavior", by_uid=True),
+        functools.partial(Behavior.get_relation, uid, "MEASUREDBY"),
+        functools.partial(Behavior.get_relation, uid, "HASLINK"),
+        functools.partial(Behavior.get_relation, uid, "HASCITATION"))
     try:
-        behavior = Behavior.get(uid)[0]
+        behavior = behavior[0]
     except IndexError:
         raise Http404("Behavior does not exist")
-    contrasts = Behavior.get_relation(uid, "MEASUREDBY")
-    external_links = Behavior.get_relation(uid, "HASLINK")
-    citations = Behavior.get_relation(uid, "HASCITATION")
 
-    tasks = {}
-    for contrast in contrasts:
-        contrast_task = Contrast.get_reverse_relation(
-            contrast["id"], "HASCONTRAST", "task")
-        try:
-            tasks[contrast_task[0]]
-        except KeyError:
-            tasks[contrast_task[0]] = []
-        tasks[contrast_task[0]].append(contrast)
+    tasks = group_by_task(contrasts)
 
     context = {
         "behavior": behavior,
-        "creator": get_creator(uid, "behavior"),
+        "creator": get_display_name(creator_id) if creator_id else None,
         "citations": citations,
         "doi_form": forms.DoiForm(uid, 'behavior'),
         "assertions": tasks,
         "behavior_form": forms.BehaviorForm(behavior['id'], behavior=behavior),
         "external_links": external_links,
         "external_link_form": ExternalLinkForm(),
-        "owner_or_admin": owner_or_admin(request.user, uid),
+        "owner_or_admin": owner_or_admin(request.user, uid,
+                                         owner_id=creator_id),
     }
 
     if return_context:
@@ -1305,7 +1272,7 @@ def make_link(request, src_id, src_label, dest_label, form_class, name_field,
                                     rel, endnode_type=src_label.name)
 
     if link_made is False:
-        graph.delete(dest_node)
+        dest_label.delete(dest_node['id'])
         error_msg = "Was unable to associate {} and {}".format(
             src_label.name, dest_label.name)
         messages.error(request, error_msg)
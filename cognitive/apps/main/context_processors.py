@@ -1,20 +1,15 @@
 def counts_processor(request):
-    import cognitive.apps.atlas.query as query
+    from cognitive.apps.atlas.counts import get_counts
 
-    Concept = query.Concept()
-    Task = query.Task()
-    Disorder = query.Disorder()
-    Theory = query.Theory()
-    Battery = query.Battery()
-    Behavior = query.Behavior()
-    Trait = query.Trait()
+    totals = get_counts()
 
     counts = {
-        "disorders": Disorder.count(),
-        "tasks": Task.count(),
-        "concepts": Concept.count(),
-        "collections": Battery.count() + Theory.count(),
-        "phenotypes": (Disorder.count() + Trait.count() + Behavior.count()),
+        "disorders": totals["disorder"],
+        "tasks": totals["task"],
+        "concepts": totals["concept"],
+        "collections": totals["battery"] + totals["theory"],
+        "phenotypes": (totals["disorder"] + totals["trait"] +
+                       totals["behavior"]),
     }
 
     return {'counts': counts}
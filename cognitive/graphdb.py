@@ -0,0 +1,273 @@
+''' Access to the neo4j graph shared by the threads of a worker.
+
+settings.graph is a GraphPool. It stands in for a py2neo Graph (run,
+evaluate, create, nodes, ...) and bounds how many of them talk to neo4j at
+once: each call holds one of a fixed number of sessions, waiting up to
+GRAPH_POOL_TIMEOUT seconds for one to be free, and py2neo keeps as many HTTP
+connections alive. Calls made inside a session() block reuse the session the
+thread already holds, so a thread never waits on itself.
+
+Independent reads (the relations of a node on its detail page, ...) can be
+run at once with parallel(), on a few threads shared by the worker. Those
+threads never wait on each other: a call running on one of them, or on a
+thread holding a session, runs its own parallel() calls in turn.
+
+Inside a recording() block (the GraphQueryMiddleware holds one around each
+request) every call made by the thread, and by the parallel() calls it starts,
+is recorded with its fingerprint (the cypher with its literals taken out), how
+long it took and how many rows were read from it.
+
+The py2neo Graph is only made on first use, so importing the project does not
+wait on neo4j.
+'''
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import contextmanager
+import re
+import threading
+import time
+
+LITERALS = re.compile(r"'(?:[^'\\]|\\.)*'|\"(?:[^\"\\]|\\.)*\"|\b\d+(?:\.\d+)?\b")
+LISTS = re.compile(r"\[\s*\?(?:\s*,\s*\?)*\s*\]")
+
+
+def fingerprint(cypher):
+    '''fingerprint returns cypher with its whitespace collapsed and its string
+    and number literals (and lists of them) replaced by ?, so that the same
+    query made with different values is counted as one
+    '''
+    cypher = LITERALS.sub("?", " ".join(cypher.split()))
+    return LISTS.sub("[?]", cypher)
+
+
+class GraphPoolTimeout(Exception):
+    '''raised when no session is free within the pool's timeout'''
+
+
+class RecordedCursor(object):
+    '''RecordedCursor stands in for a py2neo Cursor, counting the records read
+    from it into the rows of its query's record
+    '''
+
+    def __init__(self, cursor, record):
+        self.cursor = cursor
+        self.record = record
+
+    def __iter__(self):
+        for row in self.cursor:
+            self.record["rows"] += 1
+            yield row
+
+    def __next__(self):
+        row = next(self.cursor)
+        self.record["rows"] += 1
+        return row
+
+    def forward(self, amount=1):
+        moved = self.cursor.forward(amount)
+        self.record["rows"] += moved
+        return moved
+
+    def data(self):
+        data = self.cursor.data()
+        self.record["rows"] += len(data)
+        return data
+
+    def evaluate(self, field=0):
+        value = self.cursor.evaluate(field)
+        self.record["rows"] += 1
+        return value
+
+    def __getattr__(self, name):
+        return getattr(self.cursor, name)
+
+
+class GraphPool(object):
+
+    def __init__(self, uri, auth=None, size=10, timeout=30, workers=4):
+        '''
+        :param uri: the neo4j http or bolt uri
+        :param auth: a (user, password) tuple
+        :param size: how many sessions (and connections) there are at most
+        :param timeout: how many seconds to wait for a free session
+        :param workers: how many threads run the calls given to parallel
+        '''
+        self.uri = uri
+        self.auth = auth
+        self.size = size
+        self.timeout = timeout
+        self.workers = workers
+        self._executor = None
+        self.sessions = threading.BoundedSemaphore(size)
+        self.local = threading.local()
+        self.lock = threading.Lock()
+        self.in_use = 0
+        self.peak = 0
+        self._graph = None
+
+    @property
+    def connected(self):
+        return self._graph is not None
+
+    def connect(self):
+        '''connect returns the py2neo Graph, making it on first use'''
+        if self._graph is None:
+            with self.lock:
+                if self._graph is None:
+                    from py2neo import Graph
+                    self._graph = Graph(self.uri, auth=self.auth,
+                                        max_connections=self.size)
+        return self._graph
+
+    @contextmanager
+    def session(self):
+        '''session holds one of the pool's sessions for the block, or reuses
+        the one this thread holds already, and yields the py2neo Graph
+        '''
+        depth = getattr(self.local, "depth", 0)
+        if depth == 0:
+            if not self.sessions.acquire(timeout=self.timeout):
+                raise GraphPoolTimeout(
+                    "no graph session free within {}s ({} in use)".format(
+                        self.timeout, self.size))
+            with self.lock:
+                self.in_use += 1
+                self.peak = max(self.peak, self.in_use)
+        self.local.depth = depth + 1
+        try:
+            yield self.connect()
+        finally:
+            self.local.depth = depth
+            if depth == 0:
+                with self.lock:
+                    self.in_use -= 1
+                self.sessions.release()
+
+    def executor(self):
+        '''executor returns the threads running parallel calls, started on
+        first use
+        '''
+        if self._executor is None:
+            with self.lock:
+                if self._executor is None:
+                    self._executor = ThreadPoolExecutor(
+                        max_workers=self.workers,
+                        thread_name_prefix="graph-parallel",
+                        initializer=self._mark_worker)
+        return self._executor
+
+    def _mark_worker(self):
+        self.local.worker = True
+
+    @contextmanager
+    def recording(self):
+        '''recording yields the list the graph calls made by this thread in the
+        block are added to, as {fingerprint, seconds, rows}. rows is None for
+        calls other than run and evaluate, and counts the records of a run as
+        they are read.
+        '''
+        outer = getattr(self.local, "queries", None)
+        self.local.queries = []
+        try:
+            yield self.local.queries
+        finally:
+            self.local.queries = outer
+
+    def recorded(self, statement, started, result=None, cursor=False,
+                 rows=None):
+        '''recorded adds the call of statement started at started (a
+        perf_counter) to the recording, if there is one, and returns result,
+        wrapped in a RecordedCursor if cursor is True
+        '''
+        queries = getattr(self.local, "queries", None)
+        if queries is None:
+            return result
+        record = {"fingerprint": fingerprint(statement),
+                  "seconds": time.perf_counter() - started, "rows": rows}
+        queries.append(record)
+        if cursor:
+            record["rows"] = 0
+            return RecordedCursor(result, record)
+        return result
+
+    def run_recorded(self, queries, call):
+        # a parallel call, recorded into the recording of the thread giving it
+        if queries is None:
+            return call()
+        self.local.queries = queries
+        try:
+            return call()
+        finally:
+            self.local.queries = None
+
+    def parallel(self, *calls):
+        '''parallel runs calls (functions without arguments, each making its
+        own reads of the graph) at once and returns their results in order,
+        raising the first error. The first call runs on this thread, the
+        others on the pool's workers, so it takes about as long as the slowest
+        of them. Calls made from a worker, or from a thread holding a session,
+        run one after the other instead, so that no worker or session is held
+        waiting on another.
+        The calls should not use the django database: the workers' connections
+        are never closed.
+        '''
+        if (len(calls) < 2 or self.workers < 1
+                or getattr(self.local, "worker", False)
+                or getattr(self.local, "depth", 0)):
+            return [call() for call in calls]
+        queries = getattr(self.local, "queries", None)
+        futures = [self.executor().submit(self.run_recorded, queries, call)
+                   for call in calls[1:]]
+        results = [calls[0]()]
+        return results + [future.result() for future in futures]
+
+    def run(self, cypher, parameters=None, **kwparameters):
+        with self.session() as graph:
+            started = time.perf_counter()
+            return self.recorded(
+                cypher, started,
+                graph.run(cypher, parameters, **kwparameters), cursor=True)
+
+    def evaluate(self, cypher, parameters=None, **kwparameters):
+        with self.session() as graph:
+            started = time.perf_counter()
+            value = graph.evaluate(cypher, parameters, **kwparameters)
+            return self.recorded(cypher, started, value,
+                                 rows=int(value is not None))
+
+    def create(self, subgraph):
+        with self.session() as graph:
+            started = time.perf_counter()
+            return self.recorded("create", started, graph.create(subgraph))
+
+    def delete(self, subgraph):
+        with self.session() as graph:
+            started = time.perf_counter()
+            return self.recorded("delete", started, graph.delete(subgraph))
+
+    def exists(self, subgraph):
+        with self.session() as graph:
+            started = time.perf_counter()
+            return self.recorded("exists", started, graph.exists(subgraph))
+
+    def push(self, subgraph):
+        with self.session() as graph:
+            started = time.perf_counter()
+            return self.recorded("push", started, graph.push(subgraph))
+
+    def match_one(self, *args, **kwargs):
+        with self.session() as graph:
+            started = time.perf_counter()
+            return self.recorded("match_one", started,
+                                 graph.match_one(*args, **kwargs))
+
+    @property
+    def nodes(self):
+        '''a NodeMatcher running its queries through the pool'''
+        from py2neo.matching import NodeMatcher
+        return NodeMatcher(self)
+
+    def __getattr__(self, name):
+        # the rest of the py2neo Graph (begin, schema, ...) is used as is
+        if name.startswith("_"):
+            raise AttributeError(name)
+        return getattr(self.connect(), name)
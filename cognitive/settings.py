@@ -12,13 +12,25 @@ https://docs.djangoproject.com/en/1.9/ref/settings/
 
 import sys
 import os
+import tempfile
 from distutils.util import strtobool
 from os.path import join, abspath, dirname
 
-from py2neo import Graph
+from cognitive.graphdb import GraphPool
 
-# Just for local development - will read this from secrets
-graph = Graph("http://graphdb:7474", auth=("neo4j", "test"))
+# At most GRAPH_POOL_SIZE threads of a worker query the graph at once, the
+# others wait up to GRAPH_POOL_TIMEOUT seconds. See cognitive/graphdb.py.
+GRAPH_POOL_SIZE = int(os.environ.get('GRAPH_POOL_SIZE', 10))
+GRAPH_POOL_TIMEOUT = float(os.environ.get('GRAPH_POOL_TIMEOUT', 30))
+# Threads of a worker running independent reads at once (graph.parallel)
+GRAPH_PARALLEL_WORKERS = int(os.environ.get('GRAPH_PARALLEL_WORKERS', 4))
+
+# Just for local development - will read this from secrets. Connected on first
+# use, so that importing the project (uwsgi workers, manage.py commands) does
+# not wait on neo4j
+graph = GraphPool("http://graphdb:7474", auth=("neo4j", "test"),
+                  size=GRAPH_POOL_SIZE, timeout=GRAPH_POOL_TIMEOUT,
+                  workers=GRAPH_PARALLEL_WORKERS)
 
 DOMAIN = "http://www.cognitiveatlas.org"
 
@@ -76,6 +88,7 @@ THIRD_PARTY_APPS = [
 INSTALLED_APPS += THIRD_PARTY_APPS
 
 MIDDLEWARE = [
+    'cognitive.apps.atlas.middleware.GraphQueryMiddleware',
     'django.middleware.security.SecurityMiddleware',
     'django.contrib.sessions.middleware.SessionMiddleware',
     'django.middleware.common.CommonMiddleware',
@@ -184,6 +197,12 @@ MEDIA_URL = '/assets/'
 STATIC_ROOT = '/var/www/static'
 STATIC_URL = '/static/'
 
+# The gzipped json snapshot of the whole atlas (manage.py atlas_snapshot),
+# under STATIC_ROOT so that nginx serves it too. See
+# cognitive/apps/atlas/snapshot.py
+ATLAS_SNAPSHOT_PATH = os.environ.get(
+    'ATLAS_SNAPSHOT_PATH', join(STATIC_ROOT, 'snapshot', 'atlas.json.gz'))
+
 # List of finder classes that know how to find static files in
 # various locations.
 STATICFILES_FINDERS = (
@@ -193,10 +212,31 @@ STATICFILES_FINDERS = (
 
 CRISPY_TEMPLATE_PACK = 'bootstrap3'
 
+# Query results from the graph are cached in the "atlas" cache, a directory
+# shared by every process on the host (uwsgi workers, its cron, manage.py
+# commands and scripts), so that a write made by any of them moves the
+# generation token all of them read. See cognitive/apps/atlas/cache.py for
+# how entries are invalidated. A locmem ATLAS_CACHE_BACKEND is only safe when
+# one process is all that writes to the graph.
+ATLAS_CACHE_LOCATION = os.environ.get(
+    'ATLAS_CACHE_LOCATION', join(tempfile.gettempdir(), 'cognitive-atlas'))
+ATLAS_CACHE_BACKEND = os.environ.get(
+    'ATLAS_CACHE_BACKEND',
+    'django.core.cache.backends.filebased.FileBasedCache')
+ATLAS_CACHE_TIMEOUT = int(os.environ.get('ATLAS_CACHE_TIMEOUT', 60 * 60))
+# Off in cognitive.settings_test, as tests write to the graph directly.
+ATLAS_CACHE_ENABLED = strtobool(os.environ.get('ATLAS_CACHE_ENABLED', 'True'))
+
 CACHES = {
     'default': {
         'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
-    }
+    },
+    'atlas': {
+        'BACKEND': ATLAS_CACHE_BACKEND,
+        'LOCATION': ATLAS_CACHE_LOCATION,
+        'TIMEOUT': ATLAS_CACHE_TIMEOUT,
+        'OPTIONS': {'MAX_ENTRIES': 20000},
+    },
 }
 
 AUTH_USER_MODEL = 'users.User'
@@ -205,6 +245,47 @@ SECRET_KEY = os.environ.get(
 DEBUG = strtobool(os.environ.get('DJANGO_DEBUG', 'False'))
 LOGIN_REDIRECT_URL = '/'
 LOGOUT_REDIRECT_URL = '/logged_out/'
+
+# Graph queries of a request taking at least GRAPH_SLOW_QUERY_MS are written
+# to GRAPH_SLOW_QUERY_LOG (outside the source tree, in the temporary
+# directory, by default), rotated at GRAPH_SLOW_QUERY_LOG_BYTES. With
+# GRAPH_DEBUG_PANEL on, pages shown to superusers list their graph queries.
+# See cognitive/apps/atlas/middleware.py and querylog.py.
+GRAPH_SLOW_QUERY_MS = float(os.environ.get('GRAPH_SLOW_QUERY_MS', 200))
+GRAPH_SLOW_QUERY_LOG = os.environ.get(
+    'GRAPH_SLOW_QUERY_LOG',
+    join(tempfile.gettempdir(), 'cognitive-graph-slow-queries.log'))
+GRAPH_SLOW_QUERY_LOG_BYTES = int(os.environ.get(
+    'GRAPH_SLOW_QUERY_LOG_BYTES', 10 * 1024 * 1024))
+GRAPH_SLOW_QUERY_LOG_BACKUPS = int(os.environ.get(
+    'GRAPH_SLOW_QUERY_LOG_BACKUPS', 5))
+GRAPH_DEBUG_PANEL = strtobool(os.environ.get(
+    'GRAPH_DEBUG_PANEL', str(DEBUG)))
+
+LOGGING = {
+    'version': 1,
+    'disable_existing_loggers': False,
+    'formatters': {
+        'message': {'format': '%(message)s'},
+    },
+    'handlers': {
+        'graph_slow': {
+            'class': 'logging.handlers.RotatingFileHandler',
+            'filename': GRAPH_SLOW_QUERY_LOG,
+            'maxBytes': GRAPH_SLOW_QUERY_LOG_BYTES,
+            'backupCount': GRAPH_SLOW_QUERY_LOG_BACKUPS,
+            'delay': True,
+            'formatter': 'message',
+        },
+    },
+    'loggers': {
+        'cognitive.graph.slow': {
+            'handlers': ['graph_slow'],
+            'level': 'INFO',
+            'propagate': False,
+        },
+    },
+}
 REST_FRAMEWORK = {
     'DEFAULT_PERMISSION_CLASSES': [
         'rest_framework.permissions.IsAuthenticatedOrReadOnly',
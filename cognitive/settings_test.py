@@ -0,0 +1,10 @@
+"""
+Django settings for running the cognitive atlas tests:
+
+    python manage.py test --settings=cognitive.settings_test
+"""
+from cognitive.settings import *  # noqa: F401,F403
+
+# The tests write to the graph directly, behind the atlas cache's back; the
+# cache tests turn it on with override_settings.
+ATLAS_CACHE_ENABLED = False
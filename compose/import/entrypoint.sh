@@ -10,8 +10,7 @@ mysql_imports ()
     echo "CREATE DATABASE cogat;" | mysql -u root
     mysql -u root cogat < $MYSQL_DUMP
     python3 /code/scripts/user_import.py
-    python3 /code/scripts/migrate_db.py
-    python3 /code/scripts/mysql2neo.py
+    python3 /code/scripts/bulk_import.py --reset
 }
 
 cd /code
@@ -0,0 +1,184 @@
+''' benchmark of the hot pages and api calls on synthetic atlases of growing
+size (see generate_atlas.py), with a history of the results to compare
+commits by.
+
+At each size the synthetic atlas is written to the graph, and every target
+is requested --repeat times through the django test client: cold (with the
+cache generation moved on first, so cached reads and in memory indexes are
+made again, as after a write) and warm (straight after). The medians, in ms,
+and the number of graph queries of a cold request are appended, with the
+commit, to --history, and compared with the last run there: a time more than
+--threshold times the previous one is reported as a regression.
+
+The atlas is written to the configured graph: use a development one. The
+synthetic nodes are removed at the end unless --keep is given.
+
+usage: python scripts/benchmark_atlas.py [--sizes 100 1000 5000]
+                                         [--targets view_task search ...]
+'''
+import argparse
+from datetime import datetime, timezone
+import json
+import os
+import platform
+import statistics
+import subprocess
+import time
+
+REPO = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+from generate_atlas import generate, remove_atlas, write_atlas  # noqa: E402
+
+from django.test import Client  # noqa: E402
+from django.urls import reverse  # noqa: E402
+
+from cognitive.apps.atlas.cache import invalidate  # noqa: E402
+
+HISTORY = os.path.join(REPO, "benchmark_history.json")
+
+
+def targets(atlas):
+    '''targets returns {name: (method, url, data)} of the requests to time,
+    on terms of atlas: the most asserted concept, a task from the middle'''
+    task = atlas["nodes"]["task"][len(atlas["nodes"]["task"]) // 2]["id"]
+    concept = atlas["nodes"]["concept"][0]["id"]
+    contrast = atlas["nodes"]["contrast"][0]["id"]
+    term = atlas["nodes"]["concept"][0]["name"].split()[0]
+    return {
+        "view_task": ("get", reverse("task", kwargs={"uid": task}), {}),
+        "view_concept": ("get", reverse("concept", kwargs={"uid": concept}),
+                         {}),
+        "all_concepts": ("get", reverse("all_concepts"), {}),
+        "search": ("post", reverse("search"), {"searchterm": term}),
+        "search_api": ("get", reverse("search_api_list"), {"q": term}),
+        "task_api": ("get", reverse("task_api_list"), {"id": task}),
+        "concept_api": ("get", reverse("concept_api_list"), {"id": concept}),
+        "task_gist": ("get", reverse("task_gist", kwargs={"uid": task}), {}),
+        "task_gist_download": ("get", reverse("download_task_gist",
+                                              kwargs={"uid": task}), {}),
+        "contrast_gist": ("get", reverse("contrast",
+                                         kwargs={"uid": contrast}), {}),
+    }
+
+
+def request(client, method, url, data):
+    '''request returns (ms, graph queries) of one request'''
+    started = time.perf_counter()
+    response = getattr(client, method)(url, data)
+    if response.streaming:
+        for _ in response.streaming_content:
+            pass
+    elapsed = (time.perf_counter() - started) * 1000
+    if response.status_code != 200:
+        raise RuntimeError("{} {} answered {}".format(
+            method.upper(), url, response.status_code))
+    return elapsed, int(response.get("X-Graph-Queries", -1))
+
+
+def measure(client, target, repeat):
+    cold = []
+    warm = []
+    queries = None
+    for _ in range(repeat):
+        invalidate()
+        elapsed, queries = request(client, *target)
+        cold.append(elapsed)
+        warm.append(request(client, *target)[0])
+    return {"cold_ms": round(statistics.median(cold), 3),
+            "warm_ms": round(statistics.median(warm), 3),
+            "queries": queries}
+
+
+def git(*args):
+    try:
+        return subprocess.check_output(("git",) + args, cwd=REPO,
+                                       stderr=subprocess.DEVNULL).decode()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def read_history(path):
+    try:
+        with open(path) as history:
+            return json.load(history)
+    except (OSError, ValueError):
+        return []
+
+
+def regressions(previous, results, threshold):
+    '''regressions lists (size, target, measure, before, now) for the times
+    of results more than threshold times those of previous'''
+    found = []
+    for size, timings in results.items():
+        for name, timing in timings.items():
+            before = previous.get("results", {}).get(size, {}).get(name)
+            if not before:
+                continue
+            for key in ("cold_ms", "warm_ms"):
+                if before.get(key) and timing[key] > threshold * before[key]:
+                    found.append((size, name, key, before[key], timing[key]))
+    return found
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--sizes", type=int, nargs="+",
+                        default=[100, 1000, 5000],
+                        help="how many concepts the atlases have")
+    parser.add_argument("--targets", nargs="+", default=None)
+    parser.add_argument("--repeat", type=int, default=5)
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--history", default=HISTORY)
+    parser.add_argument("--threshold", type=float, default=1.25)
+    parser.add_argument("--keep", action="store_true",
+                        help="leave the last synthetic atlas in the graph")
+    args = parser.parse_args()
+
+    client = Client()
+    results = {}
+    try:
+        for size in args.sizes:
+            remove_atlas()
+            atlas = generate(size, args.seed)
+            write_atlas(atlas)
+            chosen = targets(atlas)
+            names = args.targets or sorted(chosen)
+            results[str(size)] = {}
+            print("%d concepts" % size)
+            print("%20s %10s %10s %8s" % ("target", "cold ms", "warm ms",
+                                          "queries"))
+            for name in names:
+                timing = measure(client, chosen[name], args.repeat)
+                results[str(size)][name] = timing
+                print("%20s %10.1f %10.1f %8d" % (
+                    name, timing["cold_ms"], timing["warm_ms"],
+                    timing["queries"]))
+    finally:
+        if not args.keep:
+            remove_atlas()
+
+    history = read_history(args.history)
+    commit = git("rev-parse", "HEAD")
+    status = git("status", "--porcelain", "--untracked-files=no")
+    run = {"commit": commit.strip() if commit else None,
+           "dirty": bool(status) if status is not None else None,
+           "time": datetime.now(timezone.utc).isoformat(),
+           "python": platform.python_version(),
+           "seed": args.seed, "repeat": args.repeat,
+           "results": results}
+    if history:
+        previous = history[-1]
+        found = regressions(previous, results, args.threshold)
+        print("compared with %s:" % (previous.get("commit") or "last run"))
+        for size, name, key, before, now in found:
+            print("  %s concepts, %s %s: %.1f -> %.1f ms (%.2fx)" % (
+                size, name, key, before, now, now / before))
+        if not found:
+            print("  no regressions over %.2fx" % args.threshold)
+    history.append(run)
+    with open(args.history, "w") as output:
+        json.dump(history, output, indent=1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,108 @@
+''' microbenchmark of utils.do_query, building results straight from the
+    driver records, against the pandas DataFrame path it replaced.
+
+    Records are synthetic (no graph is needed), shaped like the rows of the
+    list views: an id, a name, a timestamp and a collected list of names, with
+    a fraction of repeated rows to deduplicate.
+
+    usage: python scripts/benchmark_do_query.py [--sizes 1 10 100 ...]
+'''
+import argparse
+import os
+import random
+import sys
+import timeit
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import pandas  # noqa: E402
+
+from cognitive.apps.atlas import utils  # noqa: E402
+
+KEYS = ["c.id", "c.name", "c.creation_time", "collect(t.name)"]
+FIELDS = ["id", "name", "creation_time", "tasks"]
+
+
+class Record(dict):
+    def values(self):
+        return [self[key] for key in KEYS]
+
+
+class Cursor(object):
+    def __init__(self, records):
+        self.records = records
+
+    def keys(self):
+        return KEYS
+
+    def __iter__(self):
+        return iter(self.records)
+
+    def to_data_frame(self):
+        return pandas.DataFrame([dict(x) for x in self.records], columns=KEYS)
+
+
+class Graph(object):
+    def __init__(self, records):
+        self.records = records
+
+    def run(self, query, parameters=None):
+        return Cursor(self.records)
+
+
+def make_records(size, repeats=0.1):
+    records = []
+    for i in range(size):
+        if records and random.random() < repeats:
+            records.append(random.choice(records))
+            continue
+        records.append(Record(zip(KEYS, [
+            "trm_%012d" % i, "concept %d" % i, 1466000000 + i,
+            ["task %d" % j for j in range(i % 4)]
+        ])))
+    return records
+
+
+def pandas_do_query(query, fields, output_format="dict",
+                    drop_duplicates=True, parameters={}):
+    '''the DataFrame based do_query, as it was'''
+    df = utils.graph.run(query, parameters).to_data_frame()
+    if fields is not None and not df.empty:
+        df.columns = fields
+    if drop_duplicates is True:
+        # lists are not hashable, pandas needs them as tuples to compare
+        df = df.loc[~df.applymap(utils.hashable).duplicated()]
+    if output_format == "list":
+        return df.values.tolist()
+    return df.to_dict(orient="records")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--sizes", type=int, nargs="+",
+                        default=[1, 10, 100, 1000, 10000, 100000])
+    parser.add_argument("--repeat", type=int, default=5)
+    args = parser.parse_args()
+
+    random.seed(0)
+    print("%8s %8s %12s %12s %8s" % ("rows", "format", "pandas ms",
+                                     "records ms", "speedup"))
+    for size in args.sizes:
+        utils.graph = Graph(make_records(size))
+        number = max(1, 10000 // size)
+        for output_format in ["dict", "list"]:
+            timings = []
+            for do_query in [pandas_do_query, utils.do_query]:
+                seconds = min(timeit.repeat(
+                    lambda: do_query("", FIELDS, output_format=output_format),
+                    number=number, repeat=args.repeat))
+                timings.append(seconds / number * 1000)
+            assert (pandas_do_query("", FIELDS, output_format) ==
+                    utils.do_query("", FIELDS, output_format))
+            print("%8d %8s %12.3f %12.3f %7.1fx" % (
+                size, output_format, timings[0], timings[1],
+                timings[0] / timings[1]))
+
+
+if __name__ == "__main__":
+    main()
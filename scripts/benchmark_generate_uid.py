@@ -0,0 +1,84 @@
+''' benchmark of utils.generate_uid as the atlas grows.
+
+Filler concepts (marked with a benchmark property, and deleted at the end)
+are added to the graph in steps, and at each size the time to allocate a uid
+is measured with the label scoped lookup generate_uid uses, and with the full
+scan of every node it replaced. With the id constraints in place
+(manage.py atlas_schema create) the first stays flat while the second grows
+with the number of nodes.
+
+usage: python scripts/benchmark_generate_uid.py [--sizes 1000 10000 ...]
+'''
+import argparse
+import os
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from django.utils.crypto import get_random_string  # noqa: E402
+
+from cognitive.apps.atlas.utils import generate_uid  # noqa: E402
+from cognitive.settings import graph  # noqa: E402
+
+BATCH_SIZE = 10000
+
+
+def scan_uid(node_type):
+    '''the generate_uid that looked at every node, as it was (with MATCH in
+    place of START, which neo4j 3.5 no longer runs)'''
+    result = True
+    while result:
+        uid = "trm_{}".format(get_random_string(13))
+        result = graph.run("""match (n)
+                              where n.id = '%s'
+                              return n.id""" % uid).data()
+    return uid
+
+
+def add_concepts(count):
+    for start in range(0, count, BATCH_SIZE):
+        rows = [{"id": "trm_bench{}".format(get_random_string(16))}
+                for _ in range(min(BATCH_SIZE, count - start))]
+        graph.run('''UNWIND $rows AS row
+                     CREATE (n:concept {id: row.id, name: row.id,
+                                        benchmark: true})''', rows=rows)
+
+
+def remove_concepts():
+    while graph.run('''MATCH (n:concept) WHERE n.benchmark = true
+                       WITH n LIMIT 10000 DETACH DELETE n
+                       RETURN count(*)''').evaluate():
+        pass
+
+
+def timed(allocate, repeat):
+    start = time.perf_counter()
+    for _ in range(repeat):
+        allocate("concept")
+    return (time.perf_counter() - start) / repeat * 1000
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--sizes", type=int, nargs="+",
+                        default=[0, 10000, 50000, 100000])
+    parser.add_argument("--repeat", type=int, default=50)
+    args = parser.parse_args()
+
+    print("%10s %12s %12s" % ("nodes", "index ms", "scan ms"))
+    added = 0
+    try:
+        for size in sorted(args.sizes):
+            add_concepts(size - added)
+            added = size
+            nodes = graph.run("MATCH (n) RETURN count(n)").evaluate()
+            print("%10d %12.3f %12.3f" % (
+                nodes, timed(generate_uid, args.repeat),
+                timed(scan_uid, max(1, args.repeat // 10))))
+    finally:
+        remove_concepts()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,656 @@
+'''
+Bulk import of the legacy mysql atlas into neo4j, in place of migrate_db.py
+followed by mysql2neo.py.
+
+Each step streams the rows of one sql query in chunks of --chunk-size and
+writes every chunk with one parameterized UNWIND ... MERGE statement (per
+label, for relations whose start node can have one of several labels), in one
+transaction. Steps that do not depend on each other run in parallel worker
+processes, a step starting once the steps it needs (eg the tasks before their
+conditions) are done.
+
+After each chunk the number of rows done is checkpointed to a file per step
+in --checkpoints, and a step that is run again resumes from there, or is
+skipped if it had finished. MERGE makes writing a chunk twice harmless, so a
+crash between a commit and its checkpoint loses nothing. Use --reset to start
+over: it forgets the checkpoints and, as migrate_db.py did, deletes everything
+in the graph first, so that names changed and rows removed since the last
+import are not left behind.
+
+usage: python3 scripts/bulk_import.py [--workers 4] [--chunk-size 5000]
+                                      [--reset] [--only step ...]
+'''
+import argparse
+from collections import namedtuple
+from concurrent.futures import ProcessPoolExecutor, FIRST_COMPLETED, wait
+import html
+import json
+import os
+import shutil
+import tempfile
+import time
+
+from py2neo import Graph
+from py2neo.database import TransientError
+import pymysql
+import pymysql.cursors
+import psycopg2
+
+CHUNK_SIZE = 5000
+
+# steps running side by side can deadlock on the nodes they both link, neo4j
+# then fails one of the transactions, which is retried
+RETRIES = 5
+
+CHECKPOINTS = os.environ.get('IMPORT_CHECKPOINTS', '/code/.import_checkpoints')
+
+# the atlas cache of the web workers (ATLAS_CACHE_LOCATION in settings), which
+# holds reads of the graph as it was before the import
+ATLAS_CACHE = os.environ.get('ATLAS_CACHE_LOCATION',
+                             os.path.join(tempfile.gettempdir(),
+                                          'cognitive-atlas'))
+
+# a step of the import: the rows of sql are passed through transform (None
+# rows are dropped) and written with each of the statements, after the steps
+# named in after are done
+Step = namedtuple("Step", ["name", "sql", "transform", "statements", "after"])
+
+
+def connect_graph():
+    return Graph("http://graphdb:7474", auth=("neo4j", "test"))
+
+
+def connect_mysql():
+    return pymysql.connect(host='localhost', user='root', db='cogat',
+                           cursorclass=pymysql.cursors.SSCursor)
+
+
+_old_users = None
+
+
+def old_users():
+    '''old_users maps the old (mysql) user ids to (id, username) of the users
+    made by user_import.py, read once per worker process
+    '''
+    global _old_users
+    if _old_users is None:
+        conn = psycopg2.connect(
+            dbname=os.environ.get('POSTGRES_NAME'),
+            user=os.environ.get('POSTGRES_USER'),
+            password=os.environ.get('POSTGRES_PASSWORD'),
+            host=os.environ.get('POSTGRES_HOST')
+        )
+        cursor = conn.cursor()
+        cursor.execute("select old_id, id, username from users_user "
+                       "where old_id is not null")
+        _old_users = {x[0]: (str(x[1]), x[2]) for x in cursor.fetchall()}
+        conn.close()
+    return _old_users
+
+
+def node_properties(name, properties):
+    '''the properties make_node in migrate_db.py gave a node'''
+    props = {x: (y if y else "None") for x, y in properties.items()}
+    props["name"] = html.unescape(str(name))
+    return props
+
+
+def merge_nodes(label):
+    return '''UNWIND $rows AS row
+              MERGE (n:{} {{id: row.id}})
+              ON CREATE SET n += row.properties,
+                            n.creation_time = timestamp() / 1000,
+                            n.last_updated = timestamp() / 1000'''.format(label)
+
+
+def set_properties(label):
+    return '''UNWIND $rows AS row
+              MATCH (n:{} {{id: row.id}})
+              SET n += row.properties'''.format(label)
+
+
+def merge_relations(start, rel_type, end):
+    return '''UNWIND $rows AS row
+              MATCH (a:{} {{id: row.start}})
+              MATCH (b:{} {{id: row.end}})
+              MERGE (a)-[r:{}]->(b)
+              SET r += row.properties'''.format(start, end, rel_type)
+
+
+def relation(start, end, **properties):
+    return {"start": start, "end": end, "properties": properties}
+
+
+def node_step(name, label, sql, properties=None, after=()):
+    '''a step making label nodes from rows of (id, name, *values), the
+    values being the properties named in properties
+    '''
+    properties = properties or []
+
+    def transform(row):
+        return {"id": str(row[0]), "properties": node_properties(
+            row[1], dict(zip(properties, row[2:])))}
+    return Step(name, sql, transform, [merge_nodes(label)], list(after))
+
+
+def relation_step(name, start, rel_type, end, sql, properties=None,
+                  after=()):
+    '''a step linking start to end nodes from rows of (start id, end id,
+    *values), the values being the properties named in properties. start
+    can be a list of labels the start node may have.
+    '''
+    properties = properties or []
+    starts = start if isinstance(start, list) else [start]
+
+    def transform(row):
+        return relation(row[0], row[1], **dict(zip(properties, row[2:])))
+    return Step(name, sql, transform,
+                [merge_relations(x, rel_type, end) for x in starts],
+                list(after))
+
+
+def user_step(label, sql):
+    '''a step linking the users that created the label nodes of rows of
+    (node id, old user id), making the user nodes that do not exist
+    '''
+    def transform(row):
+        user = old_users().get(row[1])
+        if user is None:
+            print("user not found in lookup {}".format(row))
+            return None
+        return {"id": row[0], "user_id": user[0],
+                "username": html.unescape(str(user[1]))}
+    statement = '''UNWIND $rows AS row
+                   MERGE (u:user {{id: row.user_id}})
+                   ON CREATE SET u.name = row.username,
+                                 u.creation_time = timestamp() / 1000,
+                                 u.last_updated = timestamp() / 1000
+                   WITH u, row
+                   MATCH (n:{} {{id: row.id}})
+                   MERGE (u)-[:CREATED]->(n)'''.format(label)
+    return Step("{}_users".format(label), sql, transform, [statement],
+                [plural(label)])
+
+
+def plural(label):
+    return {"battery": "batteries", "theory": "theories"}.get(
+        label, label + "s")
+
+
+def term_sql(term_type):
+    return '''select t.id, t.term_text, d.definition_text
+              from table_term t
+              left join table_definition d on d.id_term = t.id
+              where t.term_type = '{}' order by t.id'''.format(term_type)
+
+
+def assertion_transform(row):
+    (uid, user_id, subject, id_rel, predicate, rel_type, confidence_level,
+     text_description, event_stamp, id_subject_def, id_predicate_def,
+     truth_value, flag_for_curator) = row
+    if id_subject_def == "NADA":
+        id_subject_def = ""
+    return {"id": str(uid), "properties": node_properties(text_description, {
+        "user_id": user_id, "confidence_level": confidence_level,
+        "event_stamp": event_stamp, "id_subject_def": id_subject_def,
+        "truth_value": truth_value, "flag_for_curator": flag_for_curator})}
+
+
+ASSERTION_SQL = '''select id, id_user, id_subject, id_relation, id_predicate,
+                          id_type, confidence_level, text_description,
+                          event_stamp, id_subject_def, id_predicate_def,
+                          truth_value, flag_for_curator
+                   from table_assertion'''
+
+# the relations of concept-concept and task-task assertions, by id_relation
+CONCEPT_RELATIONS = {"T1": "KINDOF", "T2": "PARTOF", "T10": "SYNONYM",
+                     "T5": "PRECEDEDBY"}
+TASK_RELATIONS = {"T10": "SYNONYM", "T15": "DERIVEDFROM"}
+
+
+def assertion_steps():
+    steps = [Step("assertions", ASSERTION_SQL + " order by id",
+                  assertion_transform, [merge_nodes("assertion")], [])]
+    concept_task = '''UNWIND $rows AS row
+                      MATCH (a:assertion {id: row.id})
+                      MATCH (t:task {id: row.predicate})
+                      MATCH (c:concept {id: row.subject})
+                      MERGE (t)-[:ASSERTS]->(c)
+                      WITH a, t, c, row
+                      MATCH (k:contrast {id: row.predicate_def})
+                      MERGE (c)-[:MEASUREDBY]->(k)
+                      MERGE (a)-[:PREDICATE]->(t)
+                      MERGE (a)-[:SUBJECT]->(c)
+                      MERGE (a)-[:PREDICATE_DEF]->(k)'''
+    steps.append(Step(
+        "concept_task_assertions",
+        '''select id, id_subject, id_predicate, id_predicate_def
+           from table_assertion where id_type = 'concept-task' order by id''',
+        lambda row: {"id": str(row[0]), "subject": row[1],
+                     "predicate": row[2], "predicate_def": row[3]},
+        [concept_task], ["assertions", "tasks", "concepts", "contrasts"]))
+    for label, relations in [("concept", CONCEPT_RELATIONS),
+                             ("task", TASK_RELATIONS)]:
+        for id_rel, rel_type in sorted(relations.items()):
+            statement = '''UNWIND $rows AS row
+                           MATCH (a:assertion {{id: row.id}})
+                           MATCH (s:{0} {{id: row.subject}})
+                           MATCH (p:{0} {{id: row.predicate}})
+                           MERGE (s)-[:{1}]->(p)
+                           MERGE (a)-[:PREDICATE]->(p)
+                           MERGE (a)-[:SUBJECT]->(s)'''.format(label, rel_type)
+            steps.append(Step(
+                "{0}_{0}_{1}_assertions".format(label, rel_type.lower()),
+                '''select id, id_subject, id_predicate from table_assertion
+                   where id_type = '{0}-{0}' and id_relation = '{1}'
+                   order by id'''.format(label, id_rel),
+                lambda row: {"id": str(row[0]), "subject": row[1],
+                             "predicate": row[2]},
+                [statement], ["assertions", plural(label)]))
+    return steps
+
+
+def disorder_transform(row):
+    # skip over legacy test disorders.
+    if row[4] in ["Flapjacks", "Wingnut"]:
+        return None
+    return {"id": row[2], "properties": {
+        "id_protocol": row[3], "name": row[4], "definition": row[5],
+        "id_user": row[9], "event_stamp": row[10],
+        "flag_for_curator": row[11]}}
+
+
+def term_details_transform(row):
+    return {"id": row[0], "properties": {
+        "id_user": row[1], "alias": row[2], "event_stamp": row[3]}}
+
+
+def definition_details_transform(row):
+    return {"id": row[2], "properties": {
+        "def_id": row[0], "def_id_user": row[1], "def_event_stamp": row[4],
+        "id_concept_class": row[5]}}
+
+
+def fork_transform(row):
+    return {"id": row[0], "properties": node_properties(row[1], {}),
+            "end": row[2]}
+
+
+def citation_transform(row):
+    names = ["id", "id_user", "citation_type", "citation_desc",
+             "citation_url", "citation_source", "citation_pubdate",
+             "citation_authors", "citation_pubname", "citation_comment",
+             "citation_pmid", "event_stamp"]
+    properties = dict(zip(names, row))
+    return {"id": properties.pop("id"), "properties": properties}
+
+
+# the labels a citation can be attached to
+CITED_LABELS = ["task", "concept", "disorder", "theory", "battery",
+                "contrast", "condition", "assertion", "implementation"]
+
+
+def import_steps():
+    '''import_steps returns the steps of the import, in the order of
+    migrate_db.py and then mysql2neo.py
+    '''
+    steps = [
+        node_step("tasks", "task", term_sql("task"), ["definition_text"]),
+        node_step("concepts", "concept", term_sql("concept"),
+                  ["definition_text"]),
+        node_step("conditions", "condition",
+                  '''select id, condition_text, condition_text, id_user,
+                            event_stamp, condition_description
+                     from type_condition order by id''',
+                  ["condition_text", "id_user", "event_stamp",
+                   "condition_description"], after=["tasks"]),
+        relation_step("task_conditions", "task", "HASCONDITION", "condition",
+                      '''select id_term, id from type_condition
+                         order by id''', after=["conditions"]),
+        node_step("contrasts", "contrast",
+                  '''select id, contrast_text, id_user, event_stamp
+                     from type_contrast order by id''',
+                  ["id_user", "event_stamp"], after=["tasks"]),
+        relation_step("task_contrasts", "task", "HASCONTRAST", "contrast",
+                      "select id_term, id from type_contrast order by id",
+                      after=["contrasts"]),
+    ]
+    steps += assertion_steps()
+    steps += [
+        node_step("batteries", "battery",
+                  '''select id, collection_name, collection_alias, id_user,
+                            event_stamp, collection_description,
+                            collection_date_introduced, collection_publisher,
+                            flag_for_curator, website
+                     from table_task_collection order by id''',
+                  ["collection_alias", "id_user", "event_stamp",
+                   "collection_description", "collection_date_introduced",
+                   "collection_publisher", "flag_for_curator", "website"]),
+        relation_step("battery_tasks", "task", "INBATTERY", "battery",
+                      '''select id_term, id_collection, id_user, event_stamp
+                         from match_collection_tasks
+                         order by id_collection, id_term''',
+                      ["id_user", "event_stamp"],
+                      after=["tasks", "batteries"]),
+        node_step("theories", "theory",
+                  '''select id, collection_name, collection_alias, id_user,
+                            event_stamp, collection_description,
+                            flag_for_curator
+                     from table_theory_collection order by id''',
+                  ["collection_alias", "id_user", "event_stamp",
+                   "collection_description", "flag_for_curator"]),
+        relation_step("theory_assertions", "assertion", "INTHEORY", "theory",
+                      '''select id_assertion, id_collection, event_stamp,
+                                id_user
+                         from match_collection_assertions
+                         order by id_collection, id_assertion''',
+                      ["event_stamp", "id_user"],
+                      after=["assertions", "theories"]),
+        relation_step("battery_batteries", "battery", "PARTOF", "battery",
+                      '''select id_included_collection, id_collection
+                         from match_collection_collections order by id''',
+                      after=["batteries"]),
+        node_step("concept_classes", "concept_class",
+                  '''select id, concept_class, class_desc, display_order
+                     from type_concept order by id''',
+                  ["description", "display_order"]),
+        relation_step("concept_concept_classes", "concept", "CLASSIFIEDUNDER",
+                      "concept_class",
+                      '''select id_term, id_concept_class
+                         from table_definition
+                         where id_concept_class is not NULL
+                               and id_concept_class <> '' order by id''',
+                      after=["concepts", "concept_classes"]),
+        Step("forks",
+             '''select parent_id_term, parent_term_text, child_id_term
+                from match_forked order by id''',
+             fork_transform,
+             ['''UNWIND $rows AS row
+                 MATCH (c:concept {id: row.end})
+                 MERGE (d:disambiguation {id: row.id})
+                 ON CREATE SET d += row.properties,
+                               d.creation_time = timestamp() / 1000,
+                               d.last_updated = timestamp() / 1000
+                 MERGE (d)-[:DISAMBIGUATES]->(c)'''],
+             ["concepts"]),
+        Step("disorders", "select * from disorder_import order by id",
+             disorder_transform, [merge_nodes("disorder")], []),
+        user_step("task", '''select id, id_user from table_term
+                             where term_type='task' order by id'''),
+        user_step("concept", '''select id, id_user from table_term
+                                where term_type='concept' order by id'''),
+        user_step("disorder",
+                  "select id, id_user from disorder_import order by id"),
+        user_step("theory", '''select id, id_user from table_theory_collection
+                               order by id'''),
+        user_step("battery", '''select id, id_user from table_task_collection
+                                order by id'''),
+    ]
+
+    # what mysql2neo.py added
+    steps += [
+        Step("task_details",
+             '''select id, id_user, term_alias, event_stamp from table_term
+                where term_type='task' order by id''',
+             term_details_transform, [set_properties("task")], ["tasks"]),
+        Step("concept_details",
+             '''select id, id_user, term_alias, event_stamp from table_term
+                where term_type='concept' order by id''',
+             term_details_transform, [set_properties("concept")],
+             ["concepts"]),
+        Step("definition_details", "select * from table_definition order by id",
+             definition_details_transform,
+             [set_properties("task"), set_properties("concept")],
+             ["tasks", "concepts"]),
+        Step("indicators",
+             '''select distinct indicator_text from type_indicator
+                order by indicator_text''',
+             lambda row: {"type": row[0]},
+             ['''UNWIND $rows AS row MERGE (:indicator {type: row.type})'''],
+             []),
+        Step("task_indicators", "select * from type_indicator order by id",
+             lambda row: {"start": row[2], "type": row[3], "properties": {
+                 "id": row[0], "id_user": row[1], "event_stamp": row[4]}},
+             ['''UNWIND $rows AS row
+                 MATCH (t:task {id: row.start})
+                 MATCH (i:indicator {type: row.type})
+                 MERGE (t)-[r:HASINDICATOR]->(i)
+                 ON CREATE SET r += row.properties'''],
+             ["tasks", "indicators"]),
+        Step("external_datasets",
+             "select * from external_datasets order by id",
+             lambda row: {"id": row[0], "start": row[1], "properties": {
+                 "id_term": row[1], "dataset_name": row[2],
+                 "dataset_uri": row[3], "id_user": row[4],
+                 "event_stamp": row[5]}},
+             [merge_nodes("external_dataset"),
+              '''UNWIND $rows AS row
+                 MATCH (t:task {id: row.start})
+                 MATCH (d:external_dataset {id: row.id})
+                 MERGE (t)-[:HASEXTERNALDATASET]->(d)'''],
+             ["tasks"]),
+        Step("implementations",
+             "select * from table_implementation order by id",
+             lambda row: {"id": row[0], "start": row[1], "properties": {
+                 "id_task": row[1], "implementation_name": row[2],
+                 "implementation_uri": row[3], "id_user": row[4],
+                 "event_stamp": row[5],
+                 "implementation_description": row[6]}},
+             [merge_nodes("implementation"),
+              '''UNWIND $rows AS row
+                 MATCH (t:task {id: row.start})
+                 MATCH (i:implementation {id: row.id})
+                 MERGE (t)-[:HASIMPLEMENTATION]->(i)'''],
+             ["tasks"]),
+        Step("citations", "select * from table_citation order by id",
+             citation_transform, [merge_nodes("citation")], []),
+        Step("cited", "select * from match_citation_entity order by 1",
+             lambda row: relation(row[2], row[1]),
+             [merge_relations(x, "HASCITATION", "citation")
+              for x in CITED_LABELS],
+             ["citations", "tasks", "concepts", "disorders", "theories",
+              "batteries", "contrasts", "conditions", "assertions",
+              "implementations"]),
+        Step("disorder_isa", "select * from disorder_import order by id",
+             lambda row: relation(row[2], row[6], protocol=row[7],
+                                  fulltext=row[8]),
+             [merge_relations("disorder", "ISA", "disorder")],
+             ["disorders"]),
+        Step("disorder_differences",
+             "select * from match_disorder_assertions order by id",
+             lambda row: {"start": row[4], "end": row[2], "properties": {
+                 "id_task": [row[3]], "id_contrast": row[4], "id": row[0],
+                 "event_stamp": row[5]}},
+             [merge_relations("contrast", "HASDIFFERENCE", "disorder")],
+             ["contrasts", "disorders"]),
+    ]
+    return steps
+
+
+class Checkpoints(object):
+    '''Checkpoints keeps the progress of each step in a file of its own, so
+    worker processes never write the same file
+    '''
+
+    def __init__(self, path):
+        self.path = path
+        os.makedirs(path, exist_ok=True)
+
+    def filename(self, step):
+        return os.path.join(self.path, "{}.json".format(step))
+
+    def load(self, step):
+        try:
+            with open(self.filename(step)) as checkpoint:
+                return json.load(checkpoint)
+        except FileNotFoundError:
+            return {"rows": 0, "done": False}
+
+    def save(self, step, rows, done=False):
+        filename = self.filename(step)
+        with open(filename + ".tmp", "w") as checkpoint:
+            json.dump({"rows": rows, "done": done}, checkpoint)
+        os.replace(filename + ".tmp", filename)
+
+
+def write_chunk(graph, statements, rows):
+    for attempt in range(RETRIES):
+        tx = graph.begin()
+        try:
+            for statement in statements:
+                tx.run(statement, rows=rows)
+            tx.commit()
+            return
+        except TransientError:
+            tx.rollback()
+            if attempt == RETRIES - 1:
+                raise
+            time.sleep(2 ** attempt)
+
+
+def run_step(step_name, chunk_size, checkpoint_path):
+    '''run_step runs one step (in a worker process) from its checkpoint and
+    returns (rows written, seconds)
+    '''
+    step = {x.name: x for x in import_steps()}[step_name]
+    checkpoints = Checkpoints(checkpoint_path)
+    progress = checkpoints.load(step.name)
+    if progress["done"]:
+        return 0, 0.0
+    graph = connect_graph()
+    conn = connect_mysql()
+    cursor = conn.cursor()
+    start = time.time()
+    done = progress["rows"]
+    written = 0
+    try:
+        cursor.execute(step.sql)
+        # skip what an earlier run already wrote
+        skip = done
+        while skip > 0:
+            skipped = len(cursor.fetchmany(min(skip, chunk_size)))
+            if not skipped:
+                break
+            skip -= skipped
+        while True:
+            chunk = cursor.fetchmany(chunk_size)
+            if not chunk:
+                break
+            rows = [x for x in map(step.transform, chunk) if x is not None]
+            if rows:
+                write_chunk(graph, step.statements, rows)
+            done += len(chunk)
+            written += len(rows)
+            checkpoints.save(step.name, done)
+        checkpoints.save(step.name, done, done=True)
+    finally:
+        cursor.close()
+        conn.close()
+    return written, time.time() - start
+
+
+# the labels the import merges and matches nodes of by id
+ID_LABELS = ["assertion", "battery", "citation", "concept", "concept_class",
+             "condition", "contrast", "disambiguation", "disorder",
+             "external_dataset", "implementation", "task", "theory", "user"]
+
+
+def clear_graph(batch_size=10000):
+    '''clear_graph deletes every node and relation, in batches so that no
+    transaction holds the whole graph
+    '''
+    graph = connect_graph()
+    while graph.run('''MATCH (n) WITH n LIMIT $limit DETACH DELETE n
+                       RETURN count(n)''', limit=batch_size).evaluate():
+        pass
+
+
+def create_schema():
+    '''the uniqueness constraints on id (see cognitive/apps/atlas/schema.py)
+    make every MERGE and MATCH by id an index seek
+    '''
+    graph = connect_graph()
+    statements = ["CREATE CONSTRAINT ON (n:{}) ASSERT n.id IS UNIQUE".format(x)
+                  for x in ID_LABELS] + ["CREATE INDEX ON :indicator(type)"]
+    for statement in statements:
+        try:
+            graph.run(statement)
+        except Exception as error:
+            print("{}: {}".format(statement, error))
+
+
+def run_import(steps, workers, chunk_size, checkpoint_path):
+    '''run_import runs steps in up to workers processes, each once the steps
+    it comes after are done, and returns {step: (rows, seconds)}
+    '''
+    names = set(x.name for x in steps)
+    pending = {x.name: set(x.after) & names for x in steps}
+    report = {}
+    running = {}
+    with ProcessPoolExecutor(max_workers=workers) as executor:
+        while pending or running:
+            for name in sorted(pending):
+                if not pending[name] - set(report):
+                    del pending[name]
+                    running[executor.submit(
+                        run_step, name, chunk_size, checkpoint_path)] = name
+            if not running:
+                raise RuntimeError("steps wait on each other: {}".format(
+                    ", ".join(sorted(pending))))
+            finished, _ = wait(running, return_when=FIRST_COMPLETED)
+            for future in finished:
+                name = running.pop(future)
+                rows, seconds = report[name] = future.result()
+                print("{:<32} {:>9} rows {:>8.1f}s {:>10.0f} rows/s".format(
+                    name, rows, seconds, rows / seconds if seconds else 0))
+    return report
+
+
+def clear_atlas_cache():
+    '''clear_atlas_cache empties the file based atlas cache, so that the web
+    workers (whose generation token is in it) read the imported graph afresh
+    '''
+    try:
+        names = os.listdir(ATLAS_CACHE)
+    except OSError:
+        return
+    for name in names:
+        if name.endswith(".djcache"):
+            try:
+                os.remove(os.path.join(ATLAS_CACHE, name))
+            except OSError:
+                pass
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--workers", type=int, default=os.cpu_count())
+    parser.add_argument("--chunk-size", type=int, default=CHUNK_SIZE)
+    parser.add_argument("--checkpoints", default=CHECKPOINTS)
+    parser.add_argument("--reset", action="store_true",
+                        help="empty the graph, forget the checkpoints and "
+                             "import everything")
+    parser.add_argument("--only", nargs="+",
+                        help="only run these steps (their dependencies are "
+                             "assumed done)")
+    args = parser.parse_args()
+
+    if args.reset:
+        shutil.rmtree(args.checkpoints, ignore_errors=True)
+        clear_graph()
+    steps = import_steps()
+    if args.only:
+        steps = [x for x in steps if x.name in args.only]
+    create_schema()
+    start = time.time()
+    report = run_import(steps, args.workers, args.chunk_size,
+                        args.checkpoints)
+    clear_atlas_cache()
+    seconds = time.time() - start
+    rows = sum(x[0] for x in report.values())
+    print("{} rows in {:.1f}s, {:.0f} rows/s".format(
+        rows, seconds, rows / seconds if seconds else 0))
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,201 @@
+''' generator of a synthetic atlas, for benchmarks at sizes the real one has
+not reached.
+
+For N concepts it makes about 0.9 N tasks, each with 2 to 4 conditions, 1 to
+3 contrasts (each between two of its conditions) and a few asserted concepts,
+the concepts being picked with a long tail as in the real atlas (a few are
+asserted by many tasks, most by one or two). Some asserted concepts are
+measured by a contrast of the task, some contrasts differ in one of 0.5 N
+disorders, and the concepts (KINDOF, PARTOF) and disorders (ISA) form random
+hierarchies. The same size and --seed give the same atlas.
+
+Every node and relation is marked synthetic: true, and --remove deletes
+them. The graph is written with one UNWIND statement per chunk; run
+manage.py atlas_schema create first so that the relations find their nodes
+by index. --json writes the atlas to a file instead, for use without neo4j.
+
+usage: python scripts/generate_atlas.py --concepts 1000 [--seed 0]
+       python scripts/generate_atlas.py --remove
+'''
+import argparse
+import json
+import os
+import random
+import sys
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+os.environ.setdefault("DJANGO_SETTINGS_MODULE", "cognitive.settings")
+
+import django  # noqa: E402
+
+django.setup()
+
+from cognitive.apps.atlas.cache import invalidate  # noqa: E402
+from cognitive.apps.atlas.counts import reconcile  # noqa: E402
+from cognitive.apps.atlas.utils import UID_PREFIXES  # noqa: E402
+from cognitive.settings import graph  # noqa: E402
+
+CHUNK_SIZE = 5000
+LABELS = ["concept", "task", "condition", "contrast", "disorder"]
+TIMESTAMP = 1466000000
+
+WORDS = ["attention", "memory", "working", "episodic", "semantic", "control",
+         "inhibition", "reward", "learning", "visual", "auditory", "spatial",
+         "response", "selection", "conflict", "switching", "recognition",
+         "recall", "emotion", "fear", "motor", "timing", "language", "reading",
+         "decision", "risk", "social", "face", "object", "perception",
+         "search", "sequence", "stop", "signal", "go", "nogo", "delay",
+         "discounting", "priming", "encoding"]
+
+
+def uid(label, number):
+    return "{}_syn{:010d}".format(UID_PREFIXES[label], number)
+
+
+def words(rng, count):
+    return " ".join(rng.choice(WORDS) for _ in range(count))
+
+
+def generate(concepts, seed=0):
+    '''generate returns a synthetic atlas of about concepts concepts as
+    {"nodes": {label: [properties]}, "relations": [[type, start label,
+    start id, end label, end id, properties]]}
+    '''
+    rng = random.Random(seed)
+    nodes = {label: [] for label in LABELS}
+    relations = []
+
+    def node(label, name, **properties):
+        number = len(nodes[label])
+        properties.update({"id": uid(label, number), "name": name,
+                           "creation_time": TIMESTAMP + number,
+                           "last_updated": TIMESTAMP + number,
+                           "synthetic": True})
+        nodes[label].append(properties)
+        return properties["id"]
+
+    def relate(relation, start_label, start, end_label, end, **properties):
+        properties["synthetic"] = True
+        relations.append([relation, start_label, start, end_label, end,
+                          properties])
+
+    concept_ids = [
+        node("concept", "{} {}".format(words(rng, 2), i),
+             definition_text=words(rng, 12))
+        for i in range(concepts)]
+    disorder_ids = [
+        node("disorder", "{} disorder {}".format(words(rng, 1), i),
+             definition=words(rng, 12))
+        for i in range(max(1, concepts // 2))]
+
+    for i, concept in enumerate(concept_ids[1:], 1):
+        if rng.random() < 0.5:
+            relate("KINDOF", "concept", concept, "concept",
+                   concept_ids[rng.randrange(i)])
+        if rng.random() < 0.2:
+            relate("PARTOF", "concept", concept, "concept",
+                   concept_ids[rng.randrange(i)])
+    for i, disorder in enumerate(disorder_ids[1:], 1):
+        if rng.random() < 0.7:
+            relate("ISA", "disorder", disorder, "disorder",
+                   disorder_ids[rng.randrange(i)])
+
+    # the nth concept is asserted about 1 / (n + 1) as often as the first
+    weights = [1.0 / (n + 1) for n in range(len(concept_ids))]
+    for i in range(max(1, concepts * 9 // 10)):
+        task = node("task", "{} task {}".format(words(rng, 2), i),
+                    definition_text=words(rng, 20))
+        conditions = [
+            node("condition", "{} condition".format(words(rng, 1)),
+                 description=words(rng, 6))
+            for _ in range(rng.randint(2, 4))]
+        for condition in conditions:
+            relate("HASCONDITION", "task", task, "condition", condition)
+        contrasts = []
+        for _ in range(rng.randint(1, 3)):
+            contrast = node("contrast", "{} contrast".format(words(rng, 2)),
+                            description=words(rng, 6))
+            contrasts.append(contrast)
+            relate("HASCONTRAST", "task", task, "contrast", contrast)
+            for condition in rng.sample(conditions, 2):
+                relate("HASCONTRAST", "condition", condition, "contrast",
+                       contrast)
+            if rng.random() < 0.1:
+                relate("HASDIFFERENCE", "contrast", contrast, "disorder",
+                       rng.choice(disorder_ids),
+                       id="dif_syn{:010d}".format(len(relations)))
+        asserted = set(rng.choices(
+            concept_ids, weights, k=min(12, int(rng.paretovariate(1.5)))))
+        for concept in sorted(asserted):
+            relate("ASSERTS", "task", task, "concept", concept)
+            if rng.random() < 0.4:
+                relate("MEASUREDBY", "concept", concept, "contrast",
+                       rng.choice(contrasts))
+    return {"nodes": nodes, "relations": relations}
+
+
+def write_atlas(atlas, chunk_size=CHUNK_SIZE):
+    '''write_atlas creates the nodes and relations of atlas in the graph'''
+    for label, rows in atlas["nodes"].items():
+        for start in range(0, len(rows), chunk_size):
+            graph.run("UNWIND $rows AS row CREATE (n:{}) SET n = row".format(
+                label), rows=rows[start:start + chunk_size])
+    groups = {}
+    for relation, start_label, start, end_label, end, properties in \
+            atlas["relations"]:
+        groups.setdefault((relation, start_label, end_label), []).append(
+            {"start": start, "end": end, "properties": properties})
+    for (relation, start_label, end_label), rows in sorted(groups.items()):
+        query = '''UNWIND $rows AS row
+                   MATCH (a:{}) WHERE a.id = row.start
+                   MATCH (b:{}) WHERE b.id = row.end
+                   CREATE (a)-[r:{}]->(b) SET r = row.properties
+                '''.format(start_label, end_label, relation)
+        for start in range(0, len(rows), chunk_size):
+            graph.run(query, rows=rows[start:start + chunk_size])
+    changed()
+
+
+def remove_atlas():
+    '''remove_atlas deletes every synthetic node and its relations'''
+    for label in LABELS:
+        while graph.run('''MATCH (n:{}) WHERE n.synthetic = true
+                           WITH n LIMIT 10000 DETACH DELETE n
+                           RETURN count(n)'''.format(label)).evaluate():
+            pass
+    changed()
+
+
+def changed():
+    # the graph was written behind query.Node's back
+    invalidate()
+    reconcile()
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--concepts", type=int, default=1000)
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--chunk-size", type=int, default=CHUNK_SIZE)
+    parser.add_argument("--json", help="write the atlas to this file instead "
+                                       "of the graph")
+    parser.add_argument("--remove", action="store_true",
+                        help="delete the synthetic atlas from the graph")
+    args = parser.parse_args()
+
+    if args.remove:
+        remove_atlas()
+        return
+    atlas = generate(args.concepts, args.seed)
+    print(", ".join("{} {}".format(len(rows), label)
+                    for label, rows in atlas["nodes"].items()) +
+          ", {} relations".format(len(atlas["relations"])))
+    if args.json:
+        with open(args.json, "w") as output:
+            json.dump(atlas, output)
+    else:
+        write_atlas(atlas, args.chunk_size)
+
+
+if __name__ == "__main__":
+    main()
@@ -1,5 +1,6 @@
 '''
-Script used to move from mysql database to neo4j database.
+Script used to move from mysql database to neo4j database, one row at a time.
+bulk_import.py does the same (and what mysql2neo.py adds) in batches.
 '''
 import html
 import os